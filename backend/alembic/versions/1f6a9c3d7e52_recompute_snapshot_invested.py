@@ -0,0 +1,29 @@
+"""recompute portfolio_daily_values.invested as ledger cost basis
+
+Revision ID: 1f6a9c3d7e52
+Revises: e4b8d2f61c37
+Create Date: 2026-10-17 18:05:44.208316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f6a9c3d7e52'
+down_revision: Union[str, Sequence[str], None] = 'e4b8d2f61c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Snapshots stored buys - sells as invested; the refresher rebuilds them
+    op.execute("DELETE FROM portfolio_daily_values")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM portfolio_daily_values")
@@ -0,0 +1,31 @@
+"""add benchmarks.cumulative_index
+
+Revision ID: 3b8e1d6f2a94
+Revises: 7c2e4a9b1d85
+Create Date: 2026-10-17 20:12:37.406158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e1d6f2a94'
+down_revision: Union[str, Sequence[str], None] = '7c2e4a9b1d85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('benchmarks', sa.Column('cumulative_index', sa.Float(), nullable=True))
+    # CDI/SELIC rows so far were fixed placeholder rates (with rate/365 daily returns);
+    # the rate series are reloaded from the BCB exports
+    op.execute("DELETE FROM benchmarks WHERE symbol IN ('CDI', 'SELIC', 'IPCA')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('benchmarks', 'cumulative_index')
@@ -0,0 +1,43 @@
+"""add portfolio_daily_values snapshot table
+
+Revision ID: 3c8e1a7d9b21
+Revises: 6ee20cbfbb58
+Create Date: 2026-10-17 10:12:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1a7d9b21'
+down_revision: Union[str, Sequence[str], None] = '6ee20cbfbb58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('portfolio_daily_values',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('market_value', sa.Float(), nullable=False),
+    sa.Column('invested', sa.Float(), nullable=False),
+    sa.Column('cash', sa.Float(), nullable=False),
+    sa.Column('net_flow', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_portfolio_daily_values_id'), 'portfolio_daily_values', ['id'], unique=False)
+    op.create_index('ix_portfolio_daily_values_portfolio_date', 'portfolio_daily_values', ['portfolio_id', 'date'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_portfolio_daily_values_portfolio_date', table_name='portfolio_daily_values')
+    op.drop_index(op.f('ix_portfolio_daily_values_id'), table_name='portfolio_daily_values')
+    op.drop_table('portfolio_daily_values')
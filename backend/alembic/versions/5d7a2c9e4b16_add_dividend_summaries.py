@@ -0,0 +1,48 @@
+"""add dividend_summaries table
+
+Revision ID: 5d7a2c9e4b16
+Revises: a41c7e9f2d68
+Create Date: 2026-10-17 14:05:12.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7a2c9e4b16'
+down_revision: Union[str, Sequence[str], None] = 'a41c7e9f2d68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('dividend_summaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('payments_count', sa.Integer(), nullable=False),
+    sa.Column('first_payment_date', sa.Date(), nullable=True),
+    sa.Column('last_payment_date', sa.Date(), nullable=True),
+    sa.Column('ttm_per_share', sa.Float(), nullable=False),
+    sa.Column('ttm_yield', sa.Float(), nullable=True),
+    sa.Column('last_full_year', sa.Integer(), nullable=True),
+    sa.Column('last_year_per_share', sa.Float(), nullable=True),
+    sa.Column('yoy_growth', sa.Float(), nullable=True),
+    sa.Column('cagr', sa.Float(), nullable=True),
+    sa.Column('cagr_years', sa.Integer(), nullable=True),
+    sa.Column('yearly_per_share', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('asset_id')
+    )
+    op.create_index(op.f('ix_dividend_summaries_id'), 'dividend_summaries', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_dividend_summaries_id'), table_name='dividend_summaries')
+    op.drop_table('dividend_summaries')
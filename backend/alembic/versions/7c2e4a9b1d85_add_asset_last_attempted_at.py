@@ -0,0 +1,28 @@
+"""add assets.last_attempted_at
+
+Revision ID: 7c2e4a9b1d85
+Revises: 1f6a9c3d7e52
+Create Date: 2026-10-17 18:42:09.163820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4a9b1d85'
+down_revision: Union[str, Sequence[str], None] = '1f6a9c3d7e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('assets', sa.Column('last_attempted_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('assets', 'last_attempted_at')
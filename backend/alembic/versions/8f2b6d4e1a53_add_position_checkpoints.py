@@ -0,0 +1,47 @@
+"""add position_checkpoints table
+
+Revision ID: 8f2b6d4e1a53
+Revises: 3c8e1a7d9b21
+Create Date: 2026-10-17 11:03:27.514902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2b6d4e1a53'
+down_revision: Union[str, Sequence[str], None] = '3c8e1a7d9b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('position_checkpoints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('average_price', sa.Float(), nullable=False),
+    sa.Column('total_invested', sa.Float(), nullable=False),
+    sa.Column('realized_pnl', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_position_checkpoints_id'), 'position_checkpoints', ['id'], unique=False)
+    op.create_index('ix_position_checkpoints_lookup', 'position_checkpoints', ['portfolio_id', 'asset_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_position_checkpoints_lookup', table_name='position_checkpoints')
+    op.drop_index(op.f('ix_position_checkpoints_id'), table_name='position_checkpoints')
+    op.drop_table('position_checkpoints')
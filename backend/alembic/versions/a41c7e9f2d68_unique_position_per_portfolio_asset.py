@@ -0,0 +1,108 @@
+"""unique position per portfolio and asset
+
+Revision ID: a41c7e9f2d68
+Revises: 8f2b6d4e1a53
+Create Date: 2026-10-17 11:48:05.330217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e9f2d68'
+down_revision: Union[str, Sequence[str], None] = '8f2b6d4e1a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _replay(trades):
+    """Moving-average fold of (type, quantity, amount) rows, as PositionLedger does"""
+    quantity = average_price = total_invested = realized_pnl = 0.0
+    for transaction_type, trade_quantity, amount in trades:
+        trade_quantity = trade_quantity or 0.0
+        amount = amount or 0.0
+        if transaction_type == 'BUY':
+            total_cost = quantity * average_price + amount
+            quantity += trade_quantity
+            average_price = total_cost / quantity if quantity > 0 else 0
+            total_invested += amount
+        elif transaction_type == 'SELL':
+            sale_cost_basis = average_price * trade_quantity
+            quantity -= trade_quantity
+            realized_pnl += amount - sale_cost_basis
+            total_invested -= sale_cost_basis
+    return {
+        'quantity': quantity, 'average_price': average_price,
+        'total_invested': total_invested, 'realized_pnl': realized_pnl
+    }
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    # Duplicated positions each hold part of the history: the oldest row is
+    # rebuilt from the transactions and keeps the dividends credited to all of them
+    duplicated = bind.execute(sa.text("""
+        SELECT portfolio_id, asset_id, MIN(id), SUM(COALESCE(dividends_received, 0))
+        FROM positions
+        GROUP BY portfolio_id, asset_id
+        HAVING COUNT(*) > 1
+    """)).all()
+
+    for portfolio_id, asset_id, keep_id, dividends_received in duplicated:
+        trades = bind.execute(sa.text("""
+            SELECT transaction_type, quantity, total_amount
+            FROM transactions
+            WHERE portfolio_id = :portfolio_id
+              AND asset_id = :asset_id
+              AND transaction_type IN ('BUY', 'SELL')
+            ORDER BY date, id
+        """), {'portfolio_id': portfolio_id, 'asset_id': asset_id}).all()
+
+        bind.execute(sa.text("""
+            UPDATE positions
+            SET quantity = :quantity,
+                average_price = :average_price,
+                total_invested = :total_invested,
+                realized_pnl = :realized_pnl,
+                dividends_received = :dividends_received
+            WHERE id = :id
+        """), {**_replay(trades), 'dividends_received': dividends_received, 'id': keep_id})
+
+    # Correlated subqueries instead of UPDATE ... FROM / DELETE ... USING, so SQLite runs it too
+    op.execute("""
+        UPDATE dividends
+        SET position_id = (
+            SELECT MIN(q.id)
+            FROM positions p
+            JOIN positions q ON q.portfolio_id = p.portfolio_id AND q.asset_id = p.asset_id
+            WHERE p.id = dividends.position_id
+        )
+        WHERE position_id IN (
+            SELECT p.id
+            FROM positions p
+            WHERE EXISTS (
+                SELECT 1 FROM positions q
+                WHERE q.portfolio_id = p.portfolio_id AND q.asset_id = p.asset_id AND q.id < p.id
+            )
+        )
+    """)
+    op.execute("""
+        DELETE FROM positions
+        WHERE EXISTS (
+            SELECT 1 FROM positions q
+            WHERE q.portfolio_id = positions.portfolio_id
+              AND q.asset_id = positions.asset_id
+              AND q.id < positions.id
+        )
+    """)
+    op.create_index('ix_positions_portfolio_asset', 'positions', ['portfolio_id', 'asset_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_positions_portfolio_asset', table_name='positions')
@@ -0,0 +1,61 @@
+"""unique (key, date) on prices, benchmarks and exchange_rates
+
+Revision ID: c93e5f1a7b40
+Revises: 5d7a2c9e4b16
+Create Date: 2026-10-17 15:21:37.918402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c93e5f1a7b40'
+down_revision: Union[str, Sequence[str], None] = '5d7a2c9e4b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # benchmarks.symbol was unique, which allowed a single row per benchmark
+    # (SQLite databases are created from the models, which never had it named)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('benchmarks_symbol_key', 'benchmarks', type_='unique')
+
+    # Keep the most recent row of each key before adding the constraints
+    # (correlated subqueries instead of DELETE ... USING, so SQLite runs it too)
+    op.execute("""
+        DELETE FROM prices
+        WHERE EXISTS (
+            SELECT 1 FROM prices q
+            WHERE q.asset_id = prices.asset_id
+              AND q.date = prices.date
+              AND q.id > prices.id
+        )
+    """)
+    op.execute("""
+        DELETE FROM exchange_rates
+        WHERE EXISTS (
+            SELECT 1 FROM exchange_rates q
+            WHERE q.from_currency = exchange_rates.from_currency
+              AND q.to_currency = exchange_rates.to_currency
+              AND q.date = exchange_rates.date
+              AND q.id > exchange_rates.id
+        )
+    """)
+
+    op.create_index('ix_prices_asset_date', 'prices', ['asset_id', 'date'], unique=True)
+    op.create_index('ix_benchmarks_symbol_date', 'benchmarks', ['symbol', 'date'], unique=True)
+    op.create_index('ix_exchange_rates_pair_date', 'exchange_rates', ['from_currency', 'to_currency', 'date'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_exchange_rates_pair_date', table_name='exchange_rates')
+    op.drop_index('ix_benchmarks_symbol_date', table_name='benchmarks')
+    op.drop_index('ix_prices_asset_date', table_name='prices')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_unique_constraint('benchmarks_symbol_key', 'benchmarks', ['symbol'])
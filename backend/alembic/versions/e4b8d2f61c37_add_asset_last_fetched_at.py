@@ -0,0 +1,28 @@
+"""add assets.last_fetched_at
+
+Revision ID: e4b8d2f61c37
+Revises: c93e5f1a7b40
+Create Date: 2026-10-17 16:40:12.551093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8d2f61c37'
+down_revision: Union[str, Sequence[str], None] = 'c93e5f1a7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('assets', sa.Column('last_fetched_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('assets', 'last_fetched_at')
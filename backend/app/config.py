@@ -48,6 +48,59 @@ class Settings(BaseSettings):
     SMTP_USER: Optional[str] = os.getenv("SMTP_USER")
     SMTP_PASSWORD: Optional[str] = os.getenv("SMTP_PASSWORD")
     
+    # Write-behind refresh of position values (seconds). Queued assets are flushed by every
+    # API process; the full pass every POSITION_REFRESH_INTERVAL_SECONDS (all positions,
+    # snapshot materialize, dividend backfill) follows PRICE_SCHEDULER_BACKEND: in-process
+    # with "asyncio", the celery worker with "celery", not at all with "off"
+    POSITION_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("POSITION_REFRESH_INTERVAL_SECONDS", "300"))
+    POSITION_REFRESH_FLUSH_SECONDS: int = int(os.getenv("POSITION_REFRESH_FLUSH_SECONDS", "5"))
+    
+    # Market data provider: "yahoo", "alphavantage" (ALPHA_VANTAGE_KEY) or "fixture"
+    # (offline, replays PRICE_FIXTURE_PATH)
+    PRICE_PROVIDER: str = os.getenv("PRICE_PROVIDER", "yahoo")
+    PRICE_FIXTURE_PATH: Optional[str] = os.getenv("PRICE_FIXTURE_PATH")
+    
+    # Background price ingestion: "off" (default), "asyncio" (loop inside the API process,
+    # single-worker deployments only) or "celery" (app.worker, for multi-worker deployments)
+    PRICE_SCHEDULER_BACKEND: str = os.getenv("PRICE_SCHEDULER_BACKEND", "off")
+    PRICE_SCHEDULER_INTERVAL_SECONDS: int = int(os.getenv("PRICE_SCHEDULER_INTERVAL_SECONDS", "60"))
+    PRICE_STALE_SECONDS: int = int(os.getenv("PRICE_STALE_SECONDS", "900"))
+    PRICE_RETRY_SECONDS: int = int(os.getenv("PRICE_RETRY_SECONDS", "3600"))  # backoff for tickers without quotes
+    PRICE_FETCH_BATCH_SIZE: int = int(os.getenv("PRICE_FETCH_BATCH_SIZE", "50"))
+    PRICE_FETCH_CONCURRENCY: int = int(os.getenv("PRICE_FETCH_CONCURRENCY", "4"))
+    # Benchmark indices and RATE_SERIES_DIR rates are synced by the same scheduler, fetching
+    # only dates not stored yet. With "off" they are synced once when each API process starts
+    # and then stay as they are until the next restart
+    BENCHMARK_SYNC_SECONDS: int = int(os.getenv("BENCHMARK_SYNC_SECONDS", "3600"))
+    BENCHMARK_HISTORY_DAYS: int = int(os.getenv("BENCHMARK_HISTORY_DAYS", "1827"))
+    # Directory with BCB SGS CSV exports named CDI.csv, SELIC.csv and IPCA.csv
+    RATE_SERIES_DIR: Optional[str] = os.getenv("RATE_SERIES_DIR")
+    
+    # Process-wide cache of upstream quotes/histories: "memory" or "redis" (REDIS_URL,
+    # shared by every worker process)
+    QUOTE_CACHE_BACKEND: str = os.getenv("QUOTE_CACHE_BACKEND", "memory")
+    QUOTE_CACHE_TTL_SECONDS: int = int(os.getenv("QUOTE_CACHE_TTL_SECONDS", "60"))
+    QUOTE_CACHE_HISTORY_TTL_SECONDS: int = int(os.getenv("QUOTE_CACHE_HISTORY_TTL_SECONDS", "300"))
+    QUOTE_CACHE_MAX_ENTRIES: int = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "4096"))
+    
+    # Outbound market-data HTTP (app.services.http_clients): timeouts per request and
+    # retries of throttled/5xx/connection failures, waiting HTTP_BACKOFF_SECONDS * 2^n
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+    HTTP_MAX_RETRIES: int = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+    HTTP_BACKOFF_SECONDS: float = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+    # Alpha Vantage quota shared by every call of the process (free keys: 5 per minute)
+    ALPHA_VANTAGE_REQUESTS_PER_MINUTE: int = int(os.getenv("ALPHA_VANTAGE_REQUESTS_PER_MINUTE", "5"))
+    # Real-time quote fan-out: symbols not answered within the deadline are returned
+    # from their last known quote, marked stale
+    QUOTE_FANOUT_DEADLINE_SECONDS: float = float(os.getenv("QUOTE_FANOUT_DEADLINE_SECONDS", "10"))
+    QUOTE_LAST_KNOWN_TTL_SECONDS: int = int(os.getenv("QUOTE_LAST_KNOWN_TTL_SECONDS", "86400"))
+    
+    # Asset search: optional listing CSV (symbol,name,exchange,asset_type,currency,sector,industry)
+    # indexed with the assets table, and how long a query Yahoo has no answer for is not re-asked
+    SYMBOL_LISTING_PATH: Optional[str] = os.getenv("SYMBOL_LISTING_PATH")
+    SYMBOL_MISS_TTL_SECONDS: int = int(os.getenv("SYMBOL_MISS_TTL_SECONDS", str(6 * 60 * 60)))
+    
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
     
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from typing import Dict, List, Sequence
 from .config import settings
 
 engine = create_engine(
@@ -19,3 +20,33 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def upsert(db: Session, model, rows: List[Dict], index_elements: List[str], update_columns: List[str],
+           chunk_size: int = 10000, fill_columns: Sequence[str] = ()):
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE for PostgreSQL and SQLite
+
+    The statement is compiled once and executed with the rows as an
+    executemany, which the drivers batch (multi-row VALUES on psycopg2,
+    sqlite3 executemany). Every row must have the same keys.
+    fill_columns are written on insert but only replace a NULL on conflict.
+    """
+    if not rows:
+        return
+
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upsert is not supported for dialect {dialect}")
+
+    table = model.__table__
+    stmt = insert(table)
+    set_ = {column: stmt.excluded[column] for column in update_columns}
+    set_.update({column: func.coalesce(table.c[column], stmt.excluded[column]) for column in fill_columns})
+    stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+    # Chunked to bound the memory of a single executemany
+    for start in range(0, len(rows), chunk_size):
+        db.execute(stmt, rows[start:start + chunk_size])
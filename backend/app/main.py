@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
@@ -9,6 +10,10 @@ from . import models, schemas, auth
 from .database import engine, get_db
 from .config import settings
 from .routers import portfolios, assets, transactions, dashboard, imports, user_settings, dividends, optimization, notifications
+from .services.position_refresher import run_refresh_loop
+from .services.price_scheduler import run_price_scheduler, sync_benchmarks_once
+from .services.quote_cache import quote_cache
+from .services.http_clients import http_clients
 
 # Create database tables - wrapped in try/catch for deployment
 try:
@@ -33,6 +38,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Background tasks
+@app.on_event("startup")
+async def start_background_tasks():
+    # Pooled market-data HTTP sessions, shared by every request of this worker
+    await http_clients.start()
+    # Flushes assets queued by this process; the full pass follows PRICE_SCHEDULER_BACKEND
+    app.state.position_refresher = asyncio.create_task(run_refresh_loop())
+    # Opt-in: every uvicorn/gunicorn worker runs this hook, so multi-worker
+    # deployments use the celery backend (app.worker) instead
+    if settings.PRICE_SCHEDULER_BACKEND.lower() == "asyncio":
+        app.state.price_scheduler = asyncio.create_task(run_price_scheduler())
+    elif settings.PRICE_SCHEDULER_BACKEND.lower() == "off":
+        # Nothing else keeps benchmarks and rate series current: sync them once per start
+        app.state.benchmark_sync = asyncio.create_task(sync_benchmarks_once())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for name in ("position_refresher", "price_scheduler", "benchmark_sync"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await http_clients.close()
+
 # Include routers
 app.include_router(portfolios.router, prefix="/api/portfolios", tags=["portfolios"])
 app.include_router(assets.router, prefix="/api/assets", tags=["assets"])
@@ -49,6 +77,16 @@ app.include_router(notifications.router, prefix="/api/notifications", tags=["not
 async def health_check():
     return {"status": "healthy", "message": "Portfolio Investment Platform API is running"}
 
+# Hit/miss counters of the process-wide quote cache (per worker process)
+@app.get("/api/health/quote-cache")
+async def quote_cache_stats():
+    return quote_cache.stats()
+
+# Request/error counters and latency per market-data upstream (per worker process)
+@app.get("/api/health/upstreams")
+async def upstream_stats():
+    return http_clients.stats()
+
 @app.get("/")
 async def root():
     return {"message": "Portfolio Investment Platform API", "status": "running", "version": "1.0.0"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Enum as SQLEnum, Date, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Enum as SQLEnum, Date, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -144,6 +144,7 @@ class Portfolio(Base):
     positions = relationship("Position", back_populates="portfolio", cascade="all, delete-orphan")
     transactions = relationship("Transaction", back_populates="portfolio", cascade="all, delete-orphan")
     dividends = relationship("Dividend", back_populates="portfolio", cascade="all, delete-orphan")
+    daily_values = relationship("PortfolioDailyValue", back_populates="portfolio", cascade="all, delete-orphan")
     
 class Asset(Base):
     __tablename__ = "assets"
@@ -158,6 +159,8 @@ class Asset(Base):
     exchange = Column(String)  # B3, NYSE, NASDAQ, etc.
     sector = Column(String)
     industry = Column(String)
+    last_fetched_at = Column(DateTime(timezone=True))  # Última cotação obtida do provedor (UTC)
+    last_attempted_at = Column(DateTime(timezone=True))  # Última tentativa, com ou sem cotação (UTC)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -168,6 +171,9 @@ class Asset(Base):
 
 class Position(Base):
     __tablename__ = "positions"
+    __table_args__ = (
+        Index("ix_positions_portfolio_asset", "portfolio_id", "asset_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
@@ -186,6 +192,25 @@ class Position(Base):
     asset = relationship("Asset", back_populates="positions")
     dividends = relationship("Dividend", back_populates="position", cascade="all, delete-orphan")
 
+class PositionCheckpoint(Base):
+    """Position state after replaying a portfolio/asset ledger up to a given transaction"""
+    __tablename__ = "position_checkpoints"
+    __table_args__ = (
+        Index("ix_position_checkpoints_lookup", "portfolio_id", "asset_id", "date"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    asset_id = Column(Integer, ForeignKey("assets.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)  # Data da última transação aplicada
+    transaction_id = Column(Integer, nullable=False)  # Última transação aplicada
+    event_count = Column(Integer, nullable=False)  # Transações aplicadas até aqui
+    quantity = Column(Float, nullable=False, default=0)
+    average_price = Column(Float, nullable=False, default=0)
+    total_invested = Column(Float, nullable=False, default=0)
+    realized_pnl = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Transaction(Base):
     __tablename__ = "transactions"
     
@@ -209,6 +234,9 @@ class Transaction(Base):
 
 class Price(Base):
     __tablename__ = "prices"
+    __table_args__ = (
+        Index("ix_prices_asset_date", "asset_id", "date", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False)
@@ -225,6 +253,9 @@ class Price(Base):
 
 class ExchangeRate(Base):
     __tablename__ = "exchange_rates"
+    __table_args__ = (
+        Index("ix_exchange_rates_pair_date", "from_currency", "to_currency", "date", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     from_currency = Column(SQLEnum(Currency), nullable=False)
@@ -233,6 +264,24 @@ class ExchangeRate(Base):
     rate = Column(Float, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class PortfolioDailyValue(Base):
+    """Materialized daily valuation of a portfolio (one row per calendar day)"""
+    __tablename__ = "portfolio_daily_values"
+    __table_args__ = (
+        Index("ix_portfolio_daily_values_portfolio_date", "portfolio_id", "date", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    market_value = Column(Float, nullable=False, default=0)  # Valor de mercado das posições
+    invested = Column(Float, nullable=False, default=0)  # Custo das posições em aberto (ledger)
+    cash = Column(Float, nullable=False, default=0)  # Saldo em caixa acumulado
+    net_flow = Column(Float, nullable=False, default=0)  # Aportes - resgates do dia
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    portfolio = relationship("Portfolio", back_populates="daily_values")
+
 class Alert(Base):
     __tablename__ = "alerts"
     
@@ -249,13 +298,17 @@ class Alert(Base):
 
 class Benchmark(Base):
     __tablename__ = "benchmarks"
+    __table_args__ = (
+        Index("ix_benchmarks_symbol_date", "symbol", "date", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String, unique=True, nullable=False)  # CDI, IBOV, SP500, etc.
+    symbol = Column(String, nullable=False)  # CDI, IBOV, SP500, etc.
     name = Column(String, nullable=False)
     date = Column(Date, nullable=False, index=True)
     value = Column(Float, nullable=False)
     daily_return = Column(Float)
+    cumulative_index = Column(Float)  # Fator acumulado desde o início da série (CDI, SELIC, IPCA)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 # Enum for dividend types
@@ -313,3 +366,24 @@ class Dividend(Base):
     position = relationship("Position", back_populates="dividends")
     asset = relationship("Asset", back_populates="dividends")
     portfolio = relationship("Portfolio", back_populates="dividends")
+
+class DividendSummary(Base):
+    """Dividend analytics per asset (per-share amounts, deduplicated across portfolios)"""
+    __tablename__ = "dividend_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False, unique=True)
+    payments_count = Column(Integer, nullable=False, default=0)
+    first_payment_date = Column(Date, nullable=True)
+    last_payment_date = Column(Date, nullable=True)
+    ttm_per_share = Column(Float, nullable=False, default=0)  # Proventos por ação nos últimos 12 meses
+    ttm_yield = Column(Float, nullable=True)  # TTM / último preço (%)
+    last_full_year = Column(Integer, nullable=True)  # Último ano-calendário completo com pagamentos
+    last_year_per_share = Column(Float, nullable=True)
+    yoy_growth = Column(Float, nullable=True)  # Crescimento ano contra ano (%)
+    cagr = Column(Float, nullable=True)  # Crescimento anual composto (%)
+    cagr_years = Column(Integer, nullable=True)
+    yearly_per_share = Column(JSON, nullable=True)  # {ano: proventos por ação}
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    asset = relationship("Asset")
@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from .. import models, schemas, auth
 from ..database import get_db
-from ..services import MarketDataService
+from ..services import MarketDataService, PortfolioCalculator
+from ..services.price_scheduler import scheduler_enabled, request_price_fetch
+from ..services.symbol_catalog import add_to_catalog, asset_entry
 
 router = APIRouter()
 
@@ -51,10 +53,13 @@ def create_asset(
     db.add(db_asset)
     db.commit()
     db.refresh(db_asset)
+    add_to_catalog([asset_entry(db_asset)])
     
-    # Try to update price
-    market_service = MarketDataService(db)
-    market_service.update_asset_price(db_asset)
+    # First quote comes from the background scheduler, so creation does not wait on the provider
+    if scheduler_enabled():
+        request_price_fetch([db_asset.id])
+    else:
+        MarketDataService(db).update_asset_price(db_asset)
     
     return db_asset
 
@@ -64,23 +69,27 @@ def search_assets(
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Search for assets by symbol or name using external APIs (Brapi + Yahoo Finance)"""
+    """Search for assets by symbol or name in the local symbol catalog (Yahoo Finance on misses)"""
     try:
         market_service = MarketDataService(db)
         results = market_service.search_asset(q)
         
+        # Catalog entries carry no price: stored assets get their latest close in one query
+        latest_prices = PortfolioCalculator(db).get_latest_prices([asset_data.get('id') for asset_data in results])
+        
         # Convert to response format
         formatted_results = []
         for asset_data in results:
+            # Listing and catalog entries hold None for unknown columns, so .get() defaults would not apply
             formatted_results.append({
-                'id': None,  # Not in database yet
+                'id': asset_data.get('id'),  # None when not in database yet
                 'symbol': asset_data.get('symbol'),
                 'name': asset_data.get('name'),
-                'asset_type': asset_data.get('asset_type', 'STOCK'),
+                'asset_type': asset_data.get('asset_type') or 'STOCK',
                 'sector': asset_data.get('sector'),
                 'exchange': asset_data.get('exchange'),
-                'currency': asset_data.get('currency', 'BRL'),
-                'current_price': asset_data.get('current_price'),
+                'currency': asset_data.get('currency') or 'BRL',
+                'current_price': latest_prices.get(asset_data.get('id'), asset_data.get('current_price')),
                 'market_cap': asset_data.get('market_cap'),
                 'industry': asset_data.get('industry')
             })
@@ -203,19 +212,10 @@ def batch_update_prices(
         models.Portfolio.owner_id == current_user.id
     ).distinct().all()
     
-    market_service = MarketDataService(db)
-    updated_count = 0
-    failed_count = 0
-    
-    for asset in assets:
-        price = market_service.update_asset_price(asset)
-        if price:
-            updated_count += 1
-        else:
-            failed_count += 1
+    # One batched download and one write for all assets
+    result = MarketDataService(db).bulk_update_prices(assets)
     
     return {
         "message": "Batch update completed",
-        "updated": updated_count,
-        "failed": failed_count
+        **result
     }
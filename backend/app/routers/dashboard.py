@@ -2,9 +2,15 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
+import pandas as pd
 from .. import models, schemas, auth
 from ..database import get_db
 from ..services.portfolio_calc import PortfolioCalculator
+from ..services.dashboard_service import DashboardService
+from ..services.fx import FXService
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -15,48 +21,10 @@ def get_dashboard(
 ):
     """Get dashboard data for current user"""
     try:
-        # Get all portfolios (simplified)
-        portfolios = db.query(models.Portfolio).filter(
-            models.Portfolio.owner_id == current_user.id
-        ).all()
-        
-        portfolio_summaries = []
-        
-        # Simple portfolio summaries without complex calculations
-        for portfolio in portfolios:
-            summary = schemas.PortfolioSummary(
-                portfolio_id=portfolio.id,
-                portfolio_name=portfolio.name,
-                total_value=0,
-                total_invested=0,
-                total_return=0,
-                total_return_percentage=0,
-                currency=portfolio.currency,
-                positions_count=0,
-                last_update=datetime.utcnow()
-            )
-            portfolio_summaries.append(summary)
-        
-        # Simple return data (no complex calculations)
-        return schemas.DashboardData(
-            portfolios=portfolio_summaries,
-            total_patrimony=0,
-            total_invested=0,
-            total_return=0,
-            total_return_percentage=0,
-            asset_allocation=[],
-            performance_metrics=schemas.PerformanceMetrics(
-                daily_return=None,
-                monthly_return=None,
-                yearly_return=0,
-                volatility=None,
-                sharpe_ratio=None,
-                max_drawdown=None,
-                beta=None,
-                alpha=None
-            ),
-            recent_transactions=[]
-        )
+        # Positions, prices, allocation and returns of every portfolio in a fixed number of queries
+        data = DashboardService(db).build(current_user.id)
+        data['performance_metrics'] = schemas.PerformanceMetrics(**data['performance_metrics'])
+        return schemas.DashboardData(**data)
     except Exception as e:
         print(f"Error in get_dashboard: {e}")
         # Return empty dashboard data if everything fails
@@ -110,61 +78,36 @@ def get_portfolio_evolution(
     if not portfolios:
         return {"data": []}
     
-    # Calculate current total value
-    current_total = 0
-    current_invested = 0
+    # Sum the materialized daily values of every portfolio, converted to BRL as of each day
+    fx = FXService(db).cube()
+    combined = None
     for portfolio in portfolios:
-        values = calc.calculate_portfolio_value(portfolio.id)
-        if portfolio.currency == models.Currency.BRL:
-            current_total += values.get('total_value', 0)
-            current_invested += values.get('total_invested', 0)
+        series = calc.snapshots.get_series(portfolio.id, start_date, end_date)[['market_value', 'invested']]
+        series = fx.convert_series(series, portfolio.currency, models.Currency.BRL)
+        if series is None:
+            logger.warning(f"No exchange rate {portfolio.currency.value}/BRL, skipping portfolio {portfolio.id}")
+            continue
+        combined = series if combined is None else combined.add(series, fill_value=0)
     
-    if current_total == 0:
+    if combined is None or combined.empty or combined['market_value'].iloc[-1] == 0:
         return {"data": []}
     
-    # Generate evolution data points
-    evolution_data = []
-    
     # Number of points based on period
-    num_points = min(20, days) if days > 20 else days
-    if days == 1:
-        num_points = 24  # Hourly for 1 day
+    num_points = min(20, days)
+    step = max(1, len(combined) // num_points)
+    sampled = combined.iloc[::step]
+    if sampled.index[-1] != combined.index[-1]:
+        sampled = pd.concat([sampled, combined.iloc[[-1]]])
     
-    for i in range(num_points + 1):
-        if days == 1:
-            # For 1 day, show hourly data
-            date_time = datetime.now() - timedelta(hours=24-i)
-            date_str = date_time.isoformat()
-        else:
-            # For other periods, show daily data
-            days_back = days - (i * days // num_points)
-            date_obj = end_date - timedelta(days=days_back)
-            date_str = date_obj.isoformat()
-        
-        # Create realistic evolution based on current values
-        progress = i / num_points
-        
-        # Base growth trend
-        base_factor = 0.95 + progress * 0.08  # Start at 95%, end at 103%
-        
-        # Add some realistic volatility
-        import hashlib
-        date_hash = int(hashlib.md5(f"{date_str}_{current_user.id}".encode()).hexdigest()[:8], 16)
-        volatility = (date_hash % 100 - 50) / 1000  # ±5% volatility
-        
-        # Calculate value
-        factor = base_factor + volatility
-        value = current_invested * factor
-        
-        # Ensure the last point matches current total
-        if i == num_points:
-            value = current_total
-        
+    evolution_data = []
+    for day, row in sampled.iterrows():
+        value = float(row['market_value'])
+        invested = float(row['invested'])
         evolution_data.append({
-            "date": date_str,
+            "date": day.date().isoformat(),
             "value": round(max(0, value), 2),
-            "invested": current_invested,
-            "return": round(value - current_invested, 2)
+            "invested": invested,
+            "return": round(value - invested, 2)
         })
     
-    return {"data": evolution_data}
\ No newline at end of file
+    return {"data": evolution_data}
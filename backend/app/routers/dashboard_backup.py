@@ -4,7 +4,8 @@ from typing import Optional
 from datetime import datetime, timedelta
 from .. import models, schemas, auth
 from ..database import get_db
-from ..services import PortfolioCalculator, MarketDataService
+from ..services import PortfolioCalculator
+from ..services.fx import FXService
 
 router = APIRouter()
 
@@ -26,6 +27,8 @@ def get_dashboard(
     total_invested = 0
     total_return = 0
     
+    fx = FXService(db).cube()
+    
     # Calculate values for each portfolio
     for portfolio in portfolios:
         values = calc.calculate_portfolio_value(portfolio.id)
@@ -44,11 +47,12 @@ def get_dashboard(
         
         portfolio_summaries.append(summary)
         
-        # Convert to BRL for total calculation (simplified - should use exchange rates)
-        if portfolio.currency == models.Currency.BRL:
-            total_patrimony += values.get('total_value', 0)
-            total_invested += values.get('total_invested', 0)
-            total_return += values.get('total_return', 0)
+        # Convert to BRL for total calculation
+        rate = fx.rate(portfolio.currency, models.Currency.BRL)
+        if rate is not None:
+            total_patrimony += values.get('total_value', 0) * rate
+            total_invested += values.get('total_invested', 0) * rate
+            total_return += values.get('total_return', 0) * rate
     
     # Calculate total asset allocation across all portfolios
     allocation_map = {}
@@ -102,7 +106,7 @@ def get_dashboard(
                 models.Asset.id == transaction.asset_id
             ).first()
     
-    return schemas.DashboardData((
+    return schemas.DashboardData(
         portfolios=portfolio_summaries,
         total_patrimony=total_patrimony,
         total_invested=total_invested,
@@ -182,6 +186,7 @@ def get_portfolio_evolution(
         # For now, return a simplified evolution based on current values
         # TODO: Implement proper historical data tracking for better performance
         evolution_data = []
+        fx = FXService(db).cube()
         
         # Sample data points instead of daily calculations to avoid performance issues
         sample_dates = [
@@ -198,9 +203,9 @@ def get_portfolio_evolution(
                 total_value = 0
                 for portfolio in portfolios:
                     values = calc.calculate_portfolio_value(portfolio.id)
-                    # Simplified - should convert using exchange rates
-                    if portfolio.currency == models.Currency.BRL:
-                        total_value += values.get('total_value', 0)
+                    converted = fx.convert(values.get('total_value', 0), portfolio.currency, models.Currency.BRL, sample_date)
+                    if converted is not None:
+                        total_value += converted
                 
                 if total_value > 0:
                     evolution_data.append({
@@ -228,11 +233,8 @@ def get_benchmark_comparison(
     if not portfolio:
         return {"error": "Portfolio not found"}
     
-    # Update benchmark data
-    market_service = MarketDataService(db)
-    market_service.update_benchmark_data(benchmark, period)
-    
-    # Get benchmark data
+    # Get benchmark data: kept current by the price scheduler (BenchmarkIngestion),
+    # so this is only a read of the (symbol, date) index
     period_map = {
         "1m": 30,
         "3m": 90,
@@ -246,7 +248,7 @@ def get_benchmark_comparison(
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=days)
     
-    benchmark_data = db.query(models.Benchmark).filter(
+    benchmark_data = db.query(models.Benchmark.date, models.Benchmark.value).filter(
         models.Benchmark.symbol == benchmark,
         models.Benchmark.date >= start_date,
         models.Benchmark.date <= end_date
@@ -4,9 +4,16 @@ from typing import List, Optional
 from datetime import date, datetime, timedelta
 from .. import models, schemas, auth
 from ..database import get_db
+from ..services.cashflow import CashflowProjector, invalidate_cashflow_cache
+from ..services.dividend_analytics import DividendAnalytics
 
 router = APIRouter()
 
+def _dividends_changed(db: Session, portfolio_id: int, *asset_ids: int):
+    """Refresh derived dividend data after a create/update/delete"""
+    invalidate_cashflow_cache(portfolio_id)
+    DividendAnalytics(db).refresh(sorted(set(asset_ids)))
+
 @router.get("/", response_model=List[schemas.Dividend])
 def get_dividends(
     portfolio_id: Optional[int] = Query(None, description="Filtrar por portfólio"),
@@ -103,6 +110,7 @@ def create_dividend(
     # Update position dividends_received
     position.dividends_received = (position.dividends_received or 0) + net_amount
     db.commit()
+    _dividends_changed(db, dividend.portfolio_id, dividend.asset_id)
     
     return db_dividend
 
@@ -141,6 +149,7 @@ def update_dividend(
     
     # Get old net amount for position update
     old_net_amount = dividend.net_amount or 0
+    old_asset_id = dividend.asset_id
     
     # Update dividend fields
     update_data = dividend_update.model_dump(exclude_unset=True)
@@ -167,6 +176,8 @@ def update_dividend(
     
     db.commit()
     db.refresh(dividend)
+    # A dividend moved to another asset leaves the old asset's summary stale too
+    _dividends_changed(db, dividend.portfolio_id, old_asset_id, dividend.asset_id)
     
     return dividend
 
@@ -195,6 +206,7 @@ def delete_dividend(
     
     db.delete(dividend)
     db.commit()
+    _dividends_changed(db, dividend.portfolio_id, dividend.asset_id)
     
     return {"message": "Dividend deleted successfully"}
 
@@ -216,55 +228,37 @@ def get_cashflow_projections(
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    # Get recurring dividends
-    recurring_dividends = db.query(models.Dividend).filter(
-        models.Dividend.portfolio_id == portfolio_id,
-        models.Dividend.is_recurring == True
-    ).all()
-    
-    projections = []
-    current_date = datetime.now().date()
-    end_date = current_date + timedelta(days=months_ahead * 30)
-    
-    for dividend in recurring_dividends:
-        # Get asset symbol
-        asset = db.query(models.Asset).filter(models.Asset.id == dividend.asset_id).first()
-        if not asset:
-            continue
-            
-        # Calculate projection dates based on frequency
-        projection_date = dividend.payment_date
-        
-        while projection_date <= end_date:
-            if projection_date >= current_date:
-                projections.append(schemas.CashflowProjection(
-                    date=projection_date.isoformat(),
-                    amount=dividend.net_amount or dividend.total_amount,
-                    dividend_type=dividend.dividend_type,
-                    asset_symbol=asset.symbol,
-                    frequency=dividend.frequency,
-                    is_projected=True
-                ))
-            
-            # Calculate next payment date based on frequency
-            if dividend.frequency == models.PaymentFrequency.MONTHLY:
-                projection_date = projection_date.replace(month=projection_date.month + 1) if projection_date.month < 12 else projection_date.replace(year=projection_date.year + 1, month=1)
-            elif dividend.frequency == models.PaymentFrequency.QUARTERLY:
-                month = projection_date.month + 3
-                year = projection_date.year + (month - 1) // 12
-                month = ((month - 1) % 12) + 1
-                projection_date = projection_date.replace(year=year, month=month)
-            elif dividend.frequency == models.PaymentFrequency.SEMIANNUAL:
-                month = projection_date.month + 6
-                year = projection_date.year + (month - 1) // 12
-                month = ((month - 1) % 12) + 1
-                projection_date = projection_date.replace(year=year, month=month)
-            elif dividend.frequency == models.PaymentFrequency.ANNUAL:
-                projection_date = projection_date.replace(year=projection_date.year + 1)
-            else:
-                break  # EVENTUAL - no projection
-    
-    # Sort by date
-    projections.sort(key=lambda x: x.date)
-    
-    return projections
+    return CashflowProjector(db).project(portfolio_id, months_ahead)
+
+@router.get("/portfolio/{portfolio_id}/analytics", response_model=schemas.PortfolioDividendAnalytics)
+def get_dividend_analytics(
+    portfolio_id: int,
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get dividend income by year, TTM, YoY growth and CAGR for a portfolio"""
+    
+    # Verify portfolio ownership
+    portfolio = db.query(models.Portfolio).filter(
+        models.Portfolio.id == portfolio_id,
+        models.Portfolio.owner_id == current_user.id
+    ).first()
+    
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    return DividendAnalytics(db).portfolio_analytics(portfolio_id)
+
+@router.get("/asset/{asset_id}/summary", response_model=schemas.DividendSummary)
+def get_dividend_summary(
+    asset_id: int,
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get per-share dividend analytics of an asset"""
+    summary = DividendAnalytics(db).summaries([asset_id]).get(asset_id)
+    
+    if not summary:
+        raise HTTPException(status_code=404, detail="No dividends for this asset")
+    
+    return summary
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+import pandas as pd
 from .. import models, schemas, auth
 from ..database import get_db
 from ..services import PortfolioCalculator
 from ..services.advanced_calculator import AdvancedCalculator
+from ..services.performance import HORIZONS
 
 router = APIRouter()
 
@@ -130,19 +132,21 @@ def get_portfolio_positions(
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    positions = db.query(models.Position).filter(
+    positions = db.query(models.Position).options(
+        joinedload(models.Position.asset)
+    ).filter(
         models.Position.portfolio_id == portfolio_id
     ).all()
     
-    # Update and include asset information
+    # Current values are computed on read; PositionRefresher persists them
     calc = PortfolioCalculator(db)
-    for position in positions:
-        calc.update_position(position)
-        position.asset = db.query(models.Asset).filter(
-            models.Asset.id == position.asset_id
-        ).first()
+    prices = calc.get_latest_prices([position.asset_id for position in positions])
+    valuations = calc.value_positions(positions, prices)
     
-    return positions
+    return [
+        schemas.Position.model_validate(position).model_copy(update=valuations[position.id])
+        for position in positions
+    ]
 
 @router.get("/{portfolio_id}/allocation")
 def get_portfolio_allocation(
@@ -165,14 +169,44 @@ def get_portfolio_allocation(
     
     return allocation
 
+@router.get("/{portfolio_id}/lots", response_model=schemas.PortfolioLots)
+def get_portfolio_lots(
+    portfolio_id: int,
+    method: schemas.LotMethodEnum = schemas.LotMethodEnum.FIFO,
+    include_realized: bool = True,
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get open and realized tax lots for a portfolio (FIFO or average cost)"""
+    # Verify portfolio ownership
+    portfolio = db.query(models.Portfolio).filter(
+        models.Portfolio.id == portfolio_id,
+        models.Portfolio.owner_id == current_user.id
+    ).first()
+    
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    calc = PortfolioCalculator(db)
+    lots = calc.calculate_lots(portfolio_id, method.value, include_realized)
+    
+    return {"portfolio_id": portfolio_id, "method": method, **lots}
+
 @router.get("/{portfolio_id}/performance")
 def get_portfolio_performance(
     portfolio_id: int,
     period_days: int = 365,
+    horizons: Optional[List[str]] = Query(None, description="e.g. horizons=1d&horizons=ytd or horizons=1d,1m,inception"),
+    rolling_window: int = 63,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get performance metrics for a portfolio"""
+    """Get performance for a portfolio
+    
+    Without horizons: value evolution over period_days (chart points).
+    With horizons: return, volatility and Sharpe for each horizon plus rolling
+    volatility/Sharpe, all computed from a single series read.
+    """
     # Verify portfolio ownership
     portfolio = db.query(models.Portfolio).filter(
         models.Portfolio.id == portfolio_id,
@@ -182,58 +216,71 @@ def get_portfolio_performance(
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    from datetime import datetime, timedelta
+    if horizons:
+        requested = [h.strip().lower() for value in horizons for h in value.split(',') if h.strip()]
+        unknown = [h for h in requested if h not in HORIZONS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown horizons: {', '.join(unknown)}. Valid: {', '.join(HORIZONS)}"
+            )
+        
+        calc = PortfolioCalculator(db)
+        metrics = calc.calculate_horizon_metrics(portfolio_id, list(dict.fromkeys(requested)), rolling_window)
+        return schemas.MultiHorizonPerformance(portfolio_id=portfolio_id, **metrics)
     
-    # Get current positions
-    positions = db.query(models.Position).filter(
-        models.Position.portfolio_id == portfolio_id
-    ).all()
+    from datetime import datetime, timedelta
     
-    if not positions:
-        return []
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=period_days)
     
-    current_total = sum(float(pos.current_value or 0) for pos in positions)
+    # Read the materialized daily values for the period
+    calc = PortfolioCalculator(db)
+    series = calc.snapshots.get_series(portfolio_id, start_date, end_date)
+    series = series[series['market_value'] > 0]
     
-    if current_total == 0:
+    if series.empty:
         return []
     
-    # Generate realistic evolution data
-    evolution_data = []
-    end_date = datetime.now().date()
     sample_interval = max(1, period_days // 30)  # 30 points max
+    sampled = series.iloc[::sample_interval]
+    if sampled.index[-1] != series.index[-1]:
+        sampled = pd.concat([sampled, series.iloc[[-1]]])
     
-    for i in range(0, period_days, sample_interval):
-        date_obj = end_date - timedelta(days=period_days - i)
-        
-        # Create realistic market movement
-        progress = i / period_days
-        
-        # Base trend: portfolio generally grows over time
-        base_growth = 0.94 + progress * 0.12  # 94% to 106%
-        
-        # Add market volatility based on date
-        date_seed = hash(f"market_{date_obj}") % 10000 / 10000
-        volatility = (date_seed - 0.5) * 0.06  # ±3% daily volatility
-        
-        # Portfolio-specific variation
-        portfolio_seed = hash(f"portfolio_{portfolio_id}_{date_obj}") % 10000 / 10000
-        portfolio_factor = (portfolio_seed - 0.5) * 0.02  # ±1% portfolio-specific
-        
-        final_factor = base_growth + volatility + portfolio_factor
-        value = current_total * final_factor
-        
+    evolution_data = []
+    for day, row in sampled.iterrows():
         evolution_data.append({
-            "date": date_obj.isoformat(),
-            "value": round(value, 2),
-            "formatted_date": date_obj.strftime("%d/%m")
+            "date": day.date().isoformat(),
+            "value": round(float(row['market_value']), 2),
+            "formatted_date": day.strftime("%d/%m")
         })
     
-    # Make sure the last point reflects current value
-    if evolution_data:
-        evolution_data[-1]["value"] = round(current_total, 2)
-    
     return evolution_data
 
+@router.get("/{portfolio_id}/benchmark-metrics", response_model=schemas.BenchmarkMetrics)
+def get_benchmark_metrics(
+    portfolio_id: int,
+    period_days: int = 365,
+    benchmark: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get benchmark-relative metrics (defaults to the portfolio's benchmark)"""
+    # Verify portfolio ownership
+    portfolio = db.query(models.Portfolio).filter(
+        models.Portfolio.id == portfolio_id,
+        models.Portfolio.owner_id == current_user.id
+    ).first()
+    
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    symbol = benchmark or portfolio.benchmark
+    calc = PortfolioCalculator(db)
+    metrics = calc.calculate_benchmark_metrics(portfolio_id, period_days, symbol)
+    
+    return {"benchmark": symbol, **metrics}
+
 @router.get("/{portfolio_id}/advanced-metrics", response_model=schemas.AdvancedPortfolioMetrics)
 def get_advanced_metrics(
     portfolio_id: int,
@@ -5,6 +5,8 @@ from datetime import date
 from .. import models, schemas, auth
 from ..database import get_db
 from ..services import PortfolioCalculator
+from ..services.position_refresher import PositionRefresher
+from ..services.position_ledger import earliest_dates
 
 router = APIRouter()
 
@@ -132,6 +134,9 @@ def update_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    old_date = transaction.date
+    old_asset_id = transaction.asset_id
+    
     for field, value in transaction_update.dict(exclude_unset=True).items():
         setattr(transaction, field, value)
     
@@ -140,14 +145,14 @@ def update_transaction(
     
     # Recalculate positions
     calc = PortfolioCalculator(db)
+    calc.snapshots.invalidate(transaction.portfolio_id, min(old_date, transaction.date))
     
-    # Recalculate all positions for this portfolio
-    positions = db.query(models.Position).filter(
-        models.Position.portfolio_id == transaction.portfolio_id
-    ).all()
-    
-    for position in positions:
-        calc.update_position(position)
+    # Replay affected positions from the nearest checkpoint before the edit
+    from_date = min(old_date, transaction.date)
+    calc.ledger.rebuild_positions(
+        transaction.portfolio_id,
+        {asset_id: from_date for asset_id in {old_asset_id, transaction.asset_id}}
+    )
     
     return transaction
 
@@ -169,20 +174,19 @@ def delete_transaction(
         raise HTTPException(status_code=404, detail="Transaction not found")
     
     portfolio_id = transaction.portfolio_id
+    asset_id = transaction.asset_id
+    transaction_date = transaction.date
     
     db.delete(transaction)
     db.commit()
     
     # Recalculate positions
     calc = PortfolioCalculator(db)
+    calc.snapshots.invalidate(portfolio_id, transaction_date)
     
-    # Recalculate all positions for this portfolio
-    positions = db.query(models.Position).filter(
-        models.Position.portfolio_id == portfolio_id
-    ).all()
-    
-    for position in positions:
-        calc.update_position(position)
+    # Replay the position from the nearest checkpoint before the deleted trade
+    if asset_id:
+        calc.ledger.rebuild_position(portfolio_id, asset_id, transaction_date)
     
     return {"message": "Transaction deleted successfully"}
 
@@ -213,8 +217,21 @@ def create_batch_transactions(
     
     db.commit()
     
-    # Process all transactions
-    for transaction in created_transactions:
+    # Positions are rebuilt once per portfolio instead of once per row
+    first_dates = earliest_dates((transaction.portfolio_id, transaction.date) for transaction in created_transactions)
+    dividends = [
+        transaction for transaction in created_transactions
+        if transaction.transaction_type == models.TransactionType.DIVIDEND
+    ]
+    
+    for portfolio_id, first_date in first_dates.items():
+        calc.snapshots.invalidate(portfolio_id, first_date, commit=False)
+        calc.ledger.bulk_rebuild(portfolio_id)
+    
+    if first_dates:
+        PositionRefresher(db).refresh(portfolio_ids=list(first_dates))
+    
+    for transaction in dividends:
         calc.process_transaction(transaction)
     
     return {
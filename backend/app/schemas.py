@@ -270,6 +270,46 @@ class PortfolioSummary(BaseModel):
     currency: str
     positions_count: int
     last_update: datetime
+    time_weighted_return: Optional[float] = None
+    time_weighted_return_annualized: Optional[float] = None
+    money_weighted_return: Optional[float] = None
+
+class LotMethodEnum(str, Enum):
+    FIFO = "FIFO"
+    AVERAGE = "AVERAGE"
+
+class OpenLot(BaseModel):
+    asset_id: int
+    asset_symbol: str
+    transaction_id: int
+    acquired_date: date
+    quantity: float
+    unit_cost: float
+    cost_basis: float
+    current_price: Optional[float] = None
+    current_value: Optional[float] = None
+    unrealized_pnl: Optional[float] = None
+    holding_days: int
+
+class RealizedLot(BaseModel):
+    asset_id: int
+    asset_symbol: str
+    transaction_id: int
+    sell_transaction_id: int
+    acquired_date: date
+    sold_date: date
+    quantity: float
+    cost_basis: float
+    proceeds: float
+    realized_pnl: float
+    holding_days: int
+
+class PortfolioLots(BaseModel):
+    portfolio_id: int
+    method: LotMethodEnum
+    open_lots: List[OpenLot]
+    realized_lots: List[RealizedLot]
+    total_realized_pnl: float
 
 class AssetAllocation(BaseModel):
     asset_type: str
@@ -287,6 +327,39 @@ class PerformanceMetrics(BaseModel):
     beta: Optional[float]
     alpha: Optional[float]
 
+class HorizonMetrics(BaseModel):
+    start_date: date
+    end_date: date
+    return_: float = Field(..., alias="return")
+    annualized_return: Optional[float] = None
+    volatility: float
+    sharpe_ratio: float
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class RollingMetricsPoint(BaseModel):
+    date: str
+    volatility: float
+    sharpe_ratio: float
+
+class MultiHorizonPerformance(BaseModel):
+    portfolio_id: int
+    as_of: Optional[date] = None
+    horizons: Dict[str, Optional[HorizonMetrics]]
+    rolling: List[RollingMetricsPoint] = Field(default_factory=list)
+
+class BenchmarkMetrics(BaseModel):
+    benchmark: str
+    beta: Optional[float] = None
+    alpha: Optional[float] = None
+    tracking_error: Optional[float] = None
+    active_return: Optional[float] = None
+    information_ratio: Optional[float] = None
+    up_capture: Optional[float] = None
+    down_capture: Optional[float] = None
+    correlation: Optional[float] = None
+    observations: int = 0
+
 class DashboardData(BaseModel):
     portfolios: List[PortfolioSummary]
     total_patrimony: float
@@ -500,3 +573,45 @@ class AdvancedPortfolioMetrics(BaseModel):
     
     # Métricas por ativo
     asset_metrics: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+
+class DividendSummary(BaseModel):
+    """Análise de proventos por ativo (valores por ação)"""
+    asset_id: int
+    payments_count: int
+    first_payment_date: Optional[date] = None
+    last_payment_date: Optional[date] = None
+    ttm_per_share: float = Field(..., description="Proventos por ação nos últimos 12 meses")
+    ttm_yield: Optional[float] = Field(None, description="Dividend yield dos últimos 12 meses (%)")
+    last_full_year: Optional[int] = Field(None, description="Último ano completo com pagamentos")
+    last_year_per_share: Optional[float] = None
+    yoy_growth: Optional[float] = Field(None, description="Crescimento ano contra ano (%)")
+    cagr: Optional[float] = Field(None, description="Crescimento anual composto (%)")
+    cagr_years: Optional[int] = None
+    yearly_per_share: Dict[str, float] = Field(default_factory=dict)
+    updated_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class DividendAssetAnalytics(BaseModel):
+    """Renda de proventos de um ativo no portfólio"""
+    asset_id: int
+    asset_symbol: str
+    ttm_income: float = Field(..., description="Renda recebida nos últimos 12 meses")
+    yearly_income: Dict[int, float] = Field(default_factory=dict)
+    yoy_growth: Optional[float] = Field(None, description="Crescimento da renda ano contra ano (%)")
+    cagr: Optional[float] = Field(None, description="Crescimento anual composto da renda (%)")
+    cagr_years: Optional[int] = None
+    ttm_per_share: Optional[float] = None
+    ttm_yield: Optional[float] = None
+    per_share_yoy_growth: Optional[float] = None
+    per_share_cagr: Optional[float] = None
+
+class PortfolioDividendAnalytics(BaseModel):
+    """Crescimento da renda de proventos do portfólio"""
+    portfolio_id: int
+    ttm_income: float
+    yearly_income: Dict[int, float] = Field(default_factory=dict)
+    yoy_growth: Optional[float] = None
+    cagr: Optional[float] = None
+    cagr_years: Optional[int] = None
+    assets: List[DividendAssetAnalytics] = Field(default_factory=list)
@@ -1,7 +1,19 @@
+import pandas as pd
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from typing import Dict, List, Optional
 from datetime import date, datetime, timedelta
 from .. import models, schemas
+from .cashflow import CashflowProjector
+from .dividend_analytics import DividendAnalytics
+
+# Payments per year of a recurring dividend
+PAYMENTS_PER_YEAR = {
+    models.PaymentFrequency.MONTHLY: 12,
+    models.PaymentFrequency.QUARTERLY: 4,
+    models.PaymentFrequency.SEMIANNUAL: 2,
+    models.PaymentFrequency.ANNUAL: 1
+}
 
 class AdvancedCalculator:
     """Advanced portfolio calculations including dividends and yield metrics"""
@@ -11,120 +23,27 @@ class AdvancedCalculator:
     
     def calculate_yield_metrics(self, position_id: int) -> schemas.YieldMetrics:
         """Calculate yield metrics for a position"""
-        position = self.db.query(models.Position).filter(
-            models.Position.id == position_id
-        ).first()
-        
-        if not position:
-            raise ValueError("Position not found")
-        
-        # Get all dividends for this position
-        dividends = self.db.query(models.Dividend).filter(
-            models.Dividend.position_id == position_id
-        ).all()
-        
-        total_dividends = sum(d.net_amount or d.total_amount for d in dividends)
-        
-        # Calculate Yield on Cost (YOC)
-        yield_on_cost = 0.0
-        if position.total_invested > 0:
-            # Annual dividend income based on last 12 months
-            one_year_ago = datetime.now().date() - timedelta(days=365)
-            recent_dividends = [d for d in dividends if d.payment_date >= one_year_ago]
-            annual_dividend_income = sum(d.net_amount or d.total_amount for d in recent_dividends)
-            yield_on_cost = (annual_dividend_income / position.total_invested) * 100
-        
-        # Calculate current yield
-        current_yield = 0.0
-        if position.current_value and position.current_value > 0:
-            # Annual dividend income / current market value
-            one_year_ago = datetime.now().date() - timedelta(days=365)
-            recent_dividends = [d for d in dividends if d.payment_date >= one_year_ago]
-            annual_dividend_income = sum(d.net_amount or d.total_amount for d in recent_dividends)
-            current_yield = (annual_dividend_income / position.current_value) * 100
-        
-        # Project annual and monthly income
-        annual_dividend_income = self._project_annual_income(position_id)
-        monthly_dividend_income = annual_dividend_income / 12
-        
-        # Calculate dividend growth rate (simplified)
-        dividend_growth_rate = self._calculate_dividend_growth_rate(position_id)
-        
-        return schemas.YieldMetrics(
-            yield_on_cost=yield_on_cost,
-            current_yield=current_yield,
-            annual_dividend_income=annual_dividend_income,
-            monthly_dividend_income=monthly_dividend_income,
-            total_dividends_received=total_dividends,
-            dividend_growth_rate=dividend_growth_rate
-        )
+        return self._single_position_metrics(position_id)['yield_metrics']
     
     def calculate_capital_gain_metrics(self, position_id: int) -> schemas.CapitalGainMetrics:
         """Calculate capital gain metrics for a position"""
-        position = self.db.query(models.Position).filter(
-            models.Position.id == position_id
-        ).first()
-        
-        if not position:
-            raise ValueError("Position not found")
-        
-        current_value = position.current_value or 0
-        total_invested = position.total_invested or 0
-        capital_gain = current_value - total_invested
-        capital_gain_percentage = (capital_gain / total_invested * 100) if total_invested > 0 else 0
-        
-        return schemas.CapitalGainMetrics(
-            total_invested=total_invested,
-            current_value=current_value,
-            capital_gain=capital_gain,
-            capital_gain_percentage=capital_gain_percentage,
-            average_purchase_price=position.average_price or 0,
-            current_price=position.current_price or 0
-        )
+        return self._single_position_metrics(position_id)['capital_gain_metrics']
     
     def calculate_total_return_metrics(self, position_id: int) -> schemas.TotalReturnMetrics:
         """Calculate total return including capital gains and dividends"""
-        position = self.db.query(models.Position).filter(
-            models.Position.id == position_id
-        ).first()
-        
-        if not position:
-            raise ValueError("Position not found")
-        
-        # Get capital gain
-        capital_gain_metrics = self.calculate_capital_gain_metrics(position_id)
-        capital_gain = capital_gain_metrics.capital_gain
-        
-        # Get dividend income
-        dividends = self.db.query(models.Dividend).filter(
-            models.Dividend.position_id == position_id
-        ).all()
-        dividend_income = sum(d.net_amount or d.total_amount for d in dividends)
-        
-        # Calculate total return
-        total_return = capital_gain + dividend_income
-        total_return_percentage = (total_return / position.total_invested * 100) if position.total_invested > 0 else 0
-        
-        # Calculate annualized return (simplified - needs holding period)
-        annualized_return = self._calculate_annualized_return(position_id, total_return_percentage)
-        
-        return schemas.TotalReturnMetrics(
-            total_return=total_return,
-            total_return_percentage=total_return_percentage,
-            capital_gain=capital_gain,
-            dividend_income=dividend_income,
-            annualized_return=annualized_return
-        )
+        return self._single_position_metrics(position_id)['total_return_metrics']
     
     def calculate_portfolio_advanced_metrics(self, portfolio_id: int) -> schemas.AdvancedPortfolioMetrics:
         """Calculate advanced metrics for entire portfolio"""
         
-        # Get all positions in portfolio
-        positions = self.db.query(models.Position).filter(
+        # Positions with their asset symbol in one query
+        rows = self.db.query(models.Position, models.Asset.symbol).join(
+            models.Asset, models.Position.asset_id == models.Asset.id
+        ).filter(
             models.Position.portfolio_id == portfolio_id
         ).all()
         
-        if not positions:
+        if not rows:
             # Return empty metrics if no positions
             return schemas.AdvancedPortfolioMetrics(
                 yield_metrics=schemas.YieldMetrics(
@@ -150,19 +69,22 @@ class AdvancedCalculator:
                 )
             )
         
+        positions = [position for position, _ in rows]
+        
+        # All dividends of the portfolio, loaded once and grouped in memory
+        dividends = self._dividend_frame(models.Dividend.portfolio_id == portfolio_id)
+        per_position = self._batch_position_metrics(positions, dividends)
+        
         # Aggregate metrics
         total_invested = sum(p.total_invested or 0 for p in positions)
         total_current_value = sum(p.current_value or 0 for p in positions)
         total_capital_gain = total_current_value - total_invested
-        
-        # Get all dividends for portfolio
-        all_dividends = self.db.query(models.Dividend).filter(
-            models.Dividend.portfolio_id == portfolio_id
-        ).all()
-        total_dividend_income = sum(d.net_amount or d.total_amount for d in all_dividends)
+        total_dividend_income = float(dividends['amount'].sum())
         
         # Calculate portfolio yield metrics
-        annual_dividend_income = self._project_annual_income_portfolio(portfolio_id)
+        annual_dividend_income = sum(
+            metrics['yield_metrics'].annual_dividend_income for metrics in per_position.values()
+        )
         yield_on_cost = (annual_dividend_income / total_invested * 100) if total_invested > 0 else 0
         current_yield = (annual_dividend_income / total_current_value * 100) if total_current_value > 0 else 0
         
@@ -175,22 +97,13 @@ class AdvancedCalculator:
         
         # Per-asset metrics
         asset_metrics = {}
-        for position in positions:
-            asset = self.db.query(models.Asset).filter(models.Asset.id == position.asset_id).first()
-            if asset:
-                try:
-                    yield_metrics = self.calculate_yield_metrics(position.id)
-                    capital_metrics = self.calculate_capital_gain_metrics(position.id)
-                    total_metrics = self.calculate_total_return_metrics(position.id)
-                    
-                    asset_metrics[asset.symbol] = {
-                        "yield_metrics": yield_metrics.model_dump(),
-                        "capital_gain_metrics": capital_metrics.model_dump(),
-                        "total_return_metrics": total_metrics.model_dump()
-                    }
-                except Exception:
-                    # Skip assets with calculation errors
-                    continue
+        for position, symbol in rows:
+            metrics = per_position[position.id]
+            asset_metrics[symbol] = {
+                "yield_metrics": metrics['yield_metrics'].model_dump(),
+                "capital_gain_metrics": metrics['capital_gain_metrics'].model_dump(),
+                "total_return_metrics": metrics['total_return_metrics'].model_dump()
+            }
         
         return schemas.AdvancedPortfolioMetrics(
             yield_metrics=schemas.YieldMetrics(
@@ -218,137 +131,132 @@ class AdvancedCalculator:
             asset_metrics=asset_metrics
         )
     
-    def _project_annual_income(self, position_id: int) -> float:
-        """Project annual dividend income based on recurring dividends"""
-        recurring_dividends = self.db.query(models.Dividend).filter(
-            models.Dividend.position_id == position_id,
-            models.Dividend.is_recurring == True
-        ).all()
-        
-        annual_income = 0.0
-        
-        for dividend in recurring_dividends:
-            amount = dividend.net_amount or dividend.total_amount
-            
-            if dividend.frequency == models.PaymentFrequency.MONTHLY:
-                annual_income += amount * 12
-            elif dividend.frequency == models.PaymentFrequency.QUARTERLY:
-                annual_income += amount * 4
-            elif dividend.frequency == models.PaymentFrequency.SEMIANNUAL:
-                annual_income += amount * 2
-            elif dividend.frequency == models.PaymentFrequency.ANNUAL:
-                annual_income += amount
-            # EVENTUAL dividends are not projected
-        
-        return annual_income
-    
-    def _project_annual_income_portfolio(self, portfolio_id: int) -> float:
-        """Project annual dividend income for entire portfolio"""
-        positions = self.db.query(models.Position).filter(
-            models.Position.portfolio_id == portfolio_id
-        ).all()
-        
-        total_annual_income = 0.0
-        for position in positions:
-            total_annual_income += self._project_annual_income(position.id)
-        
-        return total_annual_income
-    
-    def _calculate_dividend_growth_rate(self, position_id: int) -> Optional[float]:
-        """Calculate dividend growth rate (simplified)"""
-        # This is a simplified implementation
-        # In practice, you'd want to compare year-over-year dividend payments
-        dividends = self.db.query(models.Dividend).filter(
-            models.Dividend.position_id == position_id
-        ).order_by(models.Dividend.payment_date).all()
-        
-        if len(dividends) < 2:
-            return None
-        
-        # Simple comparison of latest vs earliest (needs more sophisticated logic)
-        latest = dividends[-1]
-        earliest = dividends[0]
-        
-        if earliest.amount_per_share > 0:
-            growth = ((latest.amount_per_share - earliest.amount_per_share) / earliest.amount_per_share) * 100
-            return growth
-        
-        return None
-    
-    def _calculate_annualized_return(self, position_id: int, total_return_percentage: float) -> Optional[float]:
-        """Calculate annualized return (simplified)"""
-        # Get first transaction to estimate holding period
+    def _single_position_metrics(self, position_id: int) -> Dict:
         position = self.db.query(models.Position).filter(
             models.Position.id == position_id
         ).first()
         
         if not position:
-            return None
+            raise ValueError("Position not found")
         
-        # Get earliest transaction for this position
-        earliest_transaction = self.db.query(models.Transaction).filter(
-            models.Transaction.portfolio_id == position.portfolio_id,
-            models.Transaction.asset_id == position.asset_id
-        ).order_by(models.Transaction.date).first()
+        dividends = self._dividend_frame(models.Dividend.position_id == position_id)
+        return self._batch_position_metrics([position], dividends)[position.id]
+    
+    def _dividend_frame(self, condition) -> pd.DataFrame:
+        """Dividends matching condition as one DataFrame, ordered by payment date"""
+        rows = self.db.query(
+            models.Dividend.position_id,
+            models.Dividend.payment_date,
+            models.Dividend.amount_per_share,
+            models.Dividend.total_amount,
+            models.Dividend.net_amount,
+            models.Dividend.is_recurring,
+            models.Dividend.frequency
+        ).filter(condition).order_by(models.Dividend.payment_date, models.Dividend.id).all()
+        
+        frame = pd.DataFrame(rows, columns=[
+            'position_id', 'payment_date', 'amount_per_share', 'total_amount',
+            'net_amount', 'is_recurring', 'frequency'
+        ])
+        # Valor líquido quando informado, senão o total (mesma regra de "net_amount or total_amount")
+        net = frame['net_amount'].astype(float)
+        frame['amount'] = net.where(net.notna() & (net != 0), frame['total_amount'].astype(float))
+        return frame
+    
+    def _batch_position_metrics(self, positions: List[models.Position], dividends: pd.DataFrame) -> Dict[int, Dict]:
+        """Yield, capital gain and total return metrics of many positions in one pass
+        
+        dividends comes from _dividend_frame; first transaction dates are read
+        with a single grouped query.
+        """
+        today = datetime.now().date()
+        one_year_ago = today - timedelta(days=365)
+        
+        dividends = dividends[dividends['position_id'].isin([p.id for p in positions])]
+        grouped = dividends.groupby('position_id')
+        
+        total_by_position = grouped['amount'].sum().to_dict()
+        recent_by_position = dividends[dividends['payment_date'] >= one_year_ago].groupby('position_id')['amount'].sum().to_dict()
+        
+        # Projected annual income: recurring payments times payments per year (EVENTUAL is not projected)
+        per_year = dividends['frequency'].map(PAYMENTS_PER_YEAR).astype(float).fillna(0.0)
+        projected = (dividends['amount'] * per_year).where(dividends['is_recurring'].fillna(False).astype(bool), 0.0)
+        annual_by_position = projected.groupby(dividends['position_id']).sum().to_dict()
+        
+        # Year-over-year growth per share from the dividend summaries of the paying assets
+        paying = set(total_by_position)
+        growth_summaries = DividendAnalytics(self.db).summaries(
+            sorted({p.asset_id for p in positions if p.id in paying})
+        )
         
-        if not earliest_transaction:
-            return None
+        first_trades = self._first_transaction_dates(positions)
         
-        # Calculate holding period in years
-        holding_period = (datetime.now().date() - earliest_transaction.date).days / 365.25
+        results = {}
+        for position in positions:
+            total_invested = position.total_invested or 0
+            current_value = position.current_value or 0
+            total_dividends = float(total_by_position.get(position.id, 0.0))
+            recent_income = float(recent_by_position.get(position.id, 0.0))
+            annual_income = float(annual_by_position.get(position.id, 0.0))
+            
+            summary = growth_summaries.get(position.asset_id)
+            dividend_growth_rate = summary.yoy_growth if summary else None
+            
+            capital_gain = current_value - total_invested
+            total_return = capital_gain + total_dividends
+            total_return_percentage = (total_return / total_invested * 100) if total_invested > 0 else 0
+            
+            annualized_return = None
+            first_trade = first_trades.get((position.portfolio_id, position.asset_id))
+            if first_trade:
+                holding_period = (today - first_trade).days / 365.25
+                if holding_period > 0:
+                    annualized_return = ((1 + total_return_percentage / 100) ** (1 / holding_period) - 1) * 100
+            
+            results[position.id] = {
+                'yield_metrics': schemas.YieldMetrics(
+                    yield_on_cost=(recent_income / total_invested * 100) if total_invested > 0 else 0.0,
+                    current_yield=(recent_income / current_value * 100) if current_value > 0 else 0.0,
+                    annual_dividend_income=annual_income,
+                    monthly_dividend_income=annual_income / 12,
+                    total_dividends_received=total_dividends,
+                    dividend_growth_rate=dividend_growth_rate
+                ),
+                'capital_gain_metrics': schemas.CapitalGainMetrics(
+                    total_invested=total_invested,
+                    current_value=current_value,
+                    capital_gain=capital_gain,
+                    capital_gain_percentage=(capital_gain / total_invested * 100) if total_invested > 0 else 0,
+                    average_purchase_price=position.average_price or 0,
+                    current_price=position.current_price or 0
+                ),
+                'total_return_metrics': schemas.TotalReturnMetrics(
+                    total_return=total_return,
+                    total_return_percentage=total_return_percentage,
+                    capital_gain=capital_gain,
+                    dividend_income=total_dividends,
+                    annualized_return=annualized_return
+                )
+            }
         
-        if holding_period > 0:
-            # Annualized return = (1 + total_return)^(1/years) - 1
-            annualized = ((1 + total_return_percentage / 100) ** (1 / holding_period) - 1) * 100
-            return annualized
+        return results
+    
+    def _first_transaction_dates(self, positions: List[models.Position]) -> Dict:
+        """{(portfolio_id, asset_id): date of the first transaction}"""
+        rows = self.db.query(
+            models.Transaction.portfolio_id,
+            models.Transaction.asset_id,
+            func.min(models.Transaction.date)
+        ).filter(
+            models.Transaction.portfolio_id.in_({p.portfolio_id for p in positions}),
+            models.Transaction.asset_id.in_({p.asset_id for p in positions})
+        ).group_by(
+            models.Transaction.portfolio_id,
+            models.Transaction.asset_id
+        ).all()
         
-        return None
+        return {(portfolio_id, asset_id): first for portfolio_id, asset_id, first in rows}
     
     def _get_portfolio_cashflow_projections(self, portfolio_id: int, months_ahead: int) -> List[schemas.CashflowProjection]:
         """Get cashflow projections for portfolio"""
-        # This would be similar to the dividends router method
-        # Simplified implementation
-        recurring_dividends = self.db.query(models.Dividend).filter(
-            models.Dividend.portfolio_id == portfolio_id,
-            models.Dividend.is_recurring == True
-        ).all()
-        
-        projections = []
-        current_date = datetime.now().date()
-        end_date = current_date + timedelta(days=months_ahead * 30)
-        
-        for dividend in recurring_dividends:
-            asset = self.db.query(models.Asset).filter(models.Asset.id == dividend.asset_id).first()
-            if not asset:
-                continue
-                
-            projection_date = dividend.payment_date
-            
-            while projection_date <= end_date:
-                if projection_date >= current_date:
-                                    projections.append(schemas.CashflowProjection(
-                    date=projection_date.isoformat(),
-                        amount=dividend.net_amount or dividend.total_amount,
-                        dividend_type=dividend.dividend_type,
-                        asset_symbol=asset.symbol,
-                        frequency=dividend.frequency,
-                        is_projected=True
-                    ))
-                
-                # Calculate next payment date (simplified)
-                if dividend.frequency == models.PaymentFrequency.MONTHLY:
-                    if projection_date.month == 12:
-                        projection_date = projection_date.replace(year=projection_date.year + 1, month=1)
-                    else:
-                        projection_date = projection_date.replace(month=projection_date.month + 1)
-                elif dividend.frequency == models.PaymentFrequency.QUARTERLY:
-                    month = projection_date.month + 3
-                    year = projection_date.year + (month - 1) // 12
-                    month = ((month - 1) % 12) + 1
-                    projection_date = projection_date.replace(year=year, month=month)
-                elif dividend.frequency == models.PaymentFrequency.ANNUAL:
-                    projection_date = projection_date.replace(year=projection_date.year + 1)
-                else:
-                    break
-        
-        return sorted(projections, key=lambda x: x.date)
+        return CashflowProjector(self.db).project(portfolio_id, months_ahead)
@@ -0,0 +1,182 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from .. import models
+from .performance import TRADING_DAYS, DEFAULT_RISK_FREE_RATE
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rate benchmarks store the rate in value; their level is cumulative_index (see rate_series)
+RATE_BENCHMARKS = {"CDI", "SELIC", "IPCA"}
+
+# Aligned benchmark return series, keyed by (symbol, start, end). The cache is per
+# process: invalidate_benchmark_cache only reaches the process that ingested the
+# data, other workers see it once the (short) TTL expires
+_CACHE_TTL_SECONDS = 2 * 60
+_CACHE_MAX_ENTRIES = 256
+_series_cache: "OrderedDict[Tuple[str, date, date], Tuple[float, pd.Series]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def invalidate_benchmark_cache(symbol: Optional[str] = None):
+    """Drop cached series of one benchmark (or all of them) after new data is stored"""
+    with _cache_lock:
+        if symbol is None:
+            _series_cache.clear()
+            return
+        for key in [key for key in _series_cache if key[0] == symbol]:
+            del _series_cache[key]
+
+
+def _cache_get(key: Tuple[str, date, date]) -> Optional[pd.Series]:
+    with _cache_lock:
+        entry = _series_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, series = entry
+        if time.monotonic() - stored_at > _CACHE_TTL_SECONDS:
+            del _series_cache[key]
+            return None
+        _series_cache.move_to_end(key)
+        return series
+
+
+def _cache_put(key: Tuple[str, date, date], series: pd.Series):
+    with _cache_lock:
+        _series_cache[key] = (time.monotonic(), series)
+        _series_cache.move_to_end(key)
+        while len(_series_cache) > _CACHE_MAX_ENTRIES:
+            _series_cache.popitem(last=False)
+
+
+def relative_metrics(portfolio: pd.Series, benchmark: pd.Series,
+                     risk_free_rate: float = DEFAULT_RISK_FREE_RATE) -> Dict:
+    """Beta, Jensen's alpha, tracking error, information ratio and up/down capture
+
+    Both inputs are daily returns; they are inner-joined on their index so only
+    days present in both series are used. Alpha, tracking error and active
+    return are annualized and returned in %, captures in %.
+    """
+    aligned = pd.concat([portfolio.rename('portfolio'), benchmark.rename('benchmark')], axis=1, join='inner').dropna()
+    n = len(aligned)
+    if n < 2:
+        return {}
+
+    p = aligned['portfolio'].to_numpy(dtype=float)
+    b = aligned['benchmark'].to_numpy(dtype=float)
+    daily_rf = (1 + risk_free_rate) ** (1 / TRADING_DAYS) - 1
+
+    b_var = np.var(b, ddof=1)
+    beta = np.cov(p, b, ddof=1)[0, 1] / b_var if b_var > 0 else None
+
+    alpha = None
+    if beta is not None:
+        alpha = (p.mean() - (daily_rf + beta * (b.mean() - daily_rf))) * TRADING_DAYS
+
+    active = p - b
+    tracking_error = np.std(active, ddof=1) * np.sqrt(TRADING_DAYS)
+    active_return = active.mean() * TRADING_DAYS
+    information_ratio = active_return / tracking_error if tracking_error > 0 else None
+
+    up = b > 0
+    down = b < 0
+    up_capture = p[up].mean() / b[up].mean() if up.any() else None
+    down_capture = p[down].mean() / b[down].mean() if down.any() else None
+
+    correlation = None
+    if np.std(p) > 0 and np.std(b) > 0:
+        correlation = float(np.corrcoef(p, b)[0, 1])
+
+    def pct(value):
+        return float(value) * 100 if value is not None else None
+
+    return {
+        'beta': float(beta) if beta is not None else None,
+        'alpha': pct(alpha),
+        'tracking_error': pct(tracking_error),
+        'active_return': pct(active_return),
+        'information_ratio': float(information_ratio) if information_ratio is not None else None,
+        'up_capture': pct(up_capture),
+        'down_capture': pct(down_capture),
+        'correlation': correlation,
+        'observations': n
+    }
+
+
+class BenchmarkAnalytics:
+    """Aligns benchmark series to business days and compares portfolios against them"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def benchmark_returns(self, symbol: str, start_date: date, end_date: date) -> pd.Series:
+        """Daily benchmark returns on the business-day index of [start_date, end_date]"""
+        key = (symbol, start_date, end_date)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+        days = pd.bdate_range(start_date, end_date)
+        series = pd.Series(dtype=float)
+
+        if len(days) > 0:
+            level = models.Benchmark.cumulative_index if symbol in RATE_BENCHMARKS else models.Benchmark.value
+
+            # Last stored point before the window seeds the forward fill
+            last_before = self.db.query(func.max(models.Benchmark.date)).filter(
+                models.Benchmark.symbol == symbol,
+                models.Benchmark.date < start_date,
+                level.isnot(None)
+            ).scalar()
+            query_start = last_before or start_date
+
+            rows = self.db.query(models.Benchmark.date, level).filter(
+                models.Benchmark.symbol == symbol,
+                models.Benchmark.date >= query_start,
+                models.Benchmark.date <= end_date,
+                level.isnot(None)
+            ).order_by(models.Benchmark.date).all()
+
+            if rows:
+                values = pd.DataFrame(rows, columns=['date', 'value'])
+                values['date'] = pd.to_datetime(values['date'])
+                values = values.drop_duplicates('date', keep='last').set_index('date')['value']
+
+                index = days
+                if last_before is not None:
+                    index = days.insert(0, pd.Timestamp(last_before))
+                levels = values.reindex(values.index.union(index)).ffill().reindex(index)
+                # Rate benchmarks accrue nothing on days without a stored factor (holidays)
+                series = levels.pct_change().reindex(days)
+
+        _cache_put(key, series)
+        return series
+
+    def compare(self, portfolio_returns: pd.Series, symbol: str,
+                risk_free_rate: float = DEFAULT_RISK_FREE_RATE) -> Dict:
+        """relative_metrics of a portfolio return series against a benchmark"""
+        if portfolio_returns.empty:
+            return {}
+        try:
+            start_date = portfolio_returns.index[0].date()
+            end_date = portfolio_returns.index[-1].date()
+            benchmark = self.benchmark_returns(symbol, start_date, end_date)
+            if benchmark.dropna().empty:
+                return {}
+
+            # First portfolio return is a placeholder (no previous value)
+            metrics = relative_metrics(portfolio_returns.iloc[1:], benchmark, risk_free_rate)
+            if metrics:
+                metrics['benchmark'] = symbol
+            return metrics
+
+        except Exception as e:
+            logger.error(f"Error comparing against benchmark {symbol}: {str(e)}")
+            return {}
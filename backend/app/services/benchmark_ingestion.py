@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .. import models
+from ..config import settings
+from .providers import PriceProvider, get_price_provider
+from .ingestion import ingest_benchmark
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Benchmarks quoted as an index level by the price provider (CDI, SELIC and IPCA are
+# rate series, see rate_series)
+BENCHMARK_TICKERS = {
+    "IBOV": "^BVSP",
+    "SP500": "^GSPC",
+    "NASDAQ": "^IXIC",
+    "DOW": "^DJI"
+}
+
+
+def benchmark_coverage(db: Session, symbols: Optional[Iterable[str]] = None) -> Dict[str, Tuple[date, date]]:
+    """First and last stored date of each benchmark, answered from the (symbol, date) index"""
+    query = db.query(models.Benchmark.symbol, func.min(models.Benchmark.date), func.max(models.Benchmark.date))
+    if symbols is not None:
+        query = query.filter(models.Benchmark.symbol.in_(list(symbols)))
+    return {symbol: (first, last) for symbol, first, last in query.group_by(models.Benchmark.symbol).all()}
+
+
+def missing_ranges(coverage: Optional[Tuple[date, date]], start: date, end: date,
+                   backfill: bool = False) -> List[Tuple[date, date]]:
+    """Date ranges of [start, end] the stored coverage lacks, skipping ranges without a weekday
+
+    The last stored day is always fetched again, since it may hold a value stored
+    before that session closed. Days before the first stored one are only
+    fetched with backfill, so an index whose history starts after start is not
+    asked for the same empty range on every sync.
+    """
+    if coverage is None:
+        ranges = [(start, end)]
+    else:
+        first, last = coverage
+        ranges = []
+        if backfill and start < first:
+            ranges.append((start, first - timedelta(days=1)))
+        ranges.append((max(last, start), end))
+    return [
+        (range_start, range_end) for range_start, range_end in ranges
+        if range_start <= range_end and np.busday_count(range_start, range_end + timedelta(days=1)) > 0
+    ]
+
+
+class BenchmarkIngestion:
+    """Incremental download of benchmark index levels into the benchmarks table"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def sync(self, symbols: Optional[Iterable[str]] = None, start: Optional[date] = None,
+             end: Optional[date] = None, provider: Optional[PriceProvider] = None) -> Dict[str, int]:
+        """Fetch only the dates each benchmark is missing and return rows written per symbol
+
+        Without start, benchmarks with no stored data get the last
+        BENCHMARK_HISTORY_DAYS and the others only their tail. With start, the
+        days before the first stored one are backfilled as well. Benchmarks
+        missing the same range share one provider call.
+        """
+        symbols = [symbol for symbol in (symbols or BENCHMARK_TICKERS) if symbol in BENCHMARK_TICKERS]
+        end = end or date.today()
+        window_start = start or end - timedelta(days=settings.BENCHMARK_HISTORY_DAYS)
+        written = {symbol: 0 for symbol in symbols}
+        if not symbols:
+            return written
+
+        coverage = benchmark_coverage(self.db, symbols)
+        gaps: Dict[Tuple[date, date], List[str]] = {}
+        for symbol in symbols:
+            for gap in missing_ranges(coverage.get(symbol), window_start, end, backfill=start is not None):
+                gaps.setdefault(gap, []).append(symbol)
+        if not gaps:
+            return written
+
+        provider = provider or get_price_provider()
+        for (gap_start, gap_end), group in gaps.items():
+            by_ticker = {BENCHMARK_TICKERS[symbol]: symbol for symbol in group}
+            try:
+                bars = provider.history_range(list(by_ticker), gap_start, gap_end)
+                for ticker, rows in bars.groupby('ticker'):
+                    symbol = by_ticker.get(ticker)
+                    if symbol is None:
+                        continue
+                    closes = pd.Series(rows['close'].to_numpy(dtype=float), index=rows['date'])
+                    written[symbol] += ingest_benchmark(self.db, symbol, closes, commit=False)
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Error syncing benchmarks {group} from {gap_start} to {gap_end}: {str(e)}")
+        return written
@@ -0,0 +1,154 @@
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session
+from .. import models, schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Months between two payments of a recurring dividend (EVENTUAL pays only on its own date)
+MONTHS_BETWEEN_PAYMENTS = {
+    models.PaymentFrequency.MONTHLY: 1,
+    models.PaymentFrequency.QUARTERLY: 3,
+    models.PaymentFrequency.SEMIANNUAL: 6,
+    models.PaymentFrequency.ANNUAL: 12
+}
+
+# Projections keyed by (portfolio_id, months_ahead, as_of, hash of the recurring
+# dividend rows). The rows are read on every call, so any edit (from this or
+# another worker process) changes the key; only the expansion is cached
+_CACHE_TTL_SECONDS = 60 * 60
+_CACHE_MAX_ENTRIES = 512
+_projection_cache: "OrderedDict[Tuple, Tuple[float, List[schemas.CashflowProjection]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def invalidate_cashflow_cache(portfolio_id: Optional[int] = None):
+    """Drop cached projections of one portfolio (or all) in this process to free memory"""
+    with _cache_lock:
+        if portfolio_id is None:
+            _projection_cache.clear()
+            return
+        for key in [key for key in _projection_cache if key[0] == portfolio_id]:
+            del _projection_cache[key]
+
+
+def _cache_get(key: Tuple) -> Optional[List[schemas.CashflowProjection]]:
+    with _cache_lock:
+        entry = _projection_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, projections = entry
+        if time.monotonic() - stored_at > _CACHE_TTL_SECONDS:
+            del _projection_cache[key]
+            return None
+        _projection_cache.move_to_end(key)
+        return projections
+
+
+def _cache_put(key: Tuple, projections: List[schemas.CashflowProjection]):
+    with _cache_lock:
+        _projection_cache[key] = (time.monotonic(), projections)
+        _projection_cache.move_to_end(key)
+        while len(_projection_cache) > _CACHE_MAX_ENTRIES:
+            _projection_cache.popitem(last=False)
+
+
+def expand_schedules(first_dates: np.ndarray, step_months: np.ndarray,
+                     start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+    """Payment dates of many recurring schedules inside [start, end]
+
+    Schedule i pays on first_dates[i] and then every step_months[i] months, on
+    the same day of month (clipped to the month length, so a payment on the 31st
+    falls on the 30th/28th in shorter months); a step of 0 is a single payment.
+    Returns (schedule index, date) arrays, built without a Python loop over
+    payments.
+    """
+    first_dates = np.asarray(first_dates, dtype='datetime64[D]')
+    step_months = np.asarray(step_months, dtype=np.int64)
+    if len(first_dates) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype='datetime64[D]')
+
+    first_month = first_dates.astype('datetime64[M]')
+    day = (first_dates - first_month.astype('datetime64[D]')).astype(np.int64)
+    first_index = first_month.astype(np.int64)
+    start_index = np.datetime64(start, 'M').astype(np.int64)
+    end_index = np.datetime64(end, 'M').astype(np.int64)
+
+    # Range of payment numbers k whose month falls inside [start, end]
+    recurring = step_months > 0
+    step = np.where(recurring, step_months, 1)
+    k_low = np.where(recurring, np.maximum(0, (start_index - first_index) // step), 0)
+    k_high = np.where(recurring, (end_index - first_index) // step, 0)
+    counts = np.maximum(k_high - k_low + 1, 0)
+
+    schedule = np.repeat(np.arange(len(first_dates)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    k = k_low[schedule] + offsets
+
+    month = (first_index[schedule] + k * step[schedule]).astype('datetime64[M]')
+    month_start = month.astype('datetime64[D]')
+    month_length = ((month + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    dates = month_start + np.minimum(day[schedule], month_length - 1)
+
+    inside = (dates >= np.datetime64(start, 'D')) & (dates <= np.datetime64(end, 'D'))
+    return schedule[inside], dates[inside]
+
+
+class CashflowProjector:
+    """Projected dividend cashflows of a portfolio from its recurring dividends"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def project(self, portfolio_id: int, months_ahead: int = 12,
+                as_of: Optional[date] = None) -> List[schemas.CashflowProjection]:
+        """Projected payments from as_of (default today) to months_ahead * 30 days later, sorted by date"""
+        as_of = as_of or datetime.now().date()
+        end_date = as_of + timedelta(days=months_ahead * 30)
+
+        rows = self.db.query(
+            models.Dividend.payment_date,
+            models.Dividend.net_amount,
+            models.Dividend.total_amount,
+            models.Dividend.dividend_type,
+            models.Dividend.frequency,
+            models.Asset.symbol
+        ).join(
+            models.Asset, models.Dividend.asset_id == models.Asset.id
+        ).filter(
+            models.Dividend.portfolio_id == portfolio_id,
+            models.Dividend.is_recurring == True
+        ).order_by(models.Dividend.id).all()
+
+        key = (portfolio_id, months_ahead, as_of, hash(tuple(tuple(row) for row in rows)))
+        cached = _cache_get(key)
+        if cached is not None:
+            return list(cached)
+
+        schedule, dates = expand_schedules(
+            np.array([row.payment_date for row in rows], dtype='datetime64[D]'),
+            np.array([MONTHS_BETWEEN_PAYMENTS.get(row.frequency, 0) for row in rows], dtype=np.int64),
+            as_of,
+            end_date
+        )
+
+        order = np.argsort(dates, kind='stable')
+        projections = []
+        for i, payment_date in zip(schedule[order], dates[order].astype(object)):
+            row = rows[i]
+            projections.append(schemas.CashflowProjection(
+                date=payment_date.isoformat(),
+                amount=row.net_amount or row.total_amount,
+                dividend_type=row.dividend_type,
+                asset_symbol=row.symbol,
+                frequency=row.frequency,
+                is_projected=True
+            ))
+
+        _cache_put(key, projections)
+        return list(projections)
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy.orm import Session, joinedload
+from .. import models
+from .portfolio_calc import PortfolioCalculator
+from .returns import ReturnEngine
+from .fx import FXService
+from .performance import daily_returns, compute_horizon_metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dashboard totals are consolidated in this currency
+BASE_CURRENCY = models.Currency.BRL
+
+
+class DashboardService:
+    """Builds the whole dashboard of a user with a fixed number of queries.
+
+    Positions, assets and latest prices come from one joined query; summaries,
+    consolidated allocation and totals are accumulated in a single pass over
+    those rows. Snapshot series (performance, TWR/XIRR) are read for all
+    portfolios at once and days not materialized yet are valued in one
+    batched pass, so portfolios behind today add no queries.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.calc = PortfolioCalculator(db)
+
+    def build(self, user_id: int, recent_limit: int = 10) -> Dict:
+        portfolios = self.db.query(models.Portfolio).filter(
+            models.Portfolio.owner_id == user_id
+        ).order_by(models.Portfolio.id).all()
+
+        fx = FXService(self.db).cube()
+        rates = {}
+        for portfolio in portfolios:
+            rate = fx.rate(portfolio.currency, BASE_CURRENCY)
+            if rate is None:
+                logger.warning(f"No exchange rate {portfolio.currency.value}/{BASE_CURRENCY.value}, "
+                               f"portfolio {portfolio.id} left out of the totals")
+            rates[portfolio.id] = rate
+
+        held_assets = self.db.query(models.Position.asset_id).join(
+            models.Portfolio
+        ).filter(models.Portfolio.owner_id == user_id)
+        latest = self.calc.latest_price_subquery(held_assets)
+
+        rows = self.db.query(
+            models.Position.portfolio_id,
+            models.Position.quantity,
+            models.Position.total_invested,
+            models.Position.current_value,
+            models.Position.dividends_received,
+            models.Asset.asset_type,
+            latest.c.close
+        ).join(
+            models.Portfolio, models.Position.portfolio_id == models.Portfolio.id
+        ).join(
+            models.Asset, models.Position.asset_id == models.Asset.id
+        ).outerjoin(
+            latest, latest.c.asset_id == models.Position.asset_id
+        ).filter(
+            models.Portfolio.owner_id == user_id
+        ).all()
+
+        # Single pass: per-portfolio sums and consolidated allocation
+        sums = {portfolio.id: {'value': 0.0, 'invested': 0.0, 'dividends': 0.0, 'count': 0} for portfolio in portfolios}
+        allocation: Dict[str, Dict] = {}
+
+        for portfolio_id, quantity, invested, stored_value, dividends, asset_type, close in rows:
+            value = quantity * close if close is not None else (stored_value or 0)
+            totals = sums[portfolio_id]
+            totals['value'] += value
+            totals['invested'] += invested or 0
+            totals['dividends'] += dividends or 0
+            totals['count'] += 1
+
+            rate = rates.get(portfolio_id)
+            if rate is not None:
+                bucket = allocation.setdefault(asset_type.value, {'value': 0.0, 'count': 0})
+                bucket['value'] += value * rate
+                bucket['count'] += 1
+
+        # Full snapshot history once, shared by TWR/XIRR and the combined metrics
+        portfolio_ids = [portfolio.id for portfolio in portfolios]
+        series = self.calc.snapshots.get_series_many(portfolio_ids)
+        returns = ReturnEngine(self.db).calculate(portfolio_ids, series=series)
+
+        now = datetime.utcnow()
+        summaries = []
+        total_patrimony = total_invested = total_return = 0.0
+
+        for portfolio in portfolios:
+            totals = sums[portfolio.id]
+            portfolio_return = totals['value'] - totals['invested'] + totals['dividends']
+            summaries.append({
+                'portfolio_id': portfolio.id,
+                'portfolio_name': portfolio.name,
+                'total_value': totals['value'],
+                'total_invested': totals['invested'],
+                'total_return': portfolio_return,
+                'total_return_percentage': (portfolio_return / totals['invested'] * 100) if totals['invested'] > 0 else 0,
+                'currency': portfolio.currency.value,
+                'positions_count': totals['count'],
+                'last_update': now,
+                **returns.get(portfolio.id, {})
+            })
+
+            rate = rates[portfolio.id]
+            if rate is not None:
+                total_patrimony += totals['value'] * rate
+                total_invested += totals['invested'] * rate
+                total_return += portfolio_return * rate
+
+        asset_allocation = sorted([
+            {
+                'asset_type': asset_type,
+                'value': bucket['value'],
+                'percentage': (bucket['value'] / total_patrimony * 100) if total_patrimony > 0 else 0,
+                'count': bucket['count']
+            }
+            for asset_type, bucket in allocation.items()
+        ], key=lambda item: item['value'], reverse=True)
+
+        recent_transactions = self.db.query(models.Transaction).options(
+            joinedload(models.Transaction.asset)
+        ).join(
+            models.Portfolio
+        ).filter(
+            models.Portfolio.owner_id == user_id
+        ).order_by(
+            models.Transaction.created_at.desc()
+        ).limit(recent_limit).all()
+
+        return {
+            'portfolios': summaries,
+            'total_patrimony': total_patrimony,
+            'total_invested': total_invested,
+            'total_return': total_return,
+            'total_return_percentage': (total_return / total_invested * 100) if total_invested > 0 else 0,
+            'asset_allocation': asset_allocation,
+            'performance_metrics': self._combined_metrics(portfolios, series, fx),
+            'recent_transactions': recent_transactions
+        }
+
+    def _combined_metrics(self, portfolios: List[models.Portfolio], series: Dict[int, pd.DataFrame], fx) -> Dict:
+        """Daily/monthly/yearly return, volatility, Sharpe and drawdown of all portfolios together"""
+        empty = {
+            'daily_return': None, 'monthly_return': None, 'yearly_return': None, 'volatility': None,
+            'sharpe_ratio': None, 'max_drawdown': None, 'beta': None, 'alpha': None
+        }
+        try:
+            start = pd.Timestamp(datetime.utcnow().date() - timedelta(days=365))
+            combined = None
+            for portfolio in portfolios:
+                frame = series.get(portfolio.id)
+                if frame is None or frame.empty:
+                    continue
+                frame = fx.convert_series(frame[frame.index >= start], portfolio.currency, BASE_CURRENCY)
+                if frame is None:
+                    continue
+                combined = frame if combined is None else combined.add(frame, fill_value=0)
+
+            if combined is None or len(combined) < 2:
+                return empty
+
+            returns = daily_returns(combined)
+            horizons = compute_horizon_metrics(returns, ['1d', '1m', 'inception'])
+            if not horizons.get('inception'):
+                return empty
+
+            growth = np.cumprod(1 + returns.to_numpy())
+            drawdown = growth / np.maximum.accumulate(growth) - 1
+
+            return {
+                **empty,
+                'daily_return': horizons['1d']['return'] if horizons.get('1d') else None,
+                'monthly_return': horizons['1m']['return'] if horizons.get('1m') else None,
+                'yearly_return': horizons['inception']['return'],
+                'volatility': horizons['inception']['volatility'],
+                'sharpe_ratio': horizons['inception']['sharpe_ratio'],
+                'max_drawdown': float(drawdown.min()) * 100
+            }
+
+        except Exception as e:
+            logger.error(f"Error calculating combined dashboard metrics: {str(e)}")
+            return empty
@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import func, extract, case
+from .. import models
+from ..database import upsert
+from .portfolio_calc import PortfolioCalculator
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = [
+    'payments_count', 'first_payment_date', 'last_payment_date', 'ttm_per_share', 'ttm_yield',
+    'last_full_year', 'last_year_per_share', 'yoy_growth', 'cagr', 'cagr_years', 'yearly_per_share'
+]
+
+
+def yearly_growth(yearly: pd.DataFrame, current_year: int) -> pd.DataFrame:
+    """Year-over-year growth and CAGR for every row of a (key x calendar year) table
+
+    Only complete years (before current_year) are used. yoy_growth compares the
+    last complete year with payments to the calendar year before it; cagr runs
+    from the first to the last complete year with payments. Growth values are in %.
+    """
+    columns = ['last_full_year', 'last_year_amount', 'yoy_growth', 'cagr', 'cagr_years']
+    full_years = [year for year in yearly.columns if year < current_year]
+    if yearly.empty or not full_years:
+        return pd.DataFrame({column: [None] * len(yearly) for column in columns}, index=yearly.index)
+
+    years = np.arange(min(full_years), max(full_years) + 1)
+    values = yearly.reindex(columns=years, fill_value=0.0).to_numpy(dtype=float)
+    paid = values > 0
+    has_paid = paid.any(axis=1)
+    rows = np.arange(len(values))
+
+    last = len(years) - 1 - np.argmax(paid[:, ::-1], axis=1)
+    first = np.argmax(paid, axis=1)
+    last_amount = values[rows, last]
+    previous = np.where(last > 0, values[rows, np.maximum(last - 1, 0)], 0.0)
+    span = last - first
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yoy = np.where(has_paid & (previous > 0), (last_amount / previous - 1) * 100, np.nan)
+        cagr = np.where(
+            has_paid & (span > 0),
+            ((last_amount / values[rows, first]) ** (1 / np.maximum(span, 1)) - 1) * 100,
+            np.nan
+        )
+
+    def optional(array, valid, cast):
+        return [cast(value) if ok and np.isfinite(value) else None for value, ok in zip(array, valid)]
+
+    return pd.DataFrame({
+        'last_full_year': optional(years[last], has_paid, int),
+        'last_year_amount': optional(last_amount, has_paid, float),
+        'yoy_growth': optional(yoy, has_paid, float),
+        'cagr': optional(cagr, has_paid, float),
+        'cagr_years': optional(span, has_paid & (span > 0), int)
+    }, index=yearly.index, dtype=object)
+
+
+class DividendAnalytics:
+    """Bulk dividend analytics: per-asset summaries and per-portfolio income growth"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def compute(self, asset_ids: Optional[List[int]] = None) -> List[Dict]:
+        """dividend_summaries rows of asset_ids (all assets when None), without storing them
+
+        Payments are read in one query, deduplicated per (asset, payment date)
+        since the same dividend is recorded once per portfolio holding it.
+        """
+        today = datetime.now().date()
+
+        query = self.db.query(
+            models.Dividend.asset_id,
+            models.Dividend.payment_date,
+            func.avg(models.Dividend.amount_per_share)
+        )
+        if asset_ids is not None:
+            query = query.filter(models.Dividend.asset_id.in_(asset_ids))
+        rows = query.group_by(models.Dividend.asset_id, models.Dividend.payment_date).all()
+
+        payments = pd.DataFrame(rows, columns=['asset_id', 'payment_date', 'per_share'])
+        payments['per_share'] = payments['per_share'].astype(float)
+        payments['year'] = pd.to_datetime(payments['payment_date']).dt.year
+
+        grouped = payments.groupby('asset_id')
+        yearly = payments.pivot_table(index='asset_id', columns='year', values='per_share', aggfunc='sum', fill_value=0.0)
+        growth = yearly_growth(yearly, today.year)
+
+        ttm = payments[payments['payment_date'] >= today - timedelta(days=365)].groupby('asset_id')['per_share'].sum().to_dict()
+        counts = grouped.size().to_dict()
+        first_dates = grouped['payment_date'].min().to_dict()
+        last_dates = grouped['payment_date'].max().to_dict()
+
+        computed_ids = [int(asset_id) for asset_id in yearly.index]
+        prices = PortfolioCalculator(self.db).get_latest_prices(computed_ids)
+
+        summaries = []
+        for asset_id in computed_ids:
+            ttm_per_share = float(ttm.get(asset_id, 0.0))
+            price = prices.get(asset_id)
+            row = growth.loc[asset_id]
+            summaries.append({
+                'asset_id': asset_id,
+                'payments_count': int(counts[asset_id]),
+                'first_payment_date': first_dates[asset_id],
+                'last_payment_date': last_dates[asset_id],
+                'ttm_per_share': ttm_per_share,
+                'ttm_yield': ttm_per_share / price * 100 if price else None,
+                'last_full_year': row['last_full_year'],
+                'last_year_per_share': row['last_year_amount'],
+                'yoy_growth': row['yoy_growth'],
+                'cagr': row['cagr'],
+                'cagr_years': row['cagr_years'],
+                'yearly_per_share': {
+                    str(year): float(amount) for year, amount in yearly.loc[asset_id].items() if amount > 0
+                },
+                'updated_at': datetime.utcnow()
+            })
+
+        return summaries
+
+    def refresh(self, asset_ids: Optional[List[int]] = None, commit: bool = True) -> int:
+        """Recompute and store dividend_summaries for asset_ids (all assets when None)
+
+        Returns the number of summaries written.
+        """
+        summaries = self.compute(asset_ids)
+        computed_ids = [summary['asset_id'] for summary in summaries]
+
+        try:
+            upsert(self.db, models.DividendSummary, summaries, ['asset_id'], SUMMARY_COLUMNS + ['updated_at'])
+
+            # Assets whose dividends were all deleted lose their summary
+            stale = self.db.query(models.DividendSummary).filter(
+                models.DividendSummary.asset_id.notin_(computed_ids)
+            )
+            if asset_ids is not None:
+                stale = stale.filter(models.DividendSummary.asset_id.in_(asset_ids))
+            stale.delete(synchronize_session=False)
+
+            if commit:
+                self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error refreshing dividend summaries: {str(e)}")
+            return 0
+
+        return len(summaries)
+
+    def backfill(self) -> int:
+        """Store the summaries of assets that have dividends but no summary row yet"""
+        missing = [row[0] for row in self.db.query(models.Dividend.asset_id).filter(
+            models.Dividend.asset_id.notin_(self.db.query(models.DividendSummary.asset_id))
+        ).distinct().all()]
+        return self.refresh(missing) if missing else 0
+
+    def summaries(self, asset_ids: List[int]) -> Dict[int, models.DividendSummary]:
+        """Stored summaries of asset_ids, computing the missing ones in memory"""
+        if not asset_ids:
+            return {}
+
+        stored = {
+            summary.asset_id: summary
+            for summary in self.db.query(models.DividendSummary).filter(
+                models.DividendSummary.asset_id.in_(asset_ids)
+            ).all()
+        }
+
+        # Missing rows are computed but not stored: reads never write, the
+        # dividend endpoints refresh the table when dividends change
+        missing = [asset_id for asset_id in asset_ids if asset_id not in stored]
+
+        # The stored ttm_yield is as of the last refresh; prices move every day,
+        # so it is recomputed from the latest close without flagging the row dirty
+        prices = PortfolioCalculator(self.db).get_latest_prices(list(stored))
+        for asset_id, summary in stored.items():
+            price = prices.get(asset_id)
+            set_committed_value(summary, 'ttm_yield', summary.ttm_per_share / price * 100 if price else None)
+
+        if missing:
+            for row in self.compute(missing):
+                stored[row['asset_id']] = models.DividendSummary(**row)
+
+        return stored
+
+    def portfolio_analytics(self, portfolio_id: int) -> Dict:
+        """Dividend income of a portfolio by asset and calendar year, with TTM, YoY growth and CAGR"""
+        today = datetime.now().date()
+        one_year_ago = today - timedelta(days=365)
+
+        # Valor líquido quando informado, senão o total
+        received = func.coalesce(func.nullif(models.Dividend.net_amount, 0), models.Dividend.total_amount)
+        year = extract('year', models.Dividend.payment_date)
+
+        rows = self.db.query(
+            models.Dividend.asset_id,
+            models.Asset.symbol,
+            year.label('year'),
+            func.sum(received),
+            func.sum(case((models.Dividend.payment_date >= one_year_ago, received), else_=0))
+        ).join(
+            models.Asset, models.Dividend.asset_id == models.Asset.id
+        ).filter(
+            models.Dividend.portfolio_id == portfolio_id
+        ).group_by(
+            models.Dividend.asset_id, models.Asset.symbol, year
+        ).all()
+
+        empty = {
+            'portfolio_id': portfolio_id,
+            'ttm_income': 0.0,
+            'yearly_income': {},
+            'yoy_growth': None,
+            'cagr': None,
+            'cagr_years': None,
+            'assets': []
+        }
+        if not rows:
+            return empty
+
+        frame = pd.DataFrame(rows, columns=['asset_id', 'symbol', 'year', 'amount', 'ttm'])
+        frame['year'] = frame['year'].astype(int)
+        frame[['amount', 'ttm']] = frame[['amount', 'ttm']].astype(float)
+
+        by_asset = frame.pivot_table(index='asset_id', columns='year', values='amount', aggfunc='sum', fill_value=0.0)
+        totals = by_asset.sum(axis=0).to_frame('total').T
+        asset_growth = yearly_growth(by_asset, today.year)
+        total_growth = yearly_growth(totals, today.year).iloc[0]
+
+        ttm_by_asset = frame.groupby('asset_id')['ttm'].sum()
+        symbols = frame.drop_duplicates('asset_id').set_index('asset_id')['symbol']
+        summaries = self.summaries([int(asset_id) for asset_id in by_asset.index])
+
+        assets = []
+        for asset_id in by_asset.index:
+            growth = asset_growth.loc[asset_id]
+            summary = summaries.get(int(asset_id))
+            assets.append({
+                'asset_id': int(asset_id),
+                'asset_symbol': symbols[asset_id],
+                'ttm_income': float(ttm_by_asset[asset_id]),
+                'yearly_income': {int(y): float(v) for y, v in by_asset.loc[asset_id].items() if v > 0},
+                'yoy_growth': growth['yoy_growth'],
+                'cagr': growth['cagr'],
+                'cagr_years': growth['cagr_years'],
+                'ttm_per_share': summary.ttm_per_share if summary else None,
+                'ttm_yield': summary.ttm_yield if summary else None,
+                'per_share_yoy_growth': summary.yoy_growth if summary else None,
+                'per_share_cagr': summary.cagr if summary else None
+            })
+
+        assets.sort(key=lambda item: item['ttm_income'], reverse=True)
+
+        return {
+            **empty,
+            'ttm_income': float(ttm_by_asset.sum()),
+            'yearly_income': {int(y): float(v) for y, v in totals.iloc[0].items()},
+            'yoy_growth': total_growth['yoy_growth'],
+            'cagr': total_growth['cagr'],
+            'cagr_years': total_growth['cagr_years'],
+            'assets': assets
+        }
@@ -0,0 +1,148 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple, Union
+from sqlalchemy.orm import Session
+from .. import models
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pivot currencies tried (in order) when a pair is not stored directly
+CROSS_CURRENCIES = ["BRL", "USD"]
+
+# Per-process cube: invalidate_fx_cube only reaches the process that stored the
+# rates, other workers reload once the (short) TTL expires
+_CUBE_TTL_SECONDS = 2 * 60
+_cube: Optional["FXCube"] = None
+_cube_loaded_at = 0.0
+_cube_lock = threading.Lock()
+
+
+def _code(currency: Union[str, models.Currency]) -> str:
+    return currency.value if isinstance(currency, models.Currency) else str(currency)
+
+
+def invalidate_fx_cube():
+    """Force the next FXService call to reload exchange_rates"""
+    global _cube
+    with _cube_lock:
+        _cube = None
+
+
+class FXCube:
+    """Dense (currency pair x date) matrix of stored exchange rates.
+
+    Each row is forward-filled along the sorted date axis, so an as-of lookup
+    is a binary search on the dates plus an array read. Dates before the first
+    stored rate of a pair use that first rate.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, date, float]]):
+        frame = pd.DataFrame(list(rows), columns=['from', 'to', 'date', 'rate'])
+        frame = frame[frame['rate'] > 0]
+
+        if frame.empty:
+            self.dates = np.array([], dtype='datetime64[D]')
+            self.pairs: Dict[Tuple[str, str], int] = {}
+            self.rates = np.zeros((0, 0))
+            return
+
+        frame['date'] = pd.to_datetime(frame['date'])
+        matrix = frame.pivot_table(index='date', columns=['from', 'to'], values='rate', aggfunc='last')
+        matrix = matrix.sort_index().ffill().bfill()
+
+        self.dates = matrix.index.values.astype('datetime64[D]')
+        self.pairs = {(str(f), str(t)): i for i, (f, t) in enumerate(matrix.columns)}
+        self.rates = matrix.to_numpy(dtype=float).T
+
+    def _row(self, from_currency: str, to_currency: str) -> Optional[np.ndarray]:
+        """Rate row for a pair: stored, inverted, or crossed through a pivot currency"""
+        row = self._direct_or_inverse(from_currency, to_currency)
+        if row is not None:
+            return row
+
+        for pivot in CROSS_CURRENCIES:
+            if pivot in (from_currency, to_currency):
+                continue
+            first = self._direct_or_inverse(from_currency, pivot)
+            second = self._direct_or_inverse(pivot, to_currency)
+            if first is not None and second is not None:
+                return first * second
+        return None
+
+    def _direct_or_inverse(self, from_currency: str, to_currency: str) -> Optional[np.ndarray]:
+        if (from_currency, to_currency) in self.pairs:
+            return self.rates[self.pairs[(from_currency, to_currency)]]
+        if (to_currency, from_currency) in self.pairs:
+            return 1.0 / self.rates[self.pairs[(to_currency, from_currency)]]
+        return None
+
+    def has_pair(self, from_currency, to_currency) -> bool:
+        from_code, to_code = _code(from_currency), _code(to_currency)
+        return from_code == to_code or self._row(from_code, to_code) is not None
+
+    def rates_for(self, from_currency, to_currency, dates) -> Optional[np.ndarray]:
+        """As-of rates for an array of dates (one binary search for all of them)"""
+        from_code, to_code = _code(from_currency), _code(to_currency)
+        when = np.asarray(pd.to_datetime(dates).values.astype('datetime64[D]'))
+        if from_code == to_code:
+            return np.ones(len(when))
+
+        row = self._row(from_code, to_code)
+        if row is None or len(self.dates) == 0:
+            return None
+
+        index = np.searchsorted(self.dates, when, side='right') - 1
+        return row[np.clip(index, 0, len(self.dates) - 1)]
+
+    def rate(self, from_currency, to_currency, on: Optional[date] = None) -> Optional[float]:
+        rates = self.rates_for(from_currency, to_currency, [on or date.today()])
+        return float(rates[0]) if rates is not None else None
+
+    def convert(self, amount: float, from_currency, to_currency, on: Optional[date] = None) -> Optional[float]:
+        rate = self.rate(from_currency, to_currency, on)
+        return amount * rate if rate is not None else None
+
+    def convert_series(self, values: Union[pd.Series, pd.DataFrame], from_currency, to_currency):
+        """Convert a date-indexed Series/DataFrame with one vectorized multiply"""
+        if _code(from_currency) == _code(to_currency) or len(values) == 0:
+            return values
+        rates = self.rates_for(from_currency, to_currency, values.index)
+        if rates is None:
+            return None
+        if isinstance(values, pd.DataFrame):
+            return values.mul(rates, axis=0)
+        return values * rates
+
+
+class FXService:
+    """Process-wide FXCube over the exchange_rates table, reloaded on TTL or invalidation"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def cube(self) -> FXCube:
+        global _cube, _cube_loaded_at
+        with _cube_lock:
+            if _cube is not None and time.monotonic() - _cube_loaded_at < _CUBE_TTL_SECONDS:
+                return _cube
+
+        try:
+            rows = self.db.query(
+                models.ExchangeRate.from_currency,
+                models.ExchangeRate.to_currency,
+                models.ExchangeRate.date,
+                models.ExchangeRate.rate
+            ).all()
+            cube = FXCube((_code(f), _code(t), d, r) for f, t, d, r in rows)
+        except Exception as e:
+            logger.error(f"Error loading exchange rates: {str(e)}")
+            cube = FXCube([])
+
+        with _cube_lock:
+            _cube = cube
+            _cube_loaded_at = time.monotonic()
+        return cube
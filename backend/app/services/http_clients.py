@@ -0,0 +1,262 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Market-data upstreams: base URL, concurrent connections allowed to the host and
+# request quota (None: unlimited)
+UPSTREAMS = {
+    "alphavantage": {"base_url": "https://www.alphavantage.co", "limit_per_host": 4,
+                     "requests_per_minute": settings.ALPHA_VANTAGE_REQUESTS_PER_MINUTE},
+    "brapi": {"base_url": "https://brapi.dev", "limit_per_host": 4, "requests_per_minute": None}
+}
+
+# Throttling and server-side failures are retried; other statuses are final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Retry-After headers above this are not waited for
+_MAX_RETRY_AFTER_SECONDS = 30
+
+
+class TokenBucket:
+    """Token-bucket limiter: bursts of up to capacity requests, refilled at rate per second
+
+    reserve() always takes a token and returns how long the caller has to wait
+    for it; the balance going negative queues callers in arrival order. Shared
+    by threads and event loops alike, since nothing is awaited under the lock.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        # A reservation given up (cancelled while waiting) goes back to the bucket
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund()
+                raise
+
+    def acquire_sync(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HttpClientRegistry:
+    """Long-lived HTTP clients for market-data upstreams, one per host.
+
+    The asyncio side keeps one aiohttp.ClientSession per upstream, opened on
+    FastAPI startup and closed on shutdown, so calls reuse pooled keep-alive
+    connections instead of paying DNS/TCP/TLS on every request. The sync side
+    (price providers, celery tasks) keeps a pooled requests.Session per
+    upstream. Both retry RETRY_STATUSES and connection errors with exponential
+    backoff, take every attempt from the upstream's token bucket when it has a
+    quota, and record request, retry and error counts and latency per
+    upstream.
+
+    get_json / get_json_sync return the decoded body, or None once the
+    request has failed for good.
+    """
+
+    def __init__(self, upstreams: Optional[Dict[str, Dict]] = None, max_retries: Optional[int] = None,
+                 backoff_seconds: Optional[float] = None, timeout_seconds: Optional[float] = None,
+                 connect_timeout_seconds: Optional[float] = None):
+        self.upstreams = upstreams or UPSTREAMS
+        self.max_retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = settings.HTTP_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self.timeout_seconds = timeout_seconds or settings.HTTP_TIMEOUT_SECONDS
+        self.connect_timeout_seconds = connect_timeout_seconds or settings.HTTP_CONNECT_TIMEOUT_SECONDS
+        # aiohttp sessions are bound to the loop they were opened on
+        self._sessions: Dict[str, Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+        self._sync_sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._limiters: Dict[str, Optional[TokenBucket]] = {}
+
+    def _upstream(self, upstream: str) -> Dict:
+        if upstream not in self.upstreams:
+            raise ValueError(f"Unknown upstream: {upstream}")
+        return self.upstreams[upstream]
+
+    def limiter(self, upstream: str) -> Optional[TokenBucket]:
+        """Token bucket sized to the upstream's requests_per_minute (a minute's quota as burst)"""
+        with self._lock:
+            if upstream not in self._limiters:
+                per_minute = self._upstream(upstream).get("requests_per_minute")
+                self._limiters[upstream] = TokenBucket(per_minute / 60, per_minute) if per_minute else None
+            return self._limiters[upstream]
+
+    def _record(self, upstream: str, latency: float, retries: int, failed: bool):
+        with self._lock:
+            counters = self._counters.setdefault(
+                upstream, {"requests": 0, "errors": 0, "retries": 0, "latency_ms_total": 0.0, "latency_ms_max": 0.0}
+            )
+            counters["requests"] += 1
+            counters["retries"] += retries
+            counters["errors"] += int(failed)
+            counters["latency_ms_total"] += latency * 1000
+            counters["latency_ms_max"] = max(counters["latency_ms_max"], latency * 1000)
+
+    def _failed(self, upstream: str, path: str, started: float, attempt: int, error: str, status: Optional[int]):
+        self._record(upstream, time.perf_counter() - started, attempt, failed=True)
+        # Client errors (unknown symbol, bad key) are expected answers, not outages
+        level = logging.DEBUG if status is not None and status < 500 and status not in RETRY_STATUSES else logging.WARNING
+        logger.log(level, f"{upstream} GET {path} failed after {attempt + 1} attempt(s): {error}")
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = self.backoff_seconds * 2 ** attempt
+        delay += random.uniform(0, self.backoff_seconds)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), _MAX_RETRY_AFTER_SECONDS))
+        return delay
+
+    # asyncio side
+
+    def _new_session(self, upstream: str) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(limit_per_host=self._upstream(upstream)["limit_per_host"], ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout_seconds, connect=self.connect_timeout_seconds)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def session(self, upstream: str) -> aiohttp.ClientSession:
+        """Pooled session of upstream on the running loop (opened on first use outside FastAPI)"""
+        loop = asyncio.get_running_loop()
+        current = self._sessions.get(upstream)
+        if current is None or current[0] is not loop or current[1].closed:
+            current = (loop, self._new_session(upstream))
+            self._sessions[upstream] = current
+        return current[1]
+
+    async def start(self):
+        """Open the sessions of every upstream (FastAPI startup)"""
+        for upstream in self.upstreams:
+            self.session(upstream)
+
+    async def close(self):
+        """Close the sessions opened on the running loop (FastAPI shutdown)"""
+        loop = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for session_loop, session in sessions.values():
+            # Sessions of a loop that is gone cannot be awaited anymore
+            if session_loop is loop and not session.closed:
+                await session.close()
+
+    async def get_json(self, upstream: str, path: str, params: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None) -> Optional[Any]:
+        """GET base_url + path of upstream and decode the JSON body, retrying transient failures"""
+        url = self._upstream(upstream)["base_url"] + path
+        limiter = self.limiter(upstream)
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            retry_after = status = None
+            if limiter:
+                await limiter.acquire()
+            try:
+                async with self.session(upstream).get(url, params=params, timeout=request_timeout) as response:
+                    if response.status < 400:
+                        data = await response.json(content_type=None)
+                        self._record(upstream, time.perf_counter() - started, attempt, failed=False)
+                        return data
+                    status = response.status
+                    error = f"HTTP {status}"
+                    retryable = status in RETRY_STATUSES
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                retryable = not isinstance(e, ValueError)
+
+            if not retryable or attempt >= self.max_retries:
+                self._failed(upstream, path, started, attempt, error, status)
+                return None
+            await asyncio.sleep(self._delay(attempt, retry_after))
+            attempt += 1
+
+    # sync side
+
+    def sync_session(self, upstream: str) -> requests.Session:
+        """Pooled requests.Session of upstream, shared by every thread of the process"""
+        with self._lock:
+            session = self._sync_sessions.get(upstream)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=self._upstream(upstream)["limit_per_host"])
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sync_sessions[upstream] = session
+            return session
+
+    def get_json_sync(self, upstream: str, path: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Optional[Any]:
+        """Blocking get_json, for code running outside the event loop"""
+        url = self._upstream(upstream)["base_url"] + path
+        limiter = self.limiter(upstream)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            retry_after = status = None
+            if limiter:
+                limiter.acquire_sync()
+            try:
+                response = self.sync_session(upstream).get(
+                    url, params=params, timeout=(self.connect_timeout_seconds, timeout or self.timeout_seconds)
+                )
+                if response.status_code < 400:
+                    data = response.json()
+                    self._record(upstream, time.perf_counter() - started, attempt, failed=False)
+                    return data
+                status = response.status_code
+                error = f"HTTP {status}"
+                retryable = status in RETRY_STATUSES
+                retry_after = response.headers.get("Retry-After")
+            except (requests.RequestException, ValueError) as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                # JSON decode errors are ValueErrors too, and are not retried
+                retryable = isinstance(e, (requests.ConnectionError, requests.Timeout))
+
+            if not retryable or attempt >= self.max_retries:
+                self._failed(upstream, path, started, attempt, error, status)
+                return None
+            time.sleep(self._delay(attempt, retry_after))
+            attempt += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Counters per upstream for monitoring; latency covers quota waits, retries and backoff"""
+        with self._lock:
+            stats = {upstream: dict(counters) for upstream, counters in self._counters.items()}
+        for counters in stats.values():
+            counters["latency_ms_avg"] = round(counters["latency_ms_total"] / counters["requests"], 1)
+            counters["latency_ms_total"] = round(counters["latency_ms_total"], 1)
+            counters["latency_ms_max"] = round(counters["latency_ms_max"], 1)
+        return stats
+
+
+http_clients = HttpClientRegistry()
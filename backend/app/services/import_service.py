@@ -121,6 +121,8 @@ class ImportService:
     def _import_dataframe(self, portfolio_id: int, df: pd.DataFrame) -> Tuple[bool, str, int, List[str]]:
         """Import transactions from a pandas DataFrame"""
         errors = []
+        imported = []
+        dividend_ids = []
         imported_count = 0
         
         try:
@@ -205,6 +207,10 @@ class ImportService:
                     )
                     
                     self.db.add(transaction)
+                    if transaction_type == models.TransactionType.DIVIDEND:
+                        self.db.flush()
+                        dividend_ids.append(transaction.id)
+                    imported.append((transaction.asset_id, transaction_date))
                     imported_count += 1
                     
                 except Exception as e:
@@ -213,16 +219,23 @@ class ImportService:
             self.db.commit()
             
             if imported_count > 0:
-                # Update positions after import
+                # Recompute all positions of the portfolio in one set-based pass
                 from .portfolio_calc import PortfolioCalculator
+                from .position_refresher import PositionRefresher
                 calc = PortfolioCalculator(self.db)
                 
-                transactions = self.db.query(models.Transaction).filter(
-                    models.Transaction.portfolio_id == portfolio_id
-                ).all()
+                calc.ledger.bulk_rebuild(portfolio_id)
+                PositionRefresher(self.db).refresh(portfolio_ids=[portfolio_id])
+                calc.snapshots.invalidate(portfolio_id, min(d for _, d in imported))
                 
-                for transaction in transactions:
-                    calc.process_transaction(transaction)
+                # Dividends are not part of the trade replay
+                dividends = self.db.query(models.Transaction).filter(
+                    models.Transaction.portfolio_id == portfolio_id,
+                    models.Transaction.transaction_type == models.TransactionType.DIVIDEND,
+                    models.Transaction.id.in_(dividend_ids)
+                ).all()
+                for dividend in dividends:
+                    calc.process_transaction(dividend)
             
             return True, f"Successfully imported {imported_count} transactions", imported_count, errors
             
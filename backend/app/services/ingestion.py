@@ -0,0 +1,118 @@
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import upsert
+from .snapshots import SnapshotService
+from .position_refresher import schedule_refresh
+from .benchmark_analytics import invalidate_benchmark_cache
+from .fx import invalidate_fx_cube
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRICE_UPDATE_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'adjusted_close']
+
+
+def _records(frame: pd.DataFrame) -> List[Dict]:
+    """DataFrame rows as dicts of native values with NaN turned into None"""
+    columns = list(frame.columns)
+    values = [frame[column].astype(object).where(frame[column].notna(), None).tolist() for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def ingest_prices(db: Session, prices: pd.DataFrame, asset_ids: Dict[str, int], commit: bool = True) -> int:
+    """Write a price history frame with INSERT ... ON CONFLICT (asset_id, date) DO UPDATE
+
+    prices needs ticker, date and close; open/high/low/volume/adjusted_close are
+    written only when present, so a quote-only frame leaves the stored OHLV of
+    the day untouched. Without adjusted_close, new rows take the close and
+    stored (split/dividend adjusted) values are kept. asset_ids maps tickers to
+    asset ids; rows of unknown tickers or without a close are skipped. Returns
+    the number of rows written.
+    """
+    if prices.empty:
+        return 0
+
+    frame = prices.assign(asset_id=prices['ticker'].map(asset_ids))
+    frame = frame.dropna(subset=['asset_id', 'close'])
+    frame = frame[frame['close'] > 0]
+    if frame.empty:
+        return 0
+
+    frame['asset_id'] = frame['asset_id'].astype(int)
+    columns = [column for column in PRICE_UPDATE_COLUMNS if column in frame.columns]
+    fill_columns = []
+    if 'adjusted_close' in frame.columns:
+        frame['adjusted_close'] = frame['adjusted_close'].fillna(frame['close'])
+    else:
+        # New rows start with the raw close; a stored (split/dividend adjusted) value is kept
+        frame['adjusted_close'] = frame['close']
+        fill_columns = ['adjusted_close']
+    # One row per key, otherwise ON CONFLICT would touch the same row twice
+    frame = frame.drop_duplicates(['asset_id', 'date'], keep='last')
+
+    upsert(
+        db, models.Price, _records(frame[['asset_id', 'date'] + columns + fill_columns]),
+        ['asset_id', 'date'], columns, fill_columns=fill_columns
+    )
+
+    touched = sorted(frame['asset_id'].unique().tolist())
+    SnapshotService(db).invalidate_assets(touched, frame['date'].min(), commit=False)
+    if commit:
+        db.commit()
+    schedule_refresh(touched)
+    return len(frame)
+
+
+def ingest_benchmark(db: Session, symbol: str, values: pd.Series, name: Optional[str] = None,
+                     daily_returns: Optional[pd.Series] = None, cumulative: Optional[pd.Series] = None,
+                     commit: bool = True) -> int:
+    """Upsert a date-indexed benchmark series (plus optional daily returns / cumulative index) on (symbol, date)"""
+    values = values.dropna()
+    if values.empty:
+        return 0
+
+    frame = pd.DataFrame({
+        'symbol': symbol,
+        'name': name or symbol,
+        'date': pd.to_datetime(values.index).date,
+        'value': values.to_numpy(dtype=float)
+    })
+    update_columns = ['value']
+    if daily_returns is not None:
+        frame['daily_return'] = daily_returns.reindex(values.index).to_numpy(dtype=float)
+        update_columns.append('daily_return')
+    if cumulative is not None:
+        frame['cumulative_index'] = cumulative.reindex(values.index).to_numpy(dtype=float)
+        update_columns.append('cumulative_index')
+    frame = frame.drop_duplicates('date', keep='last')
+
+    upsert(db, models.Benchmark, _records(frame), ['symbol', 'date'], update_columns)
+    if commit:
+        db.commit()
+    invalidate_benchmark_cache(symbol)
+    return len(frame)
+
+
+def ingest_exchange_rates(db: Session, from_currency: str, to_currency: str, rates: pd.Series,
+                          commit: bool = True) -> int:
+    """Upsert a date-indexed exchange rate series on (from_currency, to_currency, date)"""
+    rates = rates.dropna()
+    rates = rates[rates > 0]
+    if rates.empty:
+        return 0
+
+    frame = pd.DataFrame({
+        'from_currency': models.Currency(from_currency),
+        'to_currency': models.Currency(to_currency),
+        'date': pd.to_datetime(rates.index).date,
+        'rate': rates.to_numpy(dtype=float)
+    }).drop_duplicates('date', keep='last')
+
+    upsert(db, models.ExchangeRate, _records(frame), ['from_currency', 'to_currency', 'date'], ['rate'])
+    if commit:
+        db.commit()
+    invalidate_fx_cube()
+    return len(frame)
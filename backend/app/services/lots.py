@@ -0,0 +1,212 @@
+import numpy as np
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from .. import models
+from .position_ledger import TRADE_TYPES
+import logging
+
+logger = logging.getLogger(__name__)
+
+FIFO = "FIFO"
+AVERAGE = "AVERAGE"
+LOT_METHODS = [FIFO, AVERAGE]
+
+REALIZED_COLUMNS = [
+    'transaction_id', 'sell_transaction_id', 'acquired', 'sold', 'quantity', 'cost_basis', 'proceeds'
+]
+
+
+class LotBook:
+    """Open lots of one position stored as column arrays.
+
+    Lots are appended at the tail and consumed from the head, so a SELL costs
+    O(lots consumed). In AVERAGE mode lots are still consumed in FIFO order
+    (for quantities and holding periods) but the cost basis of a sale is the
+    moving average price, matching how Position.average_price is computed.
+    """
+
+    def __init__(self, method: str = FIFO, capacity: int = 16):
+        if method not in LOT_METHODS:
+            raise ValueError(f"Unknown lot method: {method}")
+        self.method = method
+        self.quantity = np.zeros(capacity)
+        self.unit_cost = np.zeros(capacity)
+        # Acquisition dates as proleptic ordinals, so holding periods are integer math
+        self.acquired = np.zeros(capacity, dtype=np.int64)
+        self.transaction_id = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.tail = 0
+        self.open_quantity = 0.0
+        self.open_cost = 0.0
+        # Realized slices, one entry per (lot, sale) pair
+        self.realized_columns: Dict[str, List] = {name: [] for name in REALIZED_COLUMNS}
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def _grow(self):
+        # Compact consumed lots first; only grow when the live part is full
+        live = self.tail - self.head
+        capacity = len(self.quantity)
+        if self.head > 0 and live < capacity // 2:
+            new_capacity = capacity
+        else:
+            new_capacity = capacity * 2
+
+        for name in ('quantity', 'unit_cost', 'acquired', 'transaction_id'):
+            old = getattr(self, name)
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:live] = old[self.head:self.tail]
+            setattr(self, name, new)
+        self.head = 0
+        self.tail = live
+
+    def buy(self, quantity: float, amount: float, on: date, transaction_id: int = 0):
+        if quantity <= 0:
+            return
+        if self.tail == len(self.quantity):
+            self._grow()
+
+        i = self.tail
+        self.quantity[i] = quantity
+        self.unit_cost[i] = amount / quantity
+        self.acquired[i] = on.toordinal()
+        self.transaction_id[i] = transaction_id
+        self.tail += 1
+        self.open_quantity += quantity
+        self.open_cost += amount
+
+    def sell(self, quantity: float, amount: float, on: date, transaction_id: int = 0) -> float:
+        """Consume lots for a sale and return the realized P&L"""
+        if quantity <= 0:
+            return 0.0
+
+        unit_proceeds = amount / quantity
+        average_cost = self.average_cost
+        sold = on.toordinal()
+        columns = self.realized_columns
+        remaining = quantity
+        realized_pnl = 0.0
+
+        while remaining > 1e-12 and self.head < self.tail:
+            i = self.head
+            lot_quantity = float(self.quantity[i])
+            taken = remaining if remaining < lot_quantity else lot_quantity
+            unit_cost = average_cost if self.method == AVERAGE else float(self.unit_cost[i])
+            cost_basis = taken * unit_cost
+            proceeds = taken * unit_proceeds
+
+            columns['transaction_id'].append(int(self.transaction_id[i]))
+            columns['sell_transaction_id'].append(transaction_id)
+            columns['acquired'].append(int(self.acquired[i]))
+            columns['sold'].append(sold)
+            columns['quantity'].append(taken)
+            columns['cost_basis'].append(cost_basis)
+            columns['proceeds'].append(proceeds)
+            realized_pnl += proceeds - cost_basis
+
+            self.open_quantity -= taken
+            self.open_cost -= cost_basis
+            remaining -= taken
+            if lot_quantity - taken <= 1e-12:
+                self.head += 1
+            else:
+                self.quantity[i] = lot_quantity - taken
+
+        if self.head == self.tail:
+            self.open_quantity = 0.0
+            self.open_cost = 0.0
+
+        # Selling more than is held: the uncovered part is recorded as a slice
+        # with no lot and no cost basis, like Position.realized_pnl treats it
+        if remaining > 1e-12:
+            proceeds = remaining * unit_proceeds
+            columns['transaction_id'].append(0)
+            columns['sell_transaction_id'].append(transaction_id)
+            columns['acquired'].append(sold)
+            columns['sold'].append(sold)
+            columns['quantity'].append(remaining)
+            columns['cost_basis'].append(0.0)
+            columns['proceeds'].append(proceeds)
+            realized_pnl += proceeds
+
+        return realized_pnl
+
+    @property
+    def average_cost(self) -> float:
+        return self.open_cost / self.open_quantity if self.open_quantity > 0 else 0.0
+
+    def open_lots(self) -> List[Dict]:
+        lots = []
+        for i in range(self.head, self.tail):
+            # In AVERAGE mode every open unit carries the moving average cost
+            unit_cost = self.average_cost if self.method == AVERAGE else float(self.unit_cost[i])
+            lots.append({
+                'transaction_id': int(self.transaction_id[i]),
+                'acquired_date': date.fromordinal(int(self.acquired[i])),
+                'quantity': float(self.quantity[i]),
+                'unit_cost': unit_cost,
+                'cost_basis': float(self.quantity[i]) * unit_cost
+            })
+        return lots
+
+    @property
+    def realized(self) -> List[Dict]:
+        columns = self.realized_columns
+        return [
+            {
+                'transaction_id': columns['transaction_id'][k],
+                'sell_transaction_id': columns['sell_transaction_id'][k],
+                'acquired_date': date.fromordinal(columns['acquired'][k]),
+                'sold_date': date.fromordinal(columns['sold'][k]),
+                'quantity': columns['quantity'][k],
+                'cost_basis': columns['cost_basis'][k],
+                'proceeds': columns['proceeds'][k],
+                'realized_pnl': columns['proceeds'][k] - columns['cost_basis'][k],
+                'holding_days': columns['sold'][k] - columns['acquired'][k]
+            }
+            for k in range(len(columns['sold']))
+        ]
+
+    @property
+    def realized_pnl(self) -> float:
+        return float(np.sum(self.realized_columns['proceeds']) - np.sum(self.realized_columns['cost_basis']))
+
+
+class LotEngine:
+    """Replays a portfolio's trades into one LotBook per asset"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def build(self, portfolio_id: int, method: str = FIFO, asset_ids: Optional[List[int]] = None) -> Dict[int, LotBook]:
+        """Return {asset_id: LotBook} after replaying every BUY/SELL in (date, id) order"""
+        query = self.db.query(
+            models.Transaction.id,
+            models.Transaction.asset_id,
+            models.Transaction.date,
+            models.Transaction.transaction_type,
+            models.Transaction.quantity,
+            models.Transaction.total_amount
+        ).filter(
+            models.Transaction.portfolio_id == portfolio_id,
+            models.Transaction.asset_id.isnot(None),
+            models.Transaction.transaction_type.in_(TRADE_TYPES)
+        )
+        if asset_ids is not None:
+            query = query.filter(models.Transaction.asset_id.in_(asset_ids))
+
+        books: Dict[int, LotBook] = {}
+        events = query.order_by(models.Transaction.date, models.Transaction.id).all()
+        for transaction_id, asset_id, event_date, transaction_type, quantity, amount in events:
+            book = books.get(asset_id)
+            if book is None:
+                book = books[asset_id] = LotBook(method)
+
+            if transaction_type == models.TransactionType.BUY:
+                book.buy(quantity or 0.0, amount or 0.0, event_date, transaction_id)
+            else:
+                book.sell(quantity or 0.0, amount or 0.0, event_date, transaction_id)
+
+        return books
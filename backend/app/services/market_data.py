@@ -1,22 +1,36 @@
-import yfinance as yf
-from datetime import datetime, timedelta, date
+import pandas as pd
+from datetime import datetime, timedelta, date, timezone
 from typing import Optional, Dict, List
-import requests
 from sqlalchemy.orm import Session
 from .. import models
 from ..config import settings
+from .providers import PERIOD_DAYS, PriceProvider, get_price_provider
+from .benchmark_ingestion import BENCHMARK_TICKERS, BenchmarkIngestion
+from .rate_series import RATE_SERIES, RateSeriesService
+from .ingestion import ingest_prices, ingest_exchange_rates
+from .quote_cache import quote_cache
+from .http_clients import http_clients
+from .symbol_catalog import get_catalog, add_to_catalog, symbol_key
 import logging
 import warnings
 
-# Suppress yfinance warnings
+# Suppress yfinance warnings (YahooPriceProvider)
 warnings.filterwarnings("ignore", category=FutureWarning, module="yfinance")
 warnings.filterwarnings("ignore", message=".*invalid value encountered.*")
 
 logger = logging.getLogger(__name__)
 
 class MarketDataService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, provider: Optional[PriceProvider] = None):
         self.db = db
+        self._provider = provider
+    
+    @property
+    def provider(self) -> PriceProvider:
+        """Provider given to the constructor, otherwise the one selected in settings"""
+        if self._provider is None:
+            self._provider = get_price_provider()
+        return self._provider
     
     def get_yahoo_ticker(self, symbol: str, exchange: str = None) -> str:
         """Convert symbol to Yahoo Finance format"""
@@ -24,37 +38,35 @@ class MarketDataService:
             return f"{symbol}.SA"
         return symbol
     
+    def _quote(self, provider: PriceProvider, ticker_symbol: str) -> Optional[Dict]:
+        """Latest bar of a ticker as a dict, shared by every request through the process-wide quote cache"""
+        def load():
+            quotes = provider.latest_quotes([ticker_symbol])
+            return None if quotes.empty else quotes.iloc[-1].to_dict()
+        
+        return quote_cache.get_or_load(f"{provider.name}:quote:{ticker_symbol}", load)
+    
+    def _mark_fetched(self, asset_ids: List[int], column=models.Asset.last_fetched_at):
+        """Stamp column (by default when a quote was last returned) of these assets with now; committed by the caller"""
+        if asset_ids:
+            self.db.query(models.Asset).filter(models.Asset.id.in_(asset_ids)).update(
+                {column: datetime.now(timezone.utc)}, synchronize_session=False
+            )
+    
     def update_asset_price(self, asset: models.Asset) -> Optional[float]:
         """Update current price for an asset"""
         try:
             ticker_symbol = self.get_yahoo_ticker(asset.symbol, asset.exchange)
-            ticker = yf.Ticker(ticker_symbol)
             
             # Get current price
-            info = ticker.info
-            current_price = info.get('regularMarketPrice') or info.get('previousClose')
+            quote = self._quote(self.provider, ticker_symbol)
             
-            if current_price:
-                # Save to database
-                today = date.today()
-                existing_price = self.db.query(models.Price).filter(
-                    models.Price.asset_id == asset.id,
-                    models.Price.date == today
-                ).first()
-                
-                if existing_price:
-                    existing_price.close = current_price
-                    existing_price.adjusted_close = current_price
-                else:
-                    new_price = models.Price(
-                        asset_id=asset.id,
-                        date=today,
-                        close=current_price,
-                        adjusted_close=current_price
-                    )
-                    self.db.add(new_price)
-                
-                self.db.commit()
+            if quote and quote.get('close'):
+                # Save to database, under the session the quote belongs to
+                current_price = float(quote['close'])
+                prices = pd.DataFrame([{'ticker': ticker_symbol, 'date': quote['date'], 'close': current_price}])
+                self._mark_fetched([asset.id])
+                ingest_prices(self.db, prices, {ticker_symbol: asset.id})
                 return current_price
                 
         except Exception as e:
@@ -62,42 +74,52 @@ class MarketDataService:
         
         return None
     
+    def bulk_update_prices(self, assets: List[models.Asset], provider: Optional[PriceProvider] = None) -> Dict[str, int]:
+        """Update current prices of many assets with one provider call and one upsert
+        
+        The latest close of every ticker is stored under the date of its own bar,
+        so a weekend or holiday refresh rewrites the last session instead of
+        creating a row for a day the market was closed.
+        """
+        if not assets:
+            return {"updated": 0, "failed": 0}
+        
+        provider = provider or self.provider
+        by_ticker = {self.get_yahoo_ticker(asset.symbol, asset.exchange): asset for asset in assets}
+        
+        try:
+            quotes = provider.latest_quotes(list(by_ticker))
+            quotes = quotes[quotes['ticker'].isin(by_ticker.keys())][['ticker', 'date', 'close']]
+            # Every asset counts as attempted, so tickers without quotes can be backed off
+            self._mark_fetched([asset.id for asset in assets], models.Asset.last_attempted_at)
+            self._mark_fetched([by_ticker[ticker].id for ticker in quotes['ticker'].unique()])
+            written = ingest_prices(self.db, quotes, {ticker: asset.id for ticker, asset in by_ticker.items()})
+            return {"updated": written, "failed": len(assets) - written}
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error in bulk price update for {len(assets)} assets: {str(e)}")
+            return {"updated": 0, "failed": len(assets)}
+    
     def update_historical_prices(self, asset: models.Asset, period: str = "1mo"):
         """Update historical prices for an asset"""
         try:
             ticker_symbol = self.get_yahoo_ticker(asset.symbol, asset.exchange)
-            ticker = yf.Ticker(ticker_symbol)
+            provider = self.provider
             
-            # Get historical data
-            hist = ticker.history(period=period)
+            def load():
+                bars = provider.history([ticker_symbol], period=period)
+                return None if bars.empty else bars
             
-            for date_idx, row in hist.iterrows():
-                price_date = date_idx.date()
-                
-                existing_price = self.db.query(models.Price).filter(
-                    models.Price.asset_id == asset.id,
-                    models.Price.date == price_date
-                ).first()
-                
-                if existing_price:
-                    existing_price.open = row['Open']
-                    existing_price.high = row['High']
-                    existing_price.low = row['Low']
-                    existing_price.close = row['Close']
-                    existing_price.volume = row['Volume']
-                else:
-                    new_price = models.Price(
-                        asset_id=asset.id,
-                        date=price_date,
-                        open=row['Open'],
-                        high=row['High'],
-                        low=row['Low'],
-                        close=row['Close'],
-                        volume=row['Volume']
-                    )
-                    self.db.add(new_price)
+            # Get historical data (empty results are not cached)
+            prices = quote_cache.get_or_load(
+                f"{provider.name}:history:{ticker_symbol}:{period}", load,
+                ttl=settings.QUOTE_CACHE_HISTORY_TTL_SECONDS
+            )
+            
+            if prices is not None:
+                ingest_prices(self.db, prices, {ticker_symbol: asset.id})
             
-            self.db.commit()
             return True
             
         except Exception as e:
@@ -110,33 +132,16 @@ class MarketDataService:
             return 1.0
         
         try:
-            # Try Yahoo Finance first
-            ticker_symbol = f"{from_currency}{to_currency}=X"
-            ticker = yf.Ticker(ticker_symbol)
-            info = ticker.info
-            rate = info.get('regularMarketPrice') or info.get('previousClose')
+            provider = self.provider
+            latest = quote_cache.get_or_load(
+                f"{provider.name}:fx:{from_currency}{to_currency}",
+                lambda: provider.latest_fx_rate(from_currency, to_currency)
+            )
             
-            if rate:
-                # Save to database
-                today = date.today()
-                existing_rate = self.db.query(models.ExchangeRate).filter(
-                    models.ExchangeRate.from_currency == from_currency,
-                    models.ExchangeRate.to_currency == to_currency,
-                    models.ExchangeRate.date == today
-                ).first()
-                
-                if existing_rate:
-                    existing_rate.rate = rate
-                else:
-                    new_rate = models.ExchangeRate(
-                        from_currency=from_currency,
-                        to_currency=to_currency,
-                        date=today,
-                        rate=rate
-                    )
-                    self.db.add(new_rate)
-                
-                self.db.commit()
+            if latest:
+                # Save to database, under the date of the quote
+                rate_date, rate = latest
+                ingest_exchange_rates(self.db, from_currency, to_currency, pd.Series([rate], index=[rate_date]))
                 return rate
                 
         except Exception as e:
@@ -145,109 +150,50 @@ class MarketDataService:
         return None
     
     def update_benchmark_data(self, benchmark: str, period: str = "1mo"):
-        """Update benchmark index data"""
-        benchmark_tickers = {
-            "IBOV": "^BVSP",
-            "SP500": "^GSPC",
-            "NASDAQ": "^IXIC",
-            "DOW": "^DJI",
-            "IPCA": None,  # Need special handling
-            "CDI": None,    # Need special handling from BCB
-            "SELIC": None   # Need special handling from BCB
-        }
-        
-        if benchmark not in benchmark_tickers:
-            logger.warning(f"Unknown benchmark: {benchmark}")
-            return False
-        
-        ticker_symbol = benchmark_tickers.get(benchmark)
-        
-        if ticker_symbol:
-            try:
-                ticker = yf.Ticker(ticker_symbol)
-                hist = ticker.history(period=period)
-                
-                for date_idx, row in hist.iterrows():
-                    bench_date = date_idx.date()
-                    
-                    existing = self.db.query(models.Benchmark).filter(
-                        models.Benchmark.symbol == benchmark,
-                        models.Benchmark.date == bench_date
-                    ).first()
-                    
-                    if existing:
-                        existing.value = row['Close']
-                    else:
-                        new_benchmark = models.Benchmark(
-                            symbol=benchmark,
-                            name=benchmark,
-                            date=bench_date,
-                            value=row['Close']
-                        )
-                        self.db.add(new_benchmark)
-                
-                self.db.commit()
-                return True
-                
-            except Exception as e:
-                logger.error(f"Error updating benchmark {benchmark}: {str(e)}")
-                return False
+        """Make sure benchmark data covers period, downloading only the missing dates"""
+        if benchmark in BENCHMARK_TICKERS:
+            start = date.today() - timedelta(days=PERIOD_DAYS.get(period, 31))
+            BenchmarkIngestion(self.db).sync([benchmark], start=start)
+            return True
         
-        # Handle special cases (CDI, SELIC, IPCA)
-        if benchmark in ["CDI", "SELIC"]:
+        # Rate series (CDI, SELIC, IPCA) come from the BCB exports
+        if benchmark in RATE_SERIES:
             return self._update_brazilian_rates(benchmark)
         
+        logger.warning(f"Unknown benchmark: {benchmark}")
         return False
     
     def _update_brazilian_rates(self, rate_type: str):
-        """Update Brazilian interest rates from BCB"""
-        # This would connect to Brazilian Central Bank API
-        # For now, using placeholder values
-        try:
-            today = date.today()
-            
-            # Placeholder rates
-            rates = {
-                "CDI": 11.65,  # Annual rate in %
-                "SELIC": 11.75  # Annual rate in %
-            }
-            
-            if rate_type in rates:
-                daily_rate = rates[rate_type] / 365  # Simple daily conversion
-                
-                existing = self.db.query(models.Benchmark).filter(
-                    models.Benchmark.symbol == rate_type,
-                    models.Benchmark.date == today
-                ).first()
-                
-                if existing:
-                    existing.value = rates[rate_type]
-                    existing.daily_return = daily_rate
-                else:
-                    new_benchmark = models.Benchmark(
-                        symbol=rate_type,
-                        name=rate_type,
-                        date=today,
-                        value=rates[rate_type],
-                        daily_return=daily_rate
-                    )
-                    self.db.add(new_benchmark)
-                
-                self.db.commit()
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error updating Brazilian rate {rate_type}: {str(e)}")
-        
-        return False
+        """Load a Brazilian rate series (CDI, SELIC, IPCA) from its BCB export in RATE_SERIES_DIR"""
+        written = RateSeriesService(self.db).sync_from_files(symbols=[rate_type])
+        if rate_type not in written:
+            logger.warning(f"No BCB series file for {rate_type} in RATE_SERIES_DIR")
+            return False
+        return True
     
     def search_asset(self, query: str) -> List[Dict]:
-        """Search for assets by symbol or name using Yahoo Finance"""
-        results = []
+        """Search for assets by symbol or name
+        
+        Answered from the local symbol catalog (stored assets plus the listing
+        file); the price provider is only asked for queries the catalog does
+        not know, and queries it has no answer for are not asked again for
+        SYMBOL_MISS_TTL_SECONDS.
+        """
+        results = get_catalog(self.db).search(query, limit=15)
+        if results:
+            return results
         
-        # Use Yahoo Finance (Brapi requires API key now)
-        yahoo_results = self._search_yahoo_finance(query)
-        results.extend(yahoo_results)
+        miss_key = f"search:miss:{symbol_key(query)}"
+        if not symbol_key(query) or quote_cache.get(miss_key):
+            return []
+        
+        # Provider search (Brapi requires API key now)
+        provider_results = self.provider.search(query)
+        if not provider_results:
+            quote_cache.put(miss_key, True, ttl=settings.SYMBOL_MISS_TTL_SECONDS)
+            return []
+        add_to_catalog(provider_results)
+        results.extend(provider_results)
         
         # Remove duplicates and limit results
         seen = set()
@@ -276,11 +222,9 @@ class MarketDataService:
             
             for symbol in symbols_to_try:
                 try:
-                    url = f"https://brapi.dev/api/quote/{symbol}"
-                    response = requests.get(url, timeout=3)
+                    data = http_clients.get_json_sync("brapi", f"/api/quote/{symbol}", timeout=3)
                     
-                    if response.status_code == 200:
-                        data = response.json()
+                    if data:
                         results = data.get('results', [])
                         
                         if results:
@@ -310,130 +254,3 @@ class MarketDataService:
             logger.error(f"Error searching Brapi for {query}: {str(e)}")
         
         return []
-    
-    def _search_yahoo_finance(self, query: str) -> List[Dict]:
-        """Search using Yahoo Finance - only show results that match user input"""
-        try:
-            base_query = query.upper()
-            results = []
-            
-            # Only search for symbols that make sense for the user input
-            symbols_to_try = []
-            
-            # If user types 3+ chars, try exact matches and logical variations
-            if len(base_query) >= 3:
-                # 1. Exact match first
-                symbols_to_try.append(base_query)
-                
-                # 2. For Brazilian stocks, try .SA suffix
-                if not base_query.endswith('.SA'):
-                    symbols_to_try.append(f"{base_query}.SA")
-                
-                # 3. Only add common BR variations for known patterns
-                if len(base_query) == 4 and base_query.endswith(('4', '3')):
-                    # Already has number (PETR4, VALE3) - try with .SA
-                    symbols_to_try.append(f"{base_query}.SA")
-                elif len(base_query) <= 4 and not base_query.endswith(('4', '3', '11')):
-                    # Base ticker (PETR, VALE) - try common variations
-                    symbols_to_try.extend([
-                        f"{base_query}4.SA",  # Most common (PN)
-                        f"{base_query}3.SA",  # Second most common (ON)
-                    ])
-            
-            # Short queries (1-2 chars) - only exact matches
-            elif len(base_query) >= 2:
-                symbols_to_try.append(base_query)
-            
-            for symbol in symbols_to_try:
-                try:
-                    ticker = yf.Ticker(symbol)
-                    info = ticker.info
-                    
-                    # Check if we got valid data
-                    if info and info.get('symbol') and info.get('longName'):
-                        # Determine asset type
-                        quote_type = info.get('quoteType', '').upper()
-                        asset_type = {
-                            'EQUITY': 'STOCK',
-                            'ETF': 'ETF', 
-                            'MUTUALFUND': 'FUND',
-                            'INDEX': 'INDEX',
-                            'CRYPTOCURRENCY': 'CRYPTO'
-                        }.get(quote_type, 'STOCK')
-                        
-                        # Determine exchange
-                        exchange = info.get('exchange', '')
-                        if '.SA' in symbol or exchange in ['SAO', 'BOVESPA']:
-                            exchange = 'B3'
-                        elif exchange in ['NMS', 'NGM']:
-                            exchange = 'NASDAQ'
-                        elif exchange == 'NYQ':
-                            exchange = 'NYSE'
-                        elif exchange in ['LSE']:
-                            exchange = 'LSE'
-                        else:
-                            exchange = exchange or 'OTHER'
-                        
-                        # Calculate relevance - prioritize exact matches
-                        symbol_clean = info.get('symbol', '').replace('.SA', '')
-                        relevance_score = 0
-                        
-                        # Perfect match (user typed exactly this)
-                        if symbol_clean.upper() == base_query or info.get('symbol', '').upper() == base_query:
-                            relevance_score = 100
-                        # Starts with user input (PETR matches PETR4) 
-                        elif symbol_clean.upper().startswith(base_query):
-                            relevance_score = 80
-                        # Contains user input
-                        elif base_query in symbol_clean.upper():
-                            relevance_score = 60
-                        # Company name contains user input
-                        elif base_query in info.get('longName', '').upper():
-                            relevance_score = 40
-                        else:
-                            relevance_score = 10
-                            
-                        # Bonus for popular exchanges
-                        if exchange in ['B3', 'NASDAQ', 'NYSE']:
-                            relevance_score += 5
-                            
-                        # Filter out irrelevant results (score too low)
-                        if relevance_score < 30:
-                            continue
-                            
-                        result = {
-                            'symbol': info.get('symbol'),
-                            'name': info.get('longName') or info.get('shortName'),
-                            'exchange': exchange,
-                            'sector': info.get('sector'),
-                            'asset_type': asset_type,
-                            'currency': info.get('currency', 'USD'),
-                            'current_price': info.get('regularMarketPrice') or info.get('previousClose'),
-                            'market_cap': info.get('marketCap'),
-                            'industry': info.get('industry'),
-                            'relevance_score': relevance_score
-                        }
-                        
-                        # Only add if we have essential info and it's not a duplicate
-                        if result['symbol'] and result['name']:
-                            # Avoid adding the same symbol twice
-                            if not any(r['symbol'] == result['symbol'] for r in results):
-                                results.append(result)
-                            
-                except Exception as e:
-                    logger.debug(f"Error getting Yahoo Finance info for {symbol}: {str(e)}")
-                    continue
-            
-            # Sort by relevance score (highest first)
-            results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
-            
-            # Remove relevance score from final results
-            for result in results:
-                result.pop('relevance_score', None)
-            
-            return results[:5]  # Limit to 5 most relevant results
-            
-        except Exception as e:
-            logger.error(f"Error searching Yahoo Finance for {query}: {str(e)}")
-        
-        return []
@@ -2,12 +2,15 @@
 Real Market Data Service usando Alpha Vantage API gratuita
 """
 import asyncio
-import aiohttp
 import logging
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from .. import models
+from ..config import settings
+from .quote_cache import quote_cache
+from .http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +21,9 @@ class RealMarketDataService:
     
     def __init__(self, db: Session):
         self.db = db
-        # API Key gratuita da Alpha Vantage (demo key)
-        self.alpha_vantage_key = "demo"  # Limitado mas funciona para demonstração
-        self.base_url_alpha = "https://www.alphavantage.co/query"
-        
-        # Fallback para Financial Modeling Prep (também gratuita)
-        self.fmp_base_url = "https://financialmodelingprep.com/api/v3"
-        
-        # Cache para evitar muitas chamadas
-        self._cache = {}
-        self._cache_timeout = 300  # 5 minutos
+        # API Key da Alpha Vantage (a chave demo é limitada mas funciona para demonstração)
+        self.alpha_vantage_key = settings.ALPHA_VANTAGE_KEY or "demo"
+        # Chamadas HTTP passam pelo http_clients (sessões persistentes, retry e métricas por upstream)
     
     async def get_asset_price_history(self, symbol: str, period_days: int = 365) -> List[Dict]:
         """
@@ -48,16 +44,15 @@ class RealMarketDataService:
     
     async def _get_alpha_vantage_daily(self, symbol: str) -> Optional[Dict]:
         """
-        Busca dados diários da Alpha Vantage
+        Busca dados diários da Alpha Vantage (via quote_cache, uma chamada por símbolo em voo)
         """
-        cache_key = f"alpha_{symbol}_daily"
-        
-        # Check cache
-        if cache_key in self._cache:
-            cache_time, cache_data = self._cache[cache_key]
-            if (datetime.now() - cache_time).seconds < self._cache_timeout:
-                return cache_data
-        
+        return await quote_cache.get_or_load_async(
+            f"alpha:daily:{symbol}",
+            lambda: self._fetch_alpha_vantage_daily(symbol),
+            ttl=settings.QUOTE_CACHE_HISTORY_TTL_SECONDS
+        )
+    
+    async def _fetch_alpha_vantage_daily(self, symbol: str) -> Optional[Dict]:
         try:
             # Para ações brasileiras, adiciona .SA
             if not symbol.endswith('.SA') and len(symbol) <= 6:
@@ -65,7 +60,6 @@ class RealMarketDataService:
             else:
                 api_symbol = symbol
             
-            url = f"{self.base_url_alpha}"
             params = {
                 "function": "TIME_SERIES_DAILY",
                 "symbol": api_symbol,
@@ -73,22 +67,13 @@ class RealMarketDataService:
                 "outputsize": "compact"  # últimos 100 dias
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # Verifica se tem dados válidos
-                        if "Time Series (Daily)" in data:
-                            # Cache os dados
-                            self._cache[cache_key] = (datetime.now(), data)
-                            return data
-                        else:
-                            logger.warning(f"Alpha Vantage não retornou dados para {symbol}: {data}")
-                            return None
-                    else:
-                        logger.warning(f"Alpha Vantage API erro {response.status} para {symbol}")
-                        return None
+            data = await http_clients.get_json("alphavantage", "/query", params=params)
+            
+            # Verifica se tem dados válidos
+            if data and "Time Series (Daily)" in data:
+                return data
+            logger.warning(f"Alpha Vantage não retornou dados para {symbol}: {data}")
+            return None
         
         except Exception as e:
             logger.error(f"Erro na chamada Alpha Vantage para {symbol}: {str(e)}")
@@ -374,60 +359,118 @@ class RealMarketDataService:
         
         return closest_price
     
-    async def get_real_time_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
+    async def get_real_time_quotes(self, symbols: List[str], deadline: Optional[float] = None) -> Dict[str, Dict]:
         """
-        Busca cotações em tempo real para múltiplos símbolos
+        Busca cotações em tempo real para qualquer número de símbolos
+        
+        Símbolos com cotação fresca no quote_cache são respondidos sem chamada; os
+        demais são buscados em paralelo, limitados pela cota da Alpha Vantage
+        (token bucket do http_clients). Quem não responder até o deadline
+        (QUOTE_FANOUT_DEADLINE_SECONDS) volta com a última cotação conhecida,
+        marcada com "stale": True; símbolos sem nenhuma cotação ficam de fora.
         """
-        quotes = {}
+        symbols = list(dict.fromkeys(symbols))
+        deadline = settings.QUOTE_FANOUT_DEADLINE_SECONDS if deadline is None else deadline
+        quotes: Dict[str, Dict] = {}
         
-        # Para demonstração, usa a API gratuita do Alpha Vantage
-        for symbol in symbols[:5]:  # Limita a 5 por vez para não exceder rate limit
+        async def fetch(symbol: str):
             try:
                 quote = await self._get_alpha_vantage_quote(symbol)
                 if quote:
-                    quotes[symbol] = quote
-                
-                # Rate limiting
-                await asyncio.sleep(0.2)  # 200ms entre chamadas
-                
+                    quotes[symbol] = {**quote, "stale": False}
             except Exception as e:
                 logger.error(f"Erro ao buscar cotação para {symbol}: {str(e)}")
         
-        return quotes
+        # Uma task por símbolo; no deadline as pendentes NÃO são canceladas: a carga é
+        # compartilhada (quote_cache) com outras requisições e termina enchendo o cache
+        tasks = [asyncio.ensure_future(fetch(symbol)) for symbol in symbols]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            if pending:
+                logger.warning(f"Deadline de {deadline}s atingido com {len(quotes)}/{len(symbols)} cotações")
+        
+        # Cópia: buscas que terminarem depois do deadline não alteram a resposta
+        result = dict(quotes)
+        
+        missing = [symbol for symbol in symbols if symbol not in result]
+        for symbol, quote in (await self._last_known_quotes(missing)).items():
+            result[symbol] = {**quote, "stale": True}
+        
+        return {symbol: result[symbol] for symbol in symbols if symbol in result}
+    
+    async def _last_known_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Última cotação conhecida: a última da Alpha Vantage no quote_cache, senão o último preço salvo
+        """
+        cached = await asyncio.gather(*(quote_cache.get_async(f"alpha:quote:last:{symbol}") for symbol in symbols))
+        known = {symbol: quote for symbol, quote in zip(symbols, cached) if quote}
+        
+        missing = [symbol for symbol in symbols if symbol not in known]
+        if missing:
+            # Ativos brasileiros são salvos com ou sem o sufixo .SA
+            by_stored_symbol = {name: symbol for symbol in missing for name in (symbol, f"{symbol}.SA")}
+            asset_ids = self.db.query(models.Asset.id).filter(models.Asset.symbol.in_(list(by_stored_symbol)))
+            latest = self.db.query(
+                models.Price.asset_id,
+                func.max(models.Price.date).label('date')
+            ).filter(
+                models.Price.asset_id.in_(asset_ids)
+            ).group_by(models.Price.asset_id).subquery()
+            rows = self.db.query(
+                models.Asset.symbol, models.Price.close, models.Price.date
+            ).join(
+                models.Price, models.Price.asset_id == models.Asset.id
+            ).join(
+                latest,
+                (models.Price.asset_id == latest.c.asset_id) & (models.Price.date == latest.c.date)
+            ).order_by(models.Price.date).all()
+            for stored_symbol, close, price_date in rows:
+                symbol = by_stored_symbol[stored_symbol]
+                known[symbol] = {
+                    "symbol": symbol,
+                    "price": float(close),
+                    "latest_trading_day": price_date.isoformat()
+                }
+        
+        return known
     
     async def _get_alpha_vantage_quote(self, symbol: str) -> Optional[Dict]:
         """
-        Busca cotação atual da Alpha Vantage
+        Busca cotação atual da Alpha Vantage (via quote_cache, uma chamada por símbolo em voo)
         """
+        return await quote_cache.get_or_load_async(
+            f"alpha:quote:{symbol}", lambda: self._fetch_alpha_vantage_quote(symbol)
+        )
+    
+    async def _fetch_alpha_vantage_quote(self, symbol: str) -> Optional[Dict]:
         try:
             if not symbol.endswith('.SA') and len(symbol) <= 6:
                 api_symbol = f"{symbol}.SA"
             else:
                 api_symbol = symbol
             
-            url = f"{self.base_url_alpha}"
             params = {
                 "function": "GLOBAL_QUOTE",
                 "symbol": api_symbol,
                 "apikey": self.alpha_vantage_key
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        quote_data = data.get("Global Quote", {})
-                        if quote_data:
-                            return {
-                                "symbol": symbol,
-                                "price": float(quote_data.get("05. price", 0)),
-                                "change": float(quote_data.get("09. change", 0)),
-                                "change_percent": quote_data.get("10. change percent", "0%"),
-                                "volume": int(quote_data.get("06. volume", 0)),
-                                "latest_trading_day": quote_data.get("07. latest trading day")
-                            }
-                        
+            data = await http_clients.get_json("alphavantage", "/query", params=params)
+            
+            quote_data = (data or {}).get("Global Quote", {})
+            if quote_data:
+                quote = {
+                    "symbol": symbol,
+                    "price": float(quote_data.get("05. price", 0)),
+                    "change": float(quote_data.get("09. change", 0)),
+                    "change_percent": quote_data.get("10. change percent", "0%"),
+                    "volume": int(quote_data.get("06. volume", 0)),
+                    "latest_trading_day": quote_data.get("07. latest trading day")
+                }
+                # Guardada por mais tempo, para responder como "stale" quando o deadline estourar
+                await quote_cache.put_async(f"alpha:quote:last:{symbol}", quote, ttl=settings.QUOTE_LAST_KNOWN_TTL_SECONDS)
+                return quote
+            
             return None
             
         except Exception as e:
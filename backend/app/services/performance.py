@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional
+
+TRADING_DAYS = 252
+
+DEFAULT_RISK_FREE_RATE = 0.1165
+
+# Standard horizons; "ytd" and "inception" are resolved against the series
+HORIZONS = {
+    '1d': pd.DateOffset(days=1),
+    '1w': pd.DateOffset(weeks=1),
+    '1m': pd.DateOffset(months=1),
+    '3m': pd.DateOffset(months=3),
+    '6m': pd.DateOffset(months=6),
+    'ytd': None,
+    '1y': pd.DateOffset(years=1),
+    '3y': pd.DateOffset(years=3),
+    '5y': pd.DateOffset(years=5),
+    'inception': None
+}
+
+DEFAULT_HORIZONS = ['1d', '1m', '3m', 'ytd', '1y', 'inception']
+
+
+def daily_returns(series: pd.DataFrame) -> pd.Series:
+    """Flow-adjusted business-day returns of the invested positions
+
+    Works on the snapshot columns (SERIES_COLUMNS). Buys and sells are treated
+    as external flows of the positions and dividends as income, so the result
+    does not depend on whether the user records deposits. Buys are invested at
+    the start of the day and sales leave at the end of it:
+
+        r_t = (MV_t + sells_t + dividends_t) / (MV_{t-1} + buys_t) - 1
+    """
+    if series.empty:
+        return pd.Series(dtype=float)
+
+    # Business days only; cumulative columns carry weekend activity over
+    days = series.index[series.index.dayofweek < 5]
+    if len(days) == 0 or days[-1] != series.index[-1]:
+        days = days.append(series.index[-1:])
+    sampled = series.reindex(days)
+
+    market_value = sampled['market_value'].to_numpy(dtype=float)
+    invested = sampled['invested'].to_numpy(dtype=float)
+    cash = sampled['cash'].to_numpy(dtype=float)
+    external = series['net_flow'].cumsum().reindex(days).to_numpy(dtype=float)
+
+    trades = np.diff(invested, prepend=invested[0])
+    # cash moves by external flows - trades + dividends
+    dividends = np.diff(cash, prepend=cash[0]) - np.diff(external, prepend=external[0]) + trades
+
+    base = np.concatenate([[0.0], market_value[:-1]]) + np.maximum(trades, 0.0)
+    ending = market_value + np.maximum(-trades, 0.0) + dividends
+    returns = np.divide(ending, base, out=np.ones_like(ending), where=base > 0) - 1.0
+    returns[0] = 0.0
+    returns = np.maximum(returns, -1.0 + 1e-12)
+
+    return pd.Series(returns, index=days)
+
+
+def horizon_start(horizon: str, as_of: pd.Timestamp, first_day: pd.Timestamp) -> pd.Timestamp:
+    if horizon == 'inception':
+        return first_day
+    if horizon == 'ytd':
+        return pd.Timestamp(as_of.year - 1, 12, 31)
+    return as_of - HORIZONS[horizon]
+
+
+def compute_horizon_metrics(returns: pd.Series, horizons: Optional[List[str]] = None,
+                            risk_free_rate: float = DEFAULT_RISK_FREE_RATE) -> Dict[str, Dict]:
+    """Return, annualized return, volatility and Sharpe for every horizon in one pass
+
+    Prefix sums of log(1 + r), r and r^2 are built once; each horizon is then
+    two lookups into them, whatever the number of horizons requested.
+    """
+    horizons = horizons or DEFAULT_HORIZONS
+    if len(returns) < 2:
+        return {horizon: None for horizon in horizons}
+
+    values = returns.to_numpy(dtype=float)
+    log_growth = np.concatenate([[0.0], np.cumsum(np.log1p(values))])
+    sum_r = np.concatenate([[0.0], np.cumsum(values)])
+    sum_r2 = np.concatenate([[0.0], np.cumsum(values ** 2)])
+
+    index = returns.index
+    as_of = index[-1]
+    end = len(values)
+    results = {}
+
+    for horizon in horizons:
+        start_day = horizon_start(horizon, as_of, index[0])
+        if start_day < index[0] and horizon not in ('ytd', 'inception'):
+            # Series does not cover the horizon
+            results[horizon] = None
+            continue
+
+        # Last point at or before the start date is the base of the window
+        start = max(1, int(np.searchsorted(index.values, np.datetime64(start_day), side='right')))
+        n = end - start
+        if n <= 0:
+            results[horizon] = None
+            continue
+
+        total_return = np.expm1(log_growth[end] - log_growth[start])
+        mean = (sum_r[end] - sum_r[start]) / n
+        variance = (sum_r2[end] - sum_r2[start]) / n - mean ** 2
+        volatility = np.sqrt(max(variance, 0.0) * n / (n - 1) * TRADING_DAYS) if n > 1 else 0.0
+
+        years = n / TRADING_DAYS
+        annualized = (1 + total_return) ** (1 / years) - 1 if years >= 1 else None
+        excess = mean * TRADING_DAYS - risk_free_rate
+        sharpe = excess / volatility if volatility > 0 else 0.0
+
+        results[horizon] = {
+            'start_date': index[start - 1].date(),
+            'end_date': as_of.date(),
+            'return': float(total_return) * 100,
+            'annualized_return': float(annualized) * 100 if annualized is not None else None,
+            'volatility': float(volatility) * 100,
+            'sharpe_ratio': float(sharpe)
+        }
+
+    return results
+
+
+def rolling_metrics(returns: pd.Series, window: int = 63, risk_free_rate: float = DEFAULT_RISK_FREE_RATE,
+                    start_date: Optional[date] = None, max_points: int = 60) -> List[Dict]:
+    """Rolling annualized volatility and Sharpe from prefix sums, sampled for charts"""
+    values = returns.to_numpy(dtype=float)[1:]
+    if len(values) < window or window < 2:
+        return []
+
+    sum_r = np.concatenate([[0.0], np.cumsum(values)])
+    sum_r2 = np.concatenate([[0.0], np.cumsum(values ** 2)])
+
+    window_sum = sum_r[window:] - sum_r[:-window]
+    window_sum2 = sum_r2[window:] - sum_r2[:-window]
+    mean = window_sum / window
+    variance = np.maximum(window_sum2 / window - mean ** 2, 0.0) * window / (window - 1)
+    volatility = np.sqrt(variance * TRADING_DAYS)
+    sharpe = np.divide(mean * TRADING_DAYS - risk_free_rate, volatility,
+                       out=np.zeros_like(volatility), where=volatility > 0)
+
+    days = returns.index[1:][window - 1:]
+    frame = pd.DataFrame({'volatility': volatility * 100, 'sharpe_ratio': sharpe}, index=days)
+    if start_date is not None:
+        frame = frame[frame.index >= pd.Timestamp(start_date)]
+    if frame.empty:
+        return []
+
+    step = max(1, len(frame) // max_points)
+    sampled = frame.iloc[::step]
+    if sampled.index[-1] != frame.index[-1]:
+        sampled = pd.concat([sampled, frame.iloc[[-1]]])
+
+    return [
+        {
+            'date': day.date().isoformat(),
+            'volatility': round(float(row['volatility']), 4),
+            'sharpe_ratio': round(float(row['sharpe_ratio']), 4)
+        }
+        for day, row in sampled.iterrows()
+    ]
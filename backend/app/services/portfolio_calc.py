@@ -5,6 +5,12 @@ from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from .. import models
+from .valuation import ValuationEngine, compute_series_metrics
+from .snapshots import SnapshotService
+from .position_ledger import PositionLedger
+from .lots import LotEngine, FIFO
+from .benchmark_analytics import BenchmarkAnalytics
+from .performance import daily_returns, compute_horizon_metrics, rolling_metrics, horizon_start, DEFAULT_HORIZONS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,6 +18,11 @@ logger = logging.getLogger(__name__)
 class PortfolioCalculator:
     def __init__(self, db: Session):
         self.db = db
+        self.valuation = ValuationEngine(db)
+        self.snapshots = SnapshotService(db)
+        self.ledger = PositionLedger(db)
+        self.lots = LotEngine(db)
+        self.benchmarks = BenchmarkAnalytics(db)
     
     def update_position(self, position: models.Position) -> models.Position:
         """Update position calculations"""
@@ -35,22 +46,125 @@ class PortfolioCalculator:
             logger.error(f"Error updating position {position.id}: {str(e)}")
             return position
     
-    def calculate_portfolio_value(self, portfolio_id: int) -> Dict:
-        """Calculate total portfolio value and returns"""
+    def get_latest_prices(self, asset_ids: List[int]) -> Dict[int, float]:
+        """Latest close for each asset, fetched in a single query"""
+        asset_ids = list({asset_id for asset_id in asset_ids if asset_id is not None})
+        if not asset_ids:
+            return {}
+        
+        latest = self.latest_price_subquery(asset_ids)
+        rows = self.db.query(latest.c.asset_id, latest.c.close).all()
+        return {asset_id: close for asset_id, close in rows}
+    
+    def latest_price_subquery(self, asset_ids):
+        """Subquery (asset_id, close) with the latest close of each asset
+        
+        asset_ids may be a list or a select of ids, so callers can join it
+        into a bigger query instead of running it separately.
+        """
+        if self.db.bind.dialect.name == "postgresql":
+            # DISTINCT ON keeps the first row per asset in ORDER BY order
+            return self.db.query(
+                models.Price.asset_id, models.Price.close
+            ).filter(
+                models.Price.asset_id.in_(asset_ids)
+            ).distinct(
+                models.Price.asset_id
+            ).order_by(
+                models.Price.asset_id, models.Price.date.desc()
+            ).subquery()
+        
+        # Portable fallback (SQLite): join against MAX(date) per asset
+        latest = self.db.query(
+            models.Price.asset_id,
+            func.max(models.Price.date).label('date')
+        ).filter(
+            models.Price.asset_id.in_(asset_ids)
+        ).group_by(models.Price.asset_id).subquery()
+        
+        return self.db.query(
+            models.Price.asset_id, models.Price.close
+        ).join(
+            latest,
+            (models.Price.asset_id == latest.c.asset_id) & (models.Price.date == latest.c.date)
+        ).subquery()
+    
+    def value_positions(self, positions: List[models.Position], prices: Dict[int, float]) -> Dict[int, Dict]:
+        """Current price/value/unrealized P&L per position id, without touching the ORM objects"""
+        values = {}
+        
+        for position in positions:
+            price = prices.get(position.asset_id)
+            if price is None:
+                # No quote available: keep whatever was last persisted
+                values[position.id] = {
+                    'current_price': position.current_price,
+                    'current_value': position.current_value,
+                    'unrealized_pnl': position.unrealized_pnl
+                }
+                continue
+            
+            current_value = position.quantity * price
+            values[position.id] = {
+                'current_price': price,
+                'current_value': current_value,
+                'unrealized_pnl': current_value - position.total_invested
+            }
+        
+        return values
+    
+    def _apply_latest_prices(self, positions: List[models.Position], prices: Dict[int, float]) -> bool:
+        """Update positions in memory, returning True if any of them changed"""
+        changed = False
+        valuations = self.value_positions(positions, prices)
+        
+        for position in positions:
+            valuation = valuations[position.id]
+            current = {
+                'current_price': position.current_price,
+                'current_value': position.current_value,
+                'unrealized_pnl': position.unrealized_pnl
+            }
+            
+            if current != valuation:
+                for field, value in valuation.items():
+                    setattr(position, field, value)
+                position.last_updated = datetime.utcnow()
+                changed = True
+        
+        return changed
+    
+    def calculate_portfolio_value(self, portfolio_id: int, persist: bool = False) -> Dict:
+        """Calculate total portfolio value and returns
+
+        By default this is a pure read: current values are computed from the
+        latest prices without writing. Pass persist=True to store them on the
+        positions (one commit, only if something changed); read endpoints leave
+        that to PositionRefresher.
+        """
         try:
             positions = self.db.query(models.Position).filter(
                 models.Position.portfolio_id == portfolio_id
             ).all()
             
+            # One price query for every position
+            prices = self.get_latest_prices([position.asset_id for position in positions])
+            
+            if persist:
+                if self._apply_latest_prices(positions, prices):
+                    self.db.commit()
+                valuations = self.value_positions(positions, {})
+            else:
+                valuations = self.value_positions(positions, prices)
+            
             total_invested = 0
             total_value = 0
             total_dividends = 0
             
             for position in positions:
-                self.update_position(position)
                 total_invested += position.total_invested
-                total_value += position.current_value or 0
-                total_dividends += position.dividends_received
+                total_value += valuations[position.id]['current_value'] or 0
+                total_dividends += position.dividends_received or 0
             
             total_return = total_value - total_invested + total_dividends
             total_return_percentage = (total_return / total_invested * 100) if total_invested > 0 else 0
@@ -66,6 +180,7 @@ class PortfolioCalculator:
             
         except Exception as e:
             logger.error(f"Error calculating portfolio {portfolio_id}: {str(e)}")
+            self.db.rollback()
             return {}
     
     def calculate_asset_allocation(self, portfolio_id: int) -> List[Dict]:
@@ -77,12 +192,15 @@ class PortfolioCalculator:
                 models.Position.portfolio_id == portfolio_id
             ).all()
             
+            prices = self.get_latest_prices([position.asset_id for position in positions])
+            valuations = self.value_positions(positions, prices)
+            
             allocation = {}
             total_value = 0
             
             for position in positions:
                 asset_type = position.asset.asset_type.value
-                value = position.current_value or 0
+                value = valuations[position.id]['current_value'] or 0
                 
                 if asset_type not in allocation:
                     allocation[asset_type] = {'value': 0, 'count': 0}
@@ -107,129 +225,144 @@ class PortfolioCalculator:
             logger.error(f"Error calculating allocation for portfolio {portfolio_id}: {str(e)}")
             return []
     
+    def calculate_lots(self, portfolio_id: int, method: str = FIFO, include_realized: bool = True) -> Dict:
+        """Open tax lots (valued at the latest price) and realized lots of a portfolio"""
+        try:
+            books = self.lots.build(portfolio_id, method)
+            if not books:
+                return {'open_lots': [], 'realized_lots': [], 'total_realized_pnl': 0.0}
+            
+            symbols = dict(self.db.query(models.Asset.id, models.Asset.symbol).filter(
+                models.Asset.id.in_(list(books))
+            ).all())
+            prices = self.get_latest_prices(list(books))
+            today = date.today()
+            
+            open_lots = []
+            realized_lots = []
+            total_realized_pnl = 0.0
+            
+            for asset_id, book in books.items():
+                price = prices.get(asset_id)
+                for lot in book.open_lots():
+                    current_value = lot['quantity'] * price if price is not None else None
+                    open_lots.append({
+                        'asset_id': asset_id,
+                        'asset_symbol': symbols.get(asset_id, ''),
+                        **lot,
+                        'current_price': price,
+                        'current_value': current_value,
+                        'unrealized_pnl': current_value - lot['cost_basis'] if current_value is not None else None,
+                        'holding_days': (today - lot['acquired_date']).days
+                    })
+                
+                total_realized_pnl += book.realized_pnl
+                if include_realized:
+                    for lot in book.realized:
+                        realized_lots.append({'asset_id': asset_id, 'asset_symbol': symbols.get(asset_id, ''), **lot})
+            
+            open_lots.sort(key=lambda lot: (lot['asset_symbol'], lot['acquired_date']))
+            realized_lots.sort(key=lambda lot: (lot['sold_date'], lot['asset_symbol']), reverse=True)
+            
+            return {
+                'open_lots': open_lots,
+                'realized_lots': realized_lots,
+                'total_realized_pnl': total_realized_pnl
+            }
+            
+        except Exception as e:
+            logger.error(f"Error calculating lots for portfolio {portfolio_id}: {str(e)}")
+            return {'open_lots': [], 'realized_lots': [], 'total_realized_pnl': 0.0}
+    
+    def calculate_horizon_metrics(self, portfolio_id: int, horizons: Optional[List[str]] = None,
+                                  rolling_window: int = 63) -> Dict:
+        """All requested horizons plus rolling volatility/Sharpe from one series read"""
+        horizons = horizons or DEFAULT_HORIZONS
+        try:
+            first_date = self.db.query(func.min(models.Transaction.date)).filter(
+                models.Transaction.portfolio_id == portfolio_id
+            ).scalar()
+            if first_date is None:
+                return {'as_of': None, 'horizons': {h: None for h in horizons}, 'rolling': []}
+            
+            series = self.snapshots.get_series(portfolio_id, first_date)
+            returns = daily_returns(series)
+            metrics = compute_horizon_metrics(returns, horizons)
+            
+            # Rolling chart covers the longest horizon requested
+            rolling_start = None
+            if len(returns) > 0 and 'inception' not in horizons:
+                rolling_start = min(horizon_start(h, returns.index[-1], returns.index[0]) for h in horizons).date()
+            
+            return {
+                'as_of': returns.index[-1].date() if len(returns) > 0 else None,
+                'horizons': metrics,
+                'rolling': rolling_metrics(returns, rolling_window, start_date=rolling_start)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error calculating horizon metrics for portfolio {portfolio_id}: {str(e)}")
+            return {'as_of': None, 'horizons': {h: None for h in horizons}, 'rolling': []}
+    
     def calculate_performance_metrics(self, portfolio_id: int, period_days: int = 365) -> Dict:
         """Calculate portfolio performance metrics"""
         try:
-            # Get transactions history
             end_date = date.today()
             start_date = end_date - timedelta(days=period_days)
             
-            transactions = self.db.query(models.Transaction).filter(
+            has_transactions = self.db.query(models.Transaction.id).filter(
                 models.Transaction.portfolio_id == portfolio_id,
                 models.Transaction.date >= start_date
-            ).order_by(models.Transaction.date).all()
+            ).first()
             
-            if not transactions:
+            if not has_transactions:
                 return {}
             
-            # Build daily portfolio values
-            daily_values = []
-            dates = []
-            
-            current_date = start_date
-            while current_date <= end_date:
-                portfolio_value = self._get_portfolio_value_at_date(portfolio_id, current_date)
-                if portfolio_value > 0:
-                    daily_values.append(portfolio_value)
-                    dates.append(current_date)
-                current_date += timedelta(days=1)
+            # Daily values come from the materialized snapshot table
+            series = self.snapshots.get_series(portfolio_id, start_date, end_date)
+            values = series['total_value'].to_numpy()
+            values = values[values > 0]
             
-            if len(daily_values) < 2:
+            metrics = compute_series_metrics(values)
+            if not metrics:
                 return {}
             
-            # Convert to numpy array for calculations
-            values = np.array(daily_values)
-            
-            # Calculate returns
-            returns = np.diff(values) / values[:-1]
-            
-            # Calculate metrics
-            daily_return = returns[-1] if len(returns) > 0 else 0
-            total_return = (values[-1] - values[0]) / values[0]
-            
-            # Annualized metrics
-            trading_days = len(returns)
-            yearly_return = (1 + total_return) ** (252 / trading_days) - 1 if trading_days > 0 else 0
-            
-            # Volatility (annualized standard deviation)
-            volatility = np.std(returns) * np.sqrt(252) if len(returns) > 1 else 0
-            
-            # Sharpe Ratio (assuming risk-free rate of 11.65% for CDI)
-            risk_free_rate = 0.1165
-            excess_return = yearly_return - risk_free_rate
-            sharpe_ratio = excess_return / volatility if volatility > 0 else 0
-            
-            # Max Drawdown
-            cumulative_returns = (1 + returns).cumprod()
-            running_max = np.maximum.accumulate(cumulative_returns)
-            drawdown = (cumulative_returns - running_max) / running_max
-            max_drawdown = np.min(drawdown) if len(drawdown) > 0 else 0
-            
-            # Monthly return (last 30 days)
-            monthly_start = max(0, len(values) - 30)
-            monthly_return = (values[-1] - values[monthly_start]) / values[monthly_start] if monthly_start < len(values) else 0
-            
-            return {
-                'daily_return': daily_return * 100,
-                'monthly_return': monthly_return * 100,
-                'yearly_return': yearly_return * 100,
-                'volatility': volatility * 100,
-                'sharpe_ratio': sharpe_ratio,
-                'max_drawdown': max_drawdown * 100,
-                'beta': None,  # Would need market data to calculate
-                'alpha': None  # Would need market data to calculate
-            }
+            # Beta / Jensen's alpha against the portfolio's benchmark
+            relative = self._benchmark_metrics(portfolio_id, series)
+            metrics['beta'] = relative.get('beta')
+            metrics['alpha'] = relative.get('alpha')
+            return metrics
             
         except Exception as e:
             logger.error(f"Error calculating performance metrics: {str(e)}")
             return {}
     
+    def calculate_benchmark_metrics(self, portfolio_id: int, period_days: int = 365,
+                                    benchmark: Optional[str] = None) -> Dict:
+        """Beta, alpha, tracking error, information ratio and capture ratios vs a benchmark"""
+        try:
+            end_date = date.today()
+            start_date = end_date - timedelta(days=period_days)
+            series = self.snapshots.get_series(portfolio_id, start_date, end_date)
+            return self._benchmark_metrics(portfolio_id, series, benchmark)
+            
+        except Exception as e:
+            logger.error(f"Error calculating benchmark metrics for portfolio {portfolio_id}: {str(e)}")
+            return {}
+    
+    def _benchmark_metrics(self, portfolio_id: int, series: pd.DataFrame, benchmark: Optional[str] = None) -> Dict:
+        if benchmark is None:
+            benchmark = self.db.query(models.Portfolio.benchmark).filter(
+                models.Portfolio.id == portfolio_id
+            ).scalar()
+        if not benchmark:
+            return {}
+        return self.benchmarks.compare(daily_returns(series), benchmark)
+    
     def _get_portfolio_value_at_date(self, portfolio_id: int, target_date: date) -> float:
         """Get portfolio value at a specific date"""
         try:
-            # Get all transactions up to the target date
-            transactions = self.db.query(models.Transaction).filter(
-                models.Transaction.portfolio_id == portfolio_id,
-                models.Transaction.date <= target_date
-            ).all()
-            
-            # Build positions from transactions
-            positions = {}
-            cash = 0
-            
-            for transaction in transactions:
-                if transaction.transaction_type == models.TransactionType.DEPOSIT:
-                    cash += transaction.total_amount
-                elif transaction.transaction_type == models.TransactionType.WITHDRAW:
-                    cash -= transaction.total_amount
-                elif transaction.transaction_type == models.TransactionType.BUY:
-                    if transaction.asset_id:
-                        if transaction.asset_id not in positions:
-                            positions[transaction.asset_id] = 0
-                        positions[transaction.asset_id] += transaction.quantity
-                        cash -= transaction.total_amount
-                elif transaction.transaction_type == models.TransactionType.SELL:
-                    if transaction.asset_id and transaction.asset_id in positions:
-                        positions[transaction.asset_id] -= transaction.quantity
-                        cash += transaction.total_amount
-                elif transaction.transaction_type == models.TransactionType.DIVIDEND:
-                    cash += transaction.total_amount
-            
-            # Calculate total value
-            total_value = cash
-            
-            for asset_id, quantity in positions.items():
-                if quantity > 0:
-                    # Get price at target date
-                    price = self.db.query(models.Price).filter(
-                        models.Price.asset_id == asset_id,
-                        models.Price.date <= target_date
-                    ).order_by(models.Price.date.desc()).first()
-                    
-                    if price:
-                        total_value += quantity * price.close
-            
-            return total_value
+            return self.valuation.value_at_date(portfolio_id, target_date)
             
         except Exception as e:
             logger.error(f"Error getting portfolio value at {target_date}: {str(e)}")
@@ -238,46 +371,20 @@ class PortfolioCalculator:
     def process_transaction(self, transaction: models.Transaction):
         """Process a new transaction and update positions"""
         try:
+            # History from the transaction date on must be recomputed
+            self.snapshots.invalidate(transaction.portfolio_id, transaction.date, commit=False)
+            
             if transaction.transaction_type in [models.TransactionType.BUY, models.TransactionType.SELL]:
-                # Find or create position
-                position = self.db.query(models.Position).filter(
-                    models.Position.portfolio_id == transaction.portfolio_id,
-                    models.Position.asset_id == transaction.asset_id
-                ).first()
-                
-                if not position:
-                    position = models.Position(
-                        portfolio_id=transaction.portfolio_id,
-                        asset_id=transaction.asset_id,
-                        quantity=0,
-                        average_price=0,
-                        total_invested=0,
-                        realized_pnl=0,
-                        dividends_received=0
-                    )
-                    self.db.add(position)
+                # Replay the position from the nearest checkpoint before this trade,
+                # so back-dated and repeated processing stay consistent
+                position = self.ledger.rebuild_position(
+                    transaction.portfolio_id, transaction.asset_id, transaction.date, commit=False
+                )
                 
-                if transaction.transaction_type == models.TransactionType.BUY:
-                    # Update average price
-                    total_cost = position.quantity * position.average_price
-                    new_total_cost = total_cost + transaction.total_amount
-                    new_quantity = position.quantity + transaction.quantity
-                    
-                    position.quantity = new_quantity
-                    position.average_price = new_total_cost / new_quantity if new_quantity > 0 else 0
-                    position.total_invested += transaction.total_amount
-                    
-                elif transaction.transaction_type == models.TransactionType.SELL:
-                    # Calculate realized P&L
-                    sale_cost_basis = position.average_price * transaction.quantity
-                    sale_proceeds = transaction.total_amount
-                    realized_pnl = sale_proceeds - sale_cost_basis
-                    
-                    position.quantity -= transaction.quantity
-                    position.realized_pnl += realized_pnl
-                    position.total_invested -= sale_cost_basis
-                
-                self.update_position(position)
+                if position:
+                    self.update_position(position)
+                else:
+                    self.db.commit()
                 
             elif transaction.transaction_type == models.TransactionType.DIVIDEND:
                 # Update dividend received
@@ -288,7 +395,11 @@ class PortfolioCalculator:
                 
                 if position:
                     position.dividends_received += transaction.total_amount
-                    self.db.commit()
+                
+                self.db.commit()
+            
+            else:
+                self.db.commit()
             
         except Exception as e:
             logger.error(f"Error processing transaction: {str(e)}")
@@ -0,0 +1,358 @@
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from .. import models
+from ..database import upsert
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Store a checkpoint every N replayed transactions of a portfolio/asset pair
+CHECKPOINT_INTERVAL = 500
+
+TRADE_TYPES = [models.TransactionType.BUY, models.TransactionType.SELL]
+
+
+def empty_state() -> Dict:
+    return {'quantity': 0.0, 'average_price': 0.0, 'total_invested': 0.0, 'realized_pnl': 0.0}
+
+
+def apply_trade(state: Dict, transaction_type: models.TransactionType, quantity: float, amount: float) -> Dict:
+    """Fold one BUY/SELL into a moving-average position state"""
+    quantity = quantity or 0.0
+    amount = amount or 0.0
+
+    if transaction_type == models.TransactionType.BUY:
+        new_quantity = state['quantity'] + quantity
+        new_total_cost = state['quantity'] * state['average_price'] + amount
+        state['quantity'] = new_quantity
+        state['average_price'] = new_total_cost / new_quantity if new_quantity > 0 else 0
+        state['total_invested'] += amount
+
+    elif transaction_type == models.TransactionType.SELL:
+        sale_cost_basis = state['average_price'] * quantity
+        state['quantity'] -= quantity
+        state['realized_pnl'] += amount - sale_cost_basis
+        state['total_invested'] -= sale_cost_basis
+
+    return state
+
+
+POSITION_FIELDS = ['quantity', 'average_price', 'total_invested', 'realized_pnl']
+
+# Quantities below this are treated as a closed position
+QUANTITY_EPSILON = 1e-9
+
+
+def affine_scan(alpha: np.ndarray, beta: np.ndarray) -> np.ndarray:
+    """Prefix scan of x_t = alpha_t * x_{t-1} + beta_t with x_{-1} = 0
+
+    Composes the affine maps with log2(n) vectorized doubling steps and no
+    divisions, so long runs of partial sells cannot overflow or underflow.
+    """
+    alpha = alpha.astype(float).copy()
+    beta = beta.astype(float).copy()
+    shift = 1
+    while shift < len(alpha):
+        beta[shift:] = alpha[shift:] * beta[:-shift] + beta[shift:]
+        alpha[shift:] = alpha[shift:] * alpha[:-shift]
+        shift *= 2
+    return beta
+
+
+def fold_trades_frame(trades: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized equivalent of apply_trade over many assets at once
+
+    trades: columns asset_id, date, id, type ('BUY'/'SELL'), quantity, amount,
+    sorted by (asset_id, date, id). Returns one row per event with the running
+    position state (POSITION_FIELDS) after that event.
+
+    The cost basis follows C_t = f_t * C_{t-1} + a_t, where a_t is the amount of a
+    buy and f_t = Q_t / Q_{t-1} for a sell; f_t = 0 at the first event of each
+    asset and at full closes. Assets that sell more than they hold are folded
+    with apply_trade instead.
+    """
+    trades = trades.reset_index(drop=True)
+    is_buy = (trades['type'] == 'BUY').to_numpy()
+    quantity = trades['quantity'].to_numpy(dtype=float)
+    amount = trades['amount'].to_numpy(dtype=float)
+    by_asset = trades['asset_id']
+
+    signed = np.where(is_buy, quantity, -quantity)
+    qty_after = pd.Series(signed).groupby(by_asset).cumsum().to_numpy()
+    qty_before = qty_after - signed
+
+    oversold = (~is_buy) & (qty_after < -QUANTITY_EPSILON)
+    fallback_assets = set(by_asset[oversold].unique())
+
+    closes = (~is_buy) & (np.abs(qty_after) <= QUANTITY_EPSILON)
+    first = (by_asset != by_asset.shift()).to_numpy()
+
+    ratio = np.ones(len(trades))
+    selling = (~is_buy) & (qty_before > QUANTITY_EPSILON)
+    ratio[selling] = qty_after[selling] / qty_before[selling]
+    ratio[first | closes] = 0.0
+
+    cost = affine_scan(ratio, np.where(is_buy, amount, 0.0))
+    cost[closes] = 0.0
+
+    # Average price changes on buys only and is kept after a close
+    average = pd.Series(np.where(is_buy & (qty_after > 0), cost / np.where(qty_after > 0, qty_after, 1.0), np.nan))
+    average = average.groupby(by_asset).ffill().fillna(0.0).to_numpy()
+
+    average_before = pd.Series(average).groupby(by_asset).shift(1).fillna(0.0).to_numpy()
+    realized = np.where(is_buy, 0.0, amount - average_before * quantity)
+
+    state = pd.DataFrame({
+        'asset_id': by_asset.to_numpy(),
+        'date': trades['date'].to_numpy(),
+        'transaction_id': trades['id'].to_numpy(),
+        'quantity': qty_after,
+        'average_price': average,
+        'total_invested': cost,
+        'realized_pnl': pd.Series(realized).groupby(by_asset).cumsum().to_numpy()
+    })
+
+    for asset_id in fallback_assets:
+        mask = (state['asset_id'] == asset_id).to_numpy()
+        folded = empty_state()
+        rows = []
+        for event in trades[mask].itertuples(index=False):
+            transaction_type = models.TransactionType.BUY if event.type == 'BUY' else models.TransactionType.SELL
+            rows.append(dict(apply_trade(folded, transaction_type, event.quantity, event.amount)))
+        state.loc[mask, POSITION_FIELDS] = pd.DataFrame(rows, columns=POSITION_FIELDS).to_numpy()
+
+    return state
+
+
+class PositionLedger:
+    """Rebuilds positions by replaying transactions from the nearest checkpoint.
+
+    The transactions table is the event log; position_checkpoints stores the
+    folded state every CHECKPOINT_INTERVAL events. Edits and deletes drop the
+    checkpoints from the affected date on and replay only the tail.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def rebuild_position(self, portfolio_id: int, asset_id: int, from_date: Optional[date] = None,
+                         commit: bool = True) -> Optional[models.Position]:
+        """Recompute quantity, average price, invested and realized P&L for one position"""
+        try:
+            checkpoints = self.db.query(models.PositionCheckpoint).filter(
+                models.PositionCheckpoint.portfolio_id == portfolio_id,
+                models.PositionCheckpoint.asset_id == asset_id
+            )
+
+            # Checkpoints at or after the affected date are no longer valid
+            stale = checkpoints
+            if from_date is not None:
+                stale = stale.filter(models.PositionCheckpoint.date >= from_date)
+            stale.delete(synchronize_session=False)
+
+            checkpoint = None
+            if from_date is not None:
+                checkpoint = checkpoints.filter(
+                    models.PositionCheckpoint.date < from_date
+                ).order_by(
+                    models.PositionCheckpoint.date.desc(),
+                    models.PositionCheckpoint.transaction_id.desc()
+                ).first()
+
+            events = self.db.query(
+                models.Transaction.id,
+                models.Transaction.date,
+                models.Transaction.transaction_type,
+                models.Transaction.quantity,
+                models.Transaction.total_amount
+            ).filter(
+                models.Transaction.portfolio_id == portfolio_id,
+                models.Transaction.asset_id == asset_id,
+                models.Transaction.transaction_type.in_(TRADE_TYPES)
+            )
+
+            if checkpoint:
+                state = {
+                    'quantity': checkpoint.quantity,
+                    'average_price': checkpoint.average_price,
+                    'total_invested': checkpoint.total_invested,
+                    'realized_pnl': checkpoint.realized_pnl
+                }
+                event_count = checkpoint.event_count
+                events = events.filter(or_(
+                    models.Transaction.date > checkpoint.date,
+                    and_(
+                        models.Transaction.date == checkpoint.date,
+                        models.Transaction.id > checkpoint.transaction_id
+                    )
+                ))
+            else:
+                state = empty_state()
+                event_count = 0
+
+            new_checkpoints = []
+            for event in events.order_by(models.Transaction.date, models.Transaction.id):
+                apply_trade(state, event.transaction_type, event.quantity, event.total_amount)
+                event_count += 1
+
+                if event_count % CHECKPOINT_INTERVAL == 0:
+                    new_checkpoints.append({
+                        'portfolio_id': portfolio_id,
+                        'asset_id': asset_id,
+                        'date': event.date,
+                        'transaction_id': event.id,
+                        'event_count': event_count,
+                        **state
+                    })
+
+            if new_checkpoints:
+                self.db.bulk_insert_mappings(models.PositionCheckpoint, new_checkpoints)
+
+            position = self.db.query(models.Position).filter(
+                models.Position.portfolio_id == portfolio_id,
+                models.Position.asset_id == asset_id
+            ).first()
+
+            if not position and event_count > 0:
+                position = models.Position(
+                    portfolio_id=portfolio_id,
+                    asset_id=asset_id,
+                    dividends_received=0
+                )
+                self.db.add(position)
+
+            if position:
+                for field, value in state.items():
+                    setattr(position, field, value)
+
+            if commit:
+                self.db.commit()
+
+            return position
+
+        except Exception as e:
+            logger.error(f"Error rebuilding position {portfolio_id}/{asset_id}: {str(e)}")
+            self.db.rollback()
+            return None
+
+    def rebuild_positions(self, portfolio_id: int, from_dates: Dict[int, date]):
+        """Rebuild several assets of a portfolio, each from its own earliest affected date"""
+        for asset_id, from_date in from_dates.items():
+            if asset_id is not None:
+                self.rebuild_position(portfolio_id, asset_id, from_date, commit=False)
+        self.db.commit()
+
+    def bulk_rebuild(self, portfolio_id: int, commit: bool = True) -> int:
+        """Recompute every position of a portfolio in one vectorized pass
+
+        Loads the portfolio's trades once, folds them with fold_trades_frame,
+        upserts all positions in a single statement and rewrites the
+        checkpoints. Returns the number of positions written.
+        """
+        try:
+            events = self.db.query(
+                models.Transaction.asset_id,
+                models.Transaction.date,
+                models.Transaction.id,
+                models.Transaction.transaction_type,
+                models.Transaction.quantity,
+                models.Transaction.total_amount
+            ).filter(
+                models.Transaction.portfolio_id == portfolio_id,
+                models.Transaction.asset_id.isnot(None),
+                models.Transaction.transaction_type.in_(TRADE_TYPES)
+            ).order_by(
+                models.Transaction.asset_id, models.Transaction.date, models.Transaction.id
+            ).all()
+
+            self.db.query(models.PositionCheckpoint).filter(
+                models.PositionCheckpoint.portfolio_id == portfolio_id
+            ).delete(synchronize_session=False)
+
+            rows = []
+            checkpoints = []
+            if events:
+                trades = pd.DataFrame(events, columns=['asset_id', 'date', 'id', 'type', 'quantity', 'amount'])
+                trades['type'] = trades['type'].map(lambda t: t.value if isinstance(t, models.TransactionType) else str(t))
+                trades['quantity'] = trades['quantity'].fillna(0.0).astype(float)
+                trades['amount'] = trades['amount'].fillna(0.0).astype(float)
+
+                state = fold_trades_frame(trades)
+                state['event_count'] = state.groupby('asset_id').cumcount() + 1
+
+                now = datetime.utcnow()
+                final = state.groupby('asset_id').tail(1)
+                rows = [
+                    {
+                        'portfolio_id': portfolio_id,
+                        'asset_id': int(row.asset_id),
+                        'quantity': float(row.quantity),
+                        'average_price': float(row.average_price),
+                        'total_invested': float(row.total_invested),
+                        'realized_pnl': float(row.realized_pnl),
+                        'dividends_received': 0.0,
+                        'last_updated': now
+                    }
+                    for row in final.itertuples(index=False)
+                ]
+
+                marks = state[state['event_count'] % CHECKPOINT_INTERVAL == 0]
+                checkpoints = [
+                    {
+                        'portfolio_id': portfolio_id,
+                        'asset_id': int(row.asset_id),
+                        'date': row.date,
+                        'transaction_id': int(row.transaction_id),
+                        'event_count': int(row.event_count),
+                        'quantity': float(row.quantity),
+                        'average_price': float(row.average_price),
+                        'total_invested': float(row.total_invested),
+                        'realized_pnl': float(row.realized_pnl)
+                    }
+                    for row in marks.itertuples(index=False)
+                ]
+
+            # dividends_received is maintained by the dividend flows, never overwritten here
+            upsert(
+                self.db, models.Position, rows,
+                index_elements=['portfolio_id', 'asset_id'],
+                update_columns=POSITION_FIELDS + ['last_updated']
+            )
+
+            # Positions whose trades were all removed go back to zero
+            traded = [row['asset_id'] for row in rows]
+            orphaned = self.db.query(models.Position).filter(models.Position.portfolio_id == portfolio_id)
+            if traded:
+                orphaned = orphaned.filter(models.Position.asset_id.notin_(traded))
+            orphaned.update({field: 0.0 for field in POSITION_FIELDS}, synchronize_session=False)
+
+            if checkpoints:
+                self.db.bulk_insert_mappings(models.PositionCheckpoint, checkpoints)
+
+            if commit:
+                self.db.commit()
+            else:
+                self.db.expire_all()
+
+            return len(rows)
+
+        except Exception as e:
+            logger.error(f"Error bulk rebuilding positions of portfolio {portfolio_id}: {str(e)}")
+            self.db.rollback()
+            return 0
+
+
+def earliest_dates(events: Iterable[Tuple[Optional[int], date]]) -> Dict[int, date]:
+    """Earliest date per key (asset or portfolio id) from (key, date) pairs, skipping None keys"""
+    dates = {}
+    for key, event_date in events:
+        if key is None:
+            continue
+        current = dates.get(key)
+        if current is None or event_date < current:
+            dates[key] = event_date
+    return dates
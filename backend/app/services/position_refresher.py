@@ -0,0 +1,147 @@
+import asyncio
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+from sqlalchemy.orm import Session
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+from .portfolio_calc import PortfolioCalculator
+from .snapshots import SnapshotService
+from .dividend_analytics import DividendAnalytics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Assets whose prices changed since the last flush (filled by price ingestion)
+_pending_assets: Set[int] = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_refresh(asset_ids: Iterable[int]):
+    """Queue positions of these assets for the next write-behind flush"""
+    with _pending_lock:
+        _pending_assets.update(asset_id for asset_id in asset_ids if asset_id is not None)
+
+
+def _drain_pending() -> List[int]:
+    with _pending_lock:
+        asset_ids = list(_pending_assets)
+        _pending_assets.clear()
+    return asset_ids
+
+
+class PositionRefresher:
+    """Persists current_price/current_value/unrealized_pnl for positions in bulk"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.calc = PortfolioCalculator(db)
+
+    def refresh(self, asset_ids: Optional[List[int]] = None, portfolio_ids: Optional[List[int]] = None) -> int:
+        """Refresh positions (all, or filtered by asset/portfolio) and return how many changed"""
+        try:
+            query = self.db.query(
+                models.Position.id,
+                models.Position.asset_id,
+                models.Position.quantity,
+                models.Position.total_invested,
+                models.Position.current_price,
+                models.Position.current_value
+            )
+            if asset_ids is not None:
+                query = query.filter(models.Position.asset_id.in_(asset_ids))
+            if portfolio_ids is not None:
+                query = query.filter(models.Position.portfolio_id.in_(portfolio_ids))
+
+            rows = query.all()
+            if not rows:
+                return 0
+
+            prices = self.calc.get_latest_prices([row.asset_id for row in rows])
+            now = datetime.utcnow()
+
+            mappings = []
+            for row in rows:
+                price = prices.get(row.asset_id)
+                if price is None:
+                    continue
+
+                current_value = row.quantity * price
+                if row.current_price == price and row.current_value == current_value:
+                    continue
+
+                mappings.append({
+                    'id': row.id,
+                    'current_price': price,
+                    'current_value': current_value,
+                    'unrealized_pnl': current_value - row.total_invested,
+                    'last_updated': now
+                })
+
+            if mappings:
+                self.db.bulk_update_mappings(models.Position, mappings)
+                self.db.commit()
+
+            return len(mappings)
+
+        except Exception as e:
+            logger.error(f"Error refreshing positions: {str(e)}")
+            self.db.rollback()
+            return 0
+
+
+def full_refresh_in_process() -> bool:
+    """Whether the API process runs the periodic full pass itself
+
+    Every uvicorn/gunicorn worker runs run_refresh_loop, so the full pass (all
+    positions, snapshot materialize, dividend backfill) only runs there with
+    PRICE_SCHEDULER_BACKEND=asyncio (single-worker deployments). With celery
+    it is the app.worker.refresh_positions beat task; the flush of queued
+    assets is per process and always on.
+    """
+    return settings.PRICE_SCHEDULER_BACKEND.lower() == "asyncio"
+
+
+def _flush(full: bool) -> int:
+    asset_ids = _drain_pending()
+    if not full and not asset_ids:
+        return 0
+
+    db = SessionLocal()
+    try:
+        updated = PositionRefresher(db).refresh(asset_ids=None if full else asset_ids)
+        if full:
+            # Snapshots and dividend summaries missing from the tables are stored here, never by readers
+            SnapshotService(db).materialize()
+            DividendAnalytics(db).backfill()
+        return updated
+    finally:
+        db.close()
+
+
+def run_full_refresh() -> int:
+    """Full pass: every position, missing snapshots and dividend summaries"""
+    return _flush(full=True)
+
+
+async def run_refresh_loop():
+    """Background task: flush queued assets often, refresh everything periodically (see full_refresh_in_process)"""
+    flush_interval = max(1, settings.POSITION_REFRESH_FLUSH_SECONDS)
+    full_every = max(1, settings.POSITION_REFRESH_INTERVAL_SECONDS // flush_interval)
+    run_full = full_refresh_in_process()
+    tick = 0
+
+    while True:
+        try:
+            full = run_full and tick % full_every == 0
+            updated = await asyncio.to_thread(_flush, full)
+            if updated:
+                logger.info(f"Position refresher updated {updated} positions")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Position refresher failed: {str(e)}")
+
+        tick += 1
+        await asyncio.sleep(flush_interval)
@@ -0,0 +1,253 @@
+import asyncio
+import threading
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from zoneinfo import ZoneInfo
+from sqlalchemy.orm import Session
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+from .market_data import MarketDataService
+from .benchmark_ingestion import BenchmarkIngestion
+from .rate_series import RateSeriesService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Trading session (timezone, open, close) of each calendar; holidays are not modelled,
+# a holiday only costs one extra fetch of an unchanged close
+MARKET_HOURS = {
+    'B3': ('America/Sao_Paulo', time(10, 0), time(17, 30)),
+    'NYSE': ('America/New_York', time(9, 30), time(16, 0)),
+}
+EXCHANGE_CALENDARS = {'B3': 'B3', 'BOVESPA': 'B3', 'NYSE': 'NYSE', 'NASDAQ': 'NYSE', 'AMEX': 'NYSE'}
+ALWAYS_OPEN = '24x7'
+
+# Quotes are delayed, so the close is only final a while after the session ends
+QUOTE_DELAY = timedelta(minutes=20)
+
+# Asset types the price providers can quote (bonds, cash and others are priced manually)
+QUOTED_TYPES = [
+    models.AssetType.STOCK, models.AssetType.ETF, models.AssetType.FUND,
+    models.AssetType.REAL_ESTATE, models.AssetType.CRYPTO, models.AssetType.COMMODITY
+]
+
+# Assets asked for outside the regular schedule (e.g. just created)
+_requested_assets: Set[int] = set()
+_requested_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def scheduler_enabled() -> bool:
+    """False unless PRICE_SCHEDULER_BACKEND opts in (asyncio or celery)"""
+    return settings.PRICE_SCHEDULER_BACKEND.lower() in ("asyncio", "celery")
+
+
+def market_calendar(asset_type: models.AssetType, exchange: Optional[str], currency: Optional[models.Currency]) -> str:
+    """Calendar whose trading hours decide when a quote of the asset goes stale"""
+    if asset_type == models.AssetType.CRYPTO:
+        return ALWAYS_OPEN
+    calendar = EXCHANGE_CALENDARS.get((exchange or '').upper())
+    if calendar:
+        return calendar
+    return 'NYSE' if currency == models.Currency.USD else 'B3'
+
+
+def stale_before(calendar: str, now: datetime) -> datetime:
+    """Quotes fetched before the returned (UTC) instant are stale
+
+    While the market is open that is now - PRICE_STALE_SECONDS; once it closes
+    it is the end of the last session (plus QUOTE_DELAY), so the close is
+    fetched once and nothing else until the next open.
+    """
+    intraday = now - timedelta(seconds=settings.PRICE_STALE_SECONDS)
+    if calendar not in MARKET_HOURS:
+        return intraday
+
+    zone, open_at, close_at = MARKET_HOURS[calendar]
+    local = now.astimezone(ZoneInfo(zone))
+
+    day = local.date()
+    session_open = datetime.combine(day, open_at, tzinfo=local.tzinfo)
+    session_end = datetime.combine(day, close_at, tzinfo=local.tzinfo) + QUOTE_DELAY
+    if day.weekday() < 5 and session_open <= local < session_end:
+        return intraday
+
+    # End of the last session that has already closed
+    while day.weekday() >= 5 or datetime.combine(day, close_at, tzinfo=local.tzinfo) + QUOTE_DELAY > local:
+        day -= timedelta(days=1)
+    return (datetime.combine(day, close_at, tzinfo=local.tzinfo) + QUOTE_DELAY).astimezone(timezone.utc)
+
+
+def _as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # SQLite returns naive datetimes; they are stored in UTC
+    if moment is None or moment.tzinfo is not None:
+        return moment
+    return moment.replace(tzinfo=timezone.utc)
+
+
+def stale_assets(db: Session, now: Optional[datetime] = None, extra_ids: Iterable[int] = ()) -> List[int]:
+    """Ids of held (plus extra_ids) quotable assets whose last quote is stale
+
+    Assets whose last attempt returned no quote wait PRICE_RETRY_SECONDS
+    before being asked for again, so bad tickers do not use up provider quota.
+    """
+    now = now or datetime.now(timezone.utc)
+    extra_ids = list(extra_ids)
+
+    held = db.query(models.Position.asset_id).filter(models.Position.quantity > 0)
+    condition = models.Asset.id.in_(held)
+    if extra_ids:
+        condition = condition | models.Asset.id.in_(extra_ids)
+
+    rows = db.query(
+        models.Asset.id,
+        models.Asset.asset_type,
+        models.Asset.exchange,
+        models.Asset.currency,
+        models.Asset.last_fetched_at,
+        models.Asset.last_attempted_at
+    ).filter(condition, models.Asset.asset_type.in_(QUOTED_TYPES)).all()
+
+    retry_after = now - timedelta(seconds=settings.PRICE_RETRY_SECONDS)
+    thresholds: Dict[str, datetime] = {}
+    stale = []
+    for row in rows:
+        calendar = market_calendar(row.asset_type, row.exchange, row.currency)
+        if calendar not in thresholds:
+            thresholds[calendar] = stale_before(calendar, now)
+        last = _as_utc(row.last_fetched_at)
+        if last is not None and last >= thresholds[calendar]:
+            continue
+        # A recent attempt that returned no quote is not retried until PRICE_RETRY_SECONDS pass
+        attempted = _as_utc(row.last_attempted_at)
+        if attempted is not None and (last is None or attempted > last) and attempted >= retry_after:
+            continue
+        stale.append(row.id)
+    return sorted(stale)
+
+
+def request_price_fetch(asset_ids: Iterable[int]):
+    """Ask the scheduler to quote these assets on its next pass instead of waiting for the interval"""
+    asset_ids = [asset_id for asset_id in asset_ids if asset_id is not None]
+    if not asset_ids:
+        return
+
+    if settings.PRICE_SCHEDULER_BACKEND.lower() == "celery":
+        try:
+            from ..worker import refresh_stale_prices_task
+            refresh_stale_prices_task.delay(asset_ids)
+        except Exception as e:
+            logger.error(f"Error queueing price fetch for {len(asset_ids)} assets: {str(e)}")
+        return
+
+    with _requested_lock:
+        _requested_assets.update(asset_ids)
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def _drain_requested() -> List[int]:
+    with _requested_lock:
+        asset_ids = list(_requested_assets)
+        _requested_assets.clear()
+    return asset_ids
+
+
+def _find_stale(extra_ids: List[int]) -> List[int]:
+    db = SessionLocal()
+    try:
+        return stale_assets(db, extra_ids=extra_ids)
+    finally:
+        db.close()
+
+
+def _fetch_batch(asset_ids: List[int]) -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        assets = db.query(models.Asset).filter(models.Asset.id.in_(asset_ids)).all()
+        return MarketDataService(db).bulk_update_prices(assets)
+    finally:
+        db.close()
+
+
+def sync_benchmarks() -> Dict[str, int]:
+    """Download the dates each benchmark index is missing and load new BCB rate rows
+    (run by the scheduler, not by requests)"""
+    db = SessionLocal()
+    try:
+        written = BenchmarkIngestion(db).sync()
+        written.update(RateSeriesService(db).sync_from_files())
+        return written
+    finally:
+        db.close()
+
+
+async def sync_benchmarks_once():
+    """One sync_benchmarks run off the event loop, for deployments without a scheduler"""
+    try:
+        written = await asyncio.to_thread(sync_benchmarks)
+        if any(written.values()):
+            logger.info(f"Benchmark sync: {written}")
+    except Exception as e:
+        logger.error(f"Benchmark sync failed: {str(e)}")
+
+
+async def refresh_stale_prices(extra_ids: Iterable[int] = ()) -> Dict[str, int]:
+    """Quote every stale held asset, batch_size tickers per provider call, a bounded number of calls at a time"""
+    stale = await asyncio.to_thread(_find_stale, list(extra_ids))
+    if not stale:
+        return {"stale": 0, "updated": 0, "failed": 0}
+
+    batch_size = max(1, settings.PRICE_FETCH_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max(1, settings.PRICE_FETCH_CONCURRENCY))
+
+    async def fetch(batch: List[int]) -> Dict[str, int]:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(_fetch_batch, batch)
+            except Exception as e:
+                logger.error(f"Error fetching prices for {len(batch)} assets: {str(e)}")
+                return {"updated": 0, "failed": len(batch)}
+
+    results = await asyncio.gather(*[
+        fetch(stale[start:start + batch_size]) for start in range(0, len(stale), batch_size)
+    ])
+    return {
+        "stale": len(stale),
+        "updated": sum(result["updated"] for result in results),
+        "failed": sum(result["failed"] for result in results)
+    }
+
+
+async def run_price_scheduler():
+    """Background task: refresh stale prices every interval, or sooner when assets are requested,
+    and sync benchmark indices every BENCHMARK_SYNC_SECONDS"""
+    global _loop, _wakeup
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    interval = max(1, settings.PRICE_SCHEDULER_INTERVAL_SECONDS)
+    loop = asyncio.get_running_loop()
+    next_benchmark_sync = loop.time()
+
+    while True:
+        try:
+            _wakeup.clear()
+            result = await refresh_stale_prices(_drain_requested())
+            if result["stale"]:
+                logger.info(f"Price scheduler: {result}")
+            if loop.time() >= next_benchmark_sync:
+                next_benchmark_sync = loop.time() + max(1, settings.BENCHMARK_SYNC_SECONDS)
+                written = await asyncio.to_thread(sync_benchmarks)
+                if any(written.values()):
+                    logger.info(f"Benchmark sync: {written}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Price scheduler failed: {str(e)}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,474 @@
+import pandas as pd
+import yfinance as yf
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from ..config import settings
+from .quote_cache import quote_cache
+from .http_clients import HttpClientRegistry, http_clients
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Normalized price frame returned by every provider
+PRICE_COLUMNS = ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume']
+
+# Calendar days covered by the yfinance-style period strings
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183,
+    '1y': 366, '2y': 731, '5y': 1827, '10y': 3653
+}
+
+
+def empty_prices() -> pd.DataFrame:
+    return pd.DataFrame(columns=PRICE_COLUMNS)
+
+
+def latest_rows(prices: pd.DataFrame) -> pd.DataFrame:
+    """Last bar with a close of every ticker"""
+    prices = prices.dropna(subset=['close'])
+    if prices.empty:
+        return empty_prices()
+    return prices.sort_values(['ticker', 'date']).groupby('ticker', sort=False).tail(1).reset_index(drop=True)
+
+
+def fx_ticker(from_currency: str, to_currency: str) -> str:
+    """Yahoo-style ticker of a currency pair (USDBRL=X), also used for FX rows in fixtures"""
+    return f"{from_currency}{to_currency}=X"
+
+
+def normalize_download(raw: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+    """Flatten a yf.download frame (date x (ticker, field)) into PRICE_COLUMNS rows"""
+    if raw is None or raw.empty:
+        return empty_prices()
+
+    if isinstance(raw.columns, pd.MultiIndex):
+        # group_by='ticker' puts the ticker on the first column level
+        frame = raw.stack(level=0, future_stack=True).reset_index()
+        frame.columns = ['date', 'ticker'] + list(frame.columns[2:])
+    else:
+        frame = raw.reset_index()
+        frame.insert(1, 'ticker', tickers[0])
+        frame = frame.rename(columns={frame.columns[0]: 'date'})
+
+    frame = frame.rename(columns=lambda column: str(column).lower())
+    for column in PRICE_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = None
+    frame['date'] = pd.to_datetime(frame['date']).dt.date
+    return frame[PRICE_COLUMNS].dropna(subset=['close']).reset_index(drop=True)
+
+
+class PriceProvider:
+    """Source of market data: daily bars and quotes for many tickers at once, FX and symbol search
+
+    Tickers are in Yahoo format (PETR4.SA, AAPL, USDBRL=X); providers with another
+    convention translate them. FX and search have defaults built on the bar methods,
+    so a provider only has to implement history and history_range.
+    """
+
+    name = "base"
+
+    def history(self, tickers: List[str], period: str = "1mo") -> pd.DataFrame:
+        """Daily bars of tickers over period, as PRICE_COLUMNS rows"""
+        raise NotImplementedError
+
+    def history_range(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        """Daily bars of tickers from start to end (both inclusive), as PRICE_COLUMNS rows"""
+        raise NotImplementedError
+
+    def latest_quotes(self, tickers: List[str]) -> pd.DataFrame:
+        """Most recent bar of each ticker (tickers without data are left out)"""
+        if not tickers:
+            return empty_prices()
+        return latest_rows(self.history(tickers, period="5d"))
+
+    def fx_rates(self, from_currency: str, to_currency: str, start: date, end: date) -> pd.Series:
+        """Date-indexed daily closes of from_currency in to_currency"""
+        bars = self.history_range([fx_ticker(from_currency, to_currency)], start, end)
+        return pd.Series(bars['close'].to_numpy(dtype=float), index=bars['date'], dtype=float)
+
+    def latest_fx_rate(self, from_currency: str, to_currency: str) -> Optional[Tuple[date, float]]:
+        """(date, rate) of the most recent close of the pair, None when there is none"""
+        quotes = self.latest_quotes([fx_ticker(from_currency, to_currency)])
+        if quotes.empty:
+            return None
+        return quotes['date'].iloc[-1], float(quotes['close'].iloc[-1])
+
+    def search(self, query: str) -> List[Dict]:
+        """Assets matching query as dicts with symbol, name, exchange, asset_type, currency, ..."""
+        return []
+
+
+def yahoo_info(ticker: str) -> Dict:
+    """yfinance quote info of a ticker, shared through the process-wide quote cache"""
+    info = quote_cache.get_or_load(f"yahoo:info:{ticker}", lambda: yf.Ticker(ticker).info or None)
+    return info or {}
+
+
+class YahooPriceProvider(PriceProvider):
+    """yfinance, one batched download for all tickers"""
+
+    name = "yahoo"
+
+    def history(self, tickers: List[str], period: str = "1mo") -> pd.DataFrame:
+        if not tickers:
+            return empty_prices()
+
+        try:
+            raw = yf.download(
+                tickers, period=period, group_by='ticker', auto_adjust=False,
+                threads=True, progress=False
+            )
+            return normalize_download(raw, tickers)
+        except Exception as e:
+            logger.error(f"Error downloading prices for {len(tickers)} tickers: {str(e)}")
+            return empty_prices()
+
+    def history_range(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        if not tickers or start > end:
+            return empty_prices()
+
+        try:
+            # yfinance treats end as exclusive
+            raw = yf.download(
+                tickers, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+                group_by='ticker', auto_adjust=False, threads=True, progress=False
+            )
+            return normalize_download(raw, tickers)
+        except Exception as e:
+            logger.error(f"Error downloading prices for {len(tickers)} tickers from {start} to {end}: {str(e)}")
+            return empty_prices()
+
+    def search(self, query: str) -> List[Dict]:
+        """Try the tickers the query could be (PETR -> PETR4.SA, PETR3.SA) - only show results that match user input"""
+        try:
+            base_query = query.upper()
+            results = []
+
+            # Only search for symbols that make sense for the user input
+            symbols_to_try = []
+
+            # If user types 3+ chars, try exact matches and logical variations
+            if len(base_query) >= 3:
+                # 1. Exact match first
+                symbols_to_try.append(base_query)
+
+                # 2. For Brazilian stocks, try .SA suffix
+                if not base_query.endswith('.SA'):
+                    symbols_to_try.append(f"{base_query}.SA")
+
+                # 3. Only add common BR variations for known patterns
+                if len(base_query) == 4 and base_query.endswith(('4', '3')):
+                    # Already has number (PETR4, VALE3) - try with .SA
+                    symbols_to_try.append(f"{base_query}.SA")
+                elif len(base_query) <= 4 and not base_query.endswith(('4', '3', '11')):
+                    # Base ticker (PETR, VALE) - try common variations
+                    symbols_to_try.extend([
+                        f"{base_query}4.SA",  # Most common (PN)
+                        f"{base_query}3.SA",  # Second most common (ON)
+                    ])
+
+            # Short queries (1-2 chars) - only exact matches
+            elif len(base_query) >= 2:
+                symbols_to_try.append(base_query)
+
+            for symbol in symbols_to_try:
+                try:
+                    info = yahoo_info(symbol)
+
+                    # Check if we got valid data
+                    if info and info.get('symbol') and info.get('longName'):
+                        # Determine asset type
+                        quote_type = info.get('quoteType', '').upper()
+                        asset_type = {
+                            'EQUITY': 'STOCK',
+                            'ETF': 'ETF',
+                            'MUTUALFUND': 'FUND',
+                            'INDEX': 'INDEX',
+                            'CRYPTOCURRENCY': 'CRYPTO'
+                        }.get(quote_type, 'STOCK')
+
+                        # Determine exchange
+                        exchange = info.get('exchange', '')
+                        if '.SA' in symbol or exchange in ['SAO', 'BOVESPA']:
+                            exchange = 'B3'
+                        elif exchange in ['NMS', 'NGM']:
+                            exchange = 'NASDAQ'
+                        elif exchange == 'NYQ':
+                            exchange = 'NYSE'
+                        elif exchange in ['LSE']:
+                            exchange = 'LSE'
+                        else:
+                            exchange = exchange or 'OTHER'
+
+                        # Calculate relevance - prioritize exact matches
+                        symbol_clean = info.get('symbol', '').replace('.SA', '')
+                        relevance_score = 0
+
+                        # Perfect match (user typed exactly this)
+                        if symbol_clean.upper() == base_query or info.get('symbol', '').upper() == base_query:
+                            relevance_score = 100
+                        # Starts with user input (PETR matches PETR4)
+                        elif symbol_clean.upper().startswith(base_query):
+                            relevance_score = 80
+                        # Contains user input
+                        elif base_query in symbol_clean.upper():
+                            relevance_score = 60
+                        # Company name contains user input
+                        elif base_query in info.get('longName', '').upper():
+                            relevance_score = 40
+                        else:
+                            relevance_score = 10
+
+                        # Bonus for popular exchanges
+                        if exchange in ['B3', 'NASDAQ', 'NYSE']:
+                            relevance_score += 5
+
+                        # Filter out irrelevant results (score too low)
+                        if relevance_score < 30:
+                            continue
+
+                        result = {
+                            'symbol': info.get('symbol'),
+                            'name': info.get('longName') or info.get('shortName'),
+                            'exchange': exchange,
+                            'sector': info.get('sector'),
+                            'asset_type': asset_type,
+                            'currency': info.get('currency', 'USD'),
+                            'current_price': info.get('regularMarketPrice') or info.get('previousClose'),
+                            'market_cap': info.get('marketCap'),
+                            'industry': info.get('industry'),
+                            'relevance_score': relevance_score
+                        }
+
+                        # Only add if we have essential info and it's not a duplicate
+                        if result['symbol'] and result['name']:
+                            # Avoid adding the same symbol twice
+                            if not any(r['symbol'] == result['symbol'] for r in results):
+                                results.append(result)
+
+                except Exception as e:
+                    logger.debug(f"Error getting Yahoo Finance info for {symbol}: {str(e)}")
+                    continue
+
+            # Sort by relevance score (highest first)
+            results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
+
+            # Remove relevance score from final results
+            for result in results:
+                result.pop('relevance_score', None)
+
+            return results[:5]  # Limit to 5 most relevant results
+
+        except Exception as e:
+            logger.error(f"Error searching Yahoo Finance for {query}: {str(e)}")
+
+        return []
+
+
+# Alpha Vantage TIME_SERIES_DAILY "compact" holds the last 100 sessions (~140 calendar days)
+ALPHA_VANTAGE_PATH = "/query"
+ALPHA_VANTAGE_COMPACT_DAYS = 140
+ALPHA_VANTAGE_TYPES = {'Equity': 'STOCK', 'ETF': 'ETF', 'Mutual Fund': 'FUND'}
+
+
+class AlphaVantagePriceProvider(PriceProvider):
+    """Alpha Vantage REST API (ALPHA_VANTAGE_KEY), one request per ticker
+
+    Free keys allow only a few requests per minute; throttled or invalid
+    requests come back as HTTP 200 with a message, which is logged and treated
+    as no data.
+    """
+
+    name = "alphavantage"
+
+    def __init__(self, api_key: Optional[str] = None, client: Optional[HttpClientRegistry] = None):
+        self.api_key = api_key or settings.ALPHA_VANTAGE_KEY or "demo"
+        self.client = client or http_clients
+
+    @staticmethod
+    def api_symbol(ticker: str) -> str:
+        # B3 tickers are PETR4.SAO in Alpha Vantage
+        return f"{ticker[:-3]}.SAO" if ticker.endswith('.SA') else ticker
+
+    def _get(self, **params) -> Dict:
+        data = self.client.get_json_sync("alphavantage", ALPHA_VANTAGE_PATH, params={**params, 'apikey': self.api_key})
+        if not isinstance(data, dict):
+            return {}
+
+        message = data.get('Note') or data.get('Information') or data.get('Error Message')
+        if message:
+            logger.warning(f"Alpha Vantage {params.get('function')} {params.get('symbol', '')}: {message}")
+            return {}
+        return data
+
+    def _daily(self, ticker: str, start: Optional[date]) -> pd.DataFrame:
+        full = start is None or (date.today() - start).days > ALPHA_VANTAGE_COMPACT_DAYS
+        data = self._get(function='TIME_SERIES_DAILY', symbol=self.api_symbol(ticker),
+                         outputsize='full' if full else 'compact')
+        series = data.get('Time Series (Daily)')
+        if not series:
+            return empty_prices()
+
+        # {"2026-10-16": {"1. open": "37.5", ..., "5. volume": "1200"}, ...}
+        frame = pd.DataFrame.from_dict(series, orient='index')
+        frame = frame.rename(columns=lambda column: column.split('. ', 1)[-1]).astype(float)
+        frame['date'] = pd.to_datetime(frame.index).date
+        frame['ticker'] = ticker
+        frame = frame.sort_values('date').reset_index(drop=True)
+        return frame[PRICE_COLUMNS] if start is None else frame[frame['date'] >= start][PRICE_COLUMNS]
+
+    def _concat(self, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else empty_prices()
+
+    def history(self, tickers: List[str], period: str = "1mo") -> pd.DataFrame:
+        days = PERIOD_DAYS.get(period)
+        start = date.today() - timedelta(days=days) if days is not None else None
+        return self._concat([self._daily(ticker, start) for ticker in tickers])
+
+    def history_range(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        if start > end:
+            return empty_prices()
+        frame = self._concat([self._daily(ticker, start) for ticker in tickers])
+        return frame[frame['date'] <= end].reset_index(drop=True)
+
+    def latest_quotes(self, tickers: List[str]) -> pd.DataFrame:
+        rows = []
+        for ticker in tickers:
+            quote = self._get(function='GLOBAL_QUOTE', symbol=self.api_symbol(ticker)).get('Global Quote') or {}
+            if not quote.get('05. price') or not quote.get('07. latest trading day'):
+                continue
+            rows.append({
+                'ticker': ticker,
+                'date': datetime.strptime(quote['07. latest trading day'], '%Y-%m-%d').date(),
+                'open': float(quote.get('02. open') or 0) or None,
+                'high': float(quote.get('03. high') or 0) or None,
+                'low': float(quote.get('04. low') or 0) or None,
+                'close': float(quote['05. price']),
+                'volume': float(quote.get('06. volume') or 0)
+            })
+        return pd.DataFrame(rows, columns=PRICE_COLUMNS) if rows else empty_prices()
+
+    def fx_rates(self, from_currency: str, to_currency: str, start: date, end: date) -> pd.Series:
+        full = (date.today() - start).days > ALPHA_VANTAGE_COMPACT_DAYS
+        data = self._get(function='FX_DAILY', from_symbol=from_currency, to_symbol=to_currency,
+                         outputsize='full' if full else 'compact')
+        rates = {
+            datetime.strptime(day, '%Y-%m-%d').date(): float(bar['4. close'])
+            for day, bar in (data.get('Time Series FX (Daily)') or {}).items()
+        }
+        rates = pd.Series(rates, dtype=float).sort_index()
+        return rates[[start <= day <= end for day in rates.index]]
+
+    def latest_fx_rate(self, from_currency: str, to_currency: str) -> Optional[Tuple[date, float]]:
+        data = self._get(function='CURRENCY_EXCHANGE_RATE', from_currency=from_currency, to_currency=to_currency)
+        quote = data.get('Realtime Currency Exchange Rate') or {}
+        if not quote.get('5. Exchange Rate'):
+            return None
+        refreshed = (quote.get('6. Last Refreshed') or '')[:10]
+        day = datetime.strptime(refreshed, '%Y-%m-%d').date() if refreshed else date.today()
+        return day, float(quote['5. Exchange Rate'])
+
+    def search(self, query: str) -> List[Dict]:
+        results = []
+        for match in self._get(function='SYMBOL_SEARCH', keywords=query).get('bestMatches') or []:
+            symbol = match.get('1. symbol') or ''
+            brazilian = symbol.endswith('.SAO')
+            results.append({
+                'symbol': f"{symbol[:-4]}.SA" if brazilian else symbol,
+                'name': match.get('2. name'),
+                'exchange': 'B3' if brazilian else 'OTHER',
+                'sector': None,
+                'asset_type': ALPHA_VANTAGE_TYPES.get(match.get('3. type'), 'STOCK'),
+                'currency': match.get('8. currency'),
+                'industry': None
+            })
+        return [result for result in results if result['symbol'] and result['name']][:5]
+
+
+class FixturePriceProvider(PriceProvider):
+    """Offline stand-in backed by a CSV/Parquet file (or a DataFrame) with PRICE_COLUMNS
+
+    Periods are measured back from the last date in the fixture, so a recorded
+    file replays the same way regardless of when it is read.
+    """
+
+    name = "fixture"
+
+    def __init__(self, source: Union[str, Path, pd.DataFrame]):
+        if isinstance(source, pd.DataFrame):
+            frame = source.copy()
+        elif str(source).endswith('.parquet'):
+            frame = pd.read_parquet(source)
+        else:
+            frame = pd.read_csv(source)
+
+        frame = frame.rename(columns=lambda column: str(column).lower())
+        for column in PRICE_COLUMNS:
+            if column not in frame.columns:
+                frame[column] = None
+        frame['date'] = pd.to_datetime(frame['date']).dt.date
+        # Optional name column, used by search
+        names = frame[['ticker', 'name']].dropna() if 'name' in frame.columns else pd.DataFrame(columns=['ticker', 'name'])
+        self.names = dict(zip(names['ticker'], names['name']))
+        self.prices = frame[PRICE_COLUMNS].sort_values(['ticker', 'date']).reset_index(drop=True)
+
+    def history(self, tickers: List[str], period: str = "1mo") -> pd.DataFrame:
+        frame = self.prices[self.prices['ticker'].isin(tickers)]
+        days = PERIOD_DAYS.get(period)
+        if days is not None and not frame.empty:
+            frame = frame[frame['date'] > frame['date'].max() - timedelta(days=days)]
+        return frame.reset_index(drop=True)
+
+    def history_range(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        frame = self.prices[self.prices['ticker'].isin(tickers)]
+        return frame[(frame['date'] >= start) & (frame['date'] <= end)].reset_index(drop=True)
+
+    def search(self, query: str) -> List[Dict]:
+        key = query.strip().upper()
+        if not key:
+            return []
+        # FX pairs (USDBRL=X) are not assets
+        tickers = sorted(
+            ticker for ticker in self.prices['ticker'].unique()
+            if not ticker.endswith('=X') and ticker.upper().startswith(key)
+        )
+        return [{
+            'symbol': ticker,
+            'name': self.names.get(ticker, ticker),
+            'exchange': 'B3' if ticker.endswith('.SA') else 'OTHER',
+            'asset_type': 'STOCK',
+            'currency': 'BRL' if ticker.endswith('.SA') else 'USD'
+        } for ticker in tickers[:5]]
+
+
+PROVIDERS = {
+    "yahoo": YahooPriceProvider,
+    "alphavantage": AlphaVantagePriceProvider
+}
+
+
+def create_price_provider(name: str, fixture_path: Optional[str] = None) -> PriceProvider:
+    """Provider by name: yahoo, alphavantage or fixture (which needs fixture_path)"""
+    name = name.lower()
+    if name == "fixture":
+        if not fixture_path:
+            raise ValueError("The fixture provider requires a fixture file (PRICE_FIXTURE_PATH)")
+        return FixturePriceProvider(fixture_path)
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown price provider: {name}")
+    return PROVIDERS[name]()
+
+
+def get_price_provider(fixture_path: Optional[str] = None) -> PriceProvider:
+    """Fixture provider when a file is given, otherwise the one selected by settings.PRICE_PROVIDER"""
+    if fixture_path:
+        return FixturePriceProvider(fixture_path)
+
+    name = settings.PRICE_PROVIDER.lower()
+    if name != "fixture" and name not in PROVIDERS:
+        logger.warning(f"Unknown PRICE_PROVIDER {settings.PRICE_PROVIDER}, using yahoo")
+        name = "yahoo"
+    return create_price_provider(name, settings.PRICE_FIXTURE_PATH)
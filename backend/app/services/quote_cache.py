@@ -0,0 +1,256 @@
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# After a Redis error the shared tier is skipped for a while instead of on every call
+_REDIS_RETRY_SECONDS = 30
+
+
+class _Call:
+    """A load in progress; threads asking for the same key wait on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class QuoteCache:
+    """Process-wide cache of upstream quotes and histories.
+
+    Entries live in a size-bounded LRU with a TTL per entry. With a Redis
+    client the entries are also shared between worker processes: a local miss
+    reads Redis before going upstream, and every load is written to both.
+
+    get_or_load / get_or_load_async coalesce concurrent misses on one key, so
+    N requests for PETR4 arriving together make a single upstream call. None
+    is never cached, so failed loads are retried by the next caller.
+
+    The redis-py client blocks, so coroutines use get_async / put_async, which
+    run the Redis calls in a worker thread instead of on the event loop.
+    """
+
+    def __init__(self, ttl_seconds: int = 60, max_entries: int = 4096, redis_client=None,
+                 prefix: str = "quotes:", clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._clock = clock
+        self._redis = redis_client
+        self._redis_down_until = 0.0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._counters = {"hits": 0, "misses": 0, "loads": 0, "coalesced": 0,
+                          "evictions": 0, "errors": 0, "redis_hits": 0, "redis_errors": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _local_get(self, key: str) -> Any:
+        # Called with self._lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _local_put(self, key: str, value: Any, ttl: int):
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, action: str, key: str, error: Exception):
+        self._redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+        self._count("redis_errors")
+        logger.warning(f"Quote cache: Redis {action} failed for {key}, using the local cache only: {str(error)}")
+
+    def _redis_get(self, key: str) -> Any:
+        if not self._redis_available():
+            return None
+        try:
+            payload = self._redis.get(self.prefix + key)
+            if payload is None:
+                return None
+            # The remaining Redis TTL is not read back; the local copy gets a full TTL
+            return pickle.loads(payload)
+        except Exception as e:
+            self._redis_failed("read", key, e)
+            return None
+
+    def _redis_put(self, key: str, value: Any, ttl: int):
+        if not self._redis_available():
+            return
+        try:
+            self._redis.setex(self.prefix + key, ttl, pickle.dumps(value))
+        except Exception as e:
+            self._redis_failed("write", key, e)
+
+    def get(self, key: str) -> Any:
+        """Cached value of key, or None (counted as a miss)"""
+        with self._lock:
+            value = self._local_get(key)
+        if value is None:
+            value = self._redis_get(key)
+            if value is not None:
+                self._local_put(key, value, self.ttl_seconds)
+                self._count("redis_hits")
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def put(self, key: str, value: Any, ttl: Optional[int] = None):
+        if value is None:
+            return
+        ttl = ttl or self.ttl_seconds
+        self._local_put(key, value, ttl)
+        self._redis_put(key, value, ttl)
+
+    async def get_async(self, key: str) -> Any:
+        """get() for coroutines: a local miss reads Redis in a worker thread"""
+        with self._lock:
+            value = self._local_get(key)
+        if value is None and self._redis_available():
+            value = await asyncio.to_thread(self._redis_get, key)
+            if value is not None:
+                self._local_put(key, value, self.ttl_seconds)
+                self._count("redis_hits")
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    async def put_async(self, key: str, value: Any, ttl: Optional[int] = None):
+        """put() for coroutines: the Redis write runs in a worker thread"""
+        if value is None:
+            return
+        ttl = ttl or self.ttl_seconds
+        self._local_put(key, value, ttl)
+        if self._redis_available():
+            await asyncio.to_thread(self._redis_put, key, value, ttl)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one key (or everything) from this process; Redis entries expire on their own"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        """Cached value of key, calling loader() once for all threads that miss together"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            # The leader may have stored the value between get() and here
+            value = self._local_get(key)
+            if value is not None:
+                return value
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            self._count("loads")
+            call.value = loader()
+            self.put(key, call.value, ttl)
+            return call.value
+        except Exception as e:
+            self._count("errors")
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def get_or_load_async(self, key: str, loader: Callable[[], Awaitable[Any]],
+                                ttl: Optional[int] = None) -> Any:
+        """Async get_or_load: tasks that miss together await one loader() call
+
+        The load runs as a task owned by the cache and every caller, the first
+        one included, awaits it through asyncio.shield: a caller that is
+        cancelled (a request timing out) leaves the load running for the rest.
+        """
+        value = await self.get_async(key)
+        if value is not None:
+            return value
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_async(key, loader, ttl))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._load_finished(key, done))
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int]) -> Any:
+        self._count("loads")
+        try:
+            value = await loader()
+        except Exception:
+            self._count("errors")
+            raise
+        await self.put_async(key, value, ttl)
+        return value
+
+    def _load_finished(self, key: str, task: asyncio.Task):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        # Marks the exception as retrieved when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring; misses = loads + coalesced"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["backend"] = "redis" if self._redis is not None else "memory"
+        return stats
+
+
+def _redis_client():
+    try:
+        import redis
+        return redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    except Exception as e:
+        logger.warning(f"Quote cache: Redis unavailable ({str(e)}), using the in-process cache only")
+        return None
+
+
+quote_cache = QuoteCache(
+    ttl_seconds=settings.QUOTE_CACHE_TTL_SECONDS,
+    max_entries=settings.QUOTE_CACHE_MAX_ENTRIES,
+    redis_client=_redis_client() if settings.QUOTE_CACHE_BACKEND.lower() == "redis" else None
+)
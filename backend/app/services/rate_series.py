@@ -0,0 +1,162 @@
+import os
+import pandas as pd
+from datetime import date
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from .. import models
+from ..config import settings
+from .performance import TRADING_DAYS
+from .ingestion import ingest_benchmark
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How each series is published by the BCB (SGS): CDI (4389) and SELIC (1178) as an
+# annual rate in % on a 252 business-day basis, one row per business day; IPCA (433)
+# as the monthly change in %, one row per month dated on its first day
+RATE_SERIES = {
+    "CDI": "annual",
+    "SELIC": "annual",
+    "IPCA": "monthly"
+}
+
+
+def read_bcb_csv(path: str) -> pd.Series:
+    """Date-indexed % values of a BCB SGS CSV export ("data";"valor", dd/mm/yyyy, decimal comma)"""
+    frame = pd.read_csv(path, sep=';', decimal=',', dtype={'data': str})
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    if 'data' not in frame.columns or 'valor' not in frame.columns:
+        raise ValueError(f"{path} is not a BCB series export (expected data;valor columns)")
+    dates = pd.to_datetime(frame['data'], format='%d/%m/%Y')
+    values = pd.to_numeric(frame['valor'], errors='coerce')
+    return pd.Series(values.to_numpy(dtype=float), index=dates.dt.date).dropna().sort_index()
+
+
+def _by_month(rates: pd.Series) -> pd.Series:
+    # Monthly rows re-indexed by their month (the last row of a month wins)
+    months = pd.PeriodIndex(pd.to_datetime(rates.index), freq='M')
+    monthly = pd.Series(rates.to_numpy(dtype=float), index=months)
+    return monthly[~monthly.index.duplicated(keep='last')]
+
+
+def daily_factors(rates: pd.Series, kind: str) -> pd.Series:
+    """Business-day accrual factors (1 + daily rate) of a date-indexed % rate series
+
+    annual: each row is a business day, factor = (1 + rate/100) ** (1/252).
+    monthly: each month's change is spread geometrically over its business days.
+    """
+    rates = rates.dropna().sort_index()
+    if rates.empty:
+        return pd.Series(dtype=float)
+
+    if kind == "annual":
+        return (1 + rates / 100) ** (1 / TRADING_DAYS)
+
+    if kind != "monthly":
+        raise ValueError(f"Unknown rate series kind: {kind}")
+
+    monthly = _by_month(rates)
+    days = pd.bdate_range(monthly.index.min().start_time, monthly.index.max().end_time.normalize())
+    day_months = days.to_period('M')
+    counts = pd.Series(1, index=days).groupby(day_months).transform('size').to_numpy()
+    factors = (1 + monthly.reindex(day_months).to_numpy() / 100) ** (1 / counts)
+    return pd.Series(factors, index=days.date)
+
+
+class RateSeriesService:
+    """CDI/SELIC/IPCA stored in benchmarks with their compounded cumulative index
+
+    cumulative_index is the product of the daily factors from the first stored
+    day, so the accrual between two dates is the ratio of two stored values.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ingest(self, symbol: str, rates: pd.Series, commit: bool = True) -> int:
+        """Store a % rate series; the cumulative index of every later stored day is rebuilt"""
+        kind = RATE_SERIES[symbol]
+        rates = rates.dropna().sort_index()
+        rates = rates[~rates.index.duplicated(keep='last')]
+        factors = daily_factors(rates, kind)
+        if factors.empty:
+            return 0
+
+        # Rate of the day: annual rows as published, monthly changes repeated over their month
+        if kind == "annual":
+            values = rates
+        else:
+            day_months = pd.PeriodIndex(pd.to_datetime(factors.index), freq='M')
+            values = pd.Series(_by_month(rates).reindex(day_months).to_numpy(), index=factors.index)
+
+        first_day, last_day = factors.index[0], factors.index[-1]
+
+        # Stored days after the new data keep their rates; only their cumulative index moves
+        later = self.db.query(models.Benchmark.date, models.Benchmark.value, models.Benchmark.daily_return).filter(
+            models.Benchmark.symbol == symbol,
+            models.Benchmark.date > last_day
+        ).order_by(models.Benchmark.date).all()
+        if later:
+            later_frame = pd.DataFrame(later, columns=['date', 'value', 'daily_return']).set_index('date')
+            factors = pd.concat([factors, 1 + later_frame['daily_return'].astype(float)])
+            values = pd.concat([values, later_frame['value'].astype(float)])
+
+        base = self.db.query(models.Benchmark.cumulative_index).filter(
+            models.Benchmark.symbol == symbol,
+            models.Benchmark.date < first_day,
+            models.Benchmark.cumulative_index.isnot(None)
+        ).order_by(models.Benchmark.date.desc()).limit(1).scalar()
+
+        cumulative = (base or 1.0) * factors.cumprod()
+        return ingest_benchmark(
+            self.db, symbol, values, daily_returns=factors - 1, cumulative=cumulative, commit=commit
+        )
+
+    def sync_from_files(self, directory: Optional[str] = None,
+                        symbols: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Ingest <SYMBOL>.csv BCB exports found in directory (RATE_SERIES_DIR), from the last stored day on"""
+        directory = directory or settings.RATE_SERIES_DIR
+        written: Dict[str, int] = {}
+        if not directory:
+            return written
+
+        for symbol in symbols or RATE_SERIES:
+            path = os.path.join(directory, f"{symbol}.csv")
+            if symbol not in RATE_SERIES or not os.path.exists(path):
+                continue
+            try:
+                rates = read_bcb_csv(path)
+                last = self._last_date(symbol)
+                if last is not None:
+                    # Re-read the last stored period, which may have been revised
+                    since = last.replace(day=1) if RATE_SERIES[symbol] == "monthly" else last
+                    rates = rates[rates.index >= since]
+                written[symbol] = self.ingest(symbol, rates)
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Error loading rate series {symbol} from {path}: {str(e)}")
+        return written
+
+    def _last_date(self, symbol: str) -> Optional[date]:
+        return self.db.query(models.Benchmark.date).filter(
+            models.Benchmark.symbol == symbol
+        ).order_by(models.Benchmark.date.desc()).limit(1).scalar()
+
+    def _cumulative_at(self, symbol: str, day: date) -> Optional[float]:
+        # As of day: the last stored business day on or before it
+        return self.db.query(models.Benchmark.cumulative_index).filter(
+            models.Benchmark.symbol == symbol,
+            models.Benchmark.date <= day,
+            models.Benchmark.cumulative_index.isnot(None)
+        ).order_by(models.Benchmark.date.desc()).limit(1).scalar()
+
+    def factor_between(self, symbol: str, start: date, end: date) -> Optional[float]:
+        """Accrual factor of symbol from the close of start to the close of end (1.0123 = +1.23%)
+
+        None when start is before the first stored day.
+        """
+        start_index = self._cumulative_at(symbol, start)
+        end_index = self._cumulative_at(symbol, end)
+        if start_index is None or end_index is None:
+            return None
+        return float(end_index / start_index)
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from .. import models
+from .snapshots import SnapshotService
+from .performance import daily_returns
+import logging
+
+logger = logging.getLogger(__name__)
+
+# XIRR search interval (annual rates) for the bisection fallback
+XIRR_LOWER = -0.9999
+XIRR_UPPER = 100.0
+
+
+def xirr_batch(amounts: np.ndarray, years: np.ndarray, max_newton: int = 50,
+               max_bisection: int = 200, tolerance: float = 1e-10) -> np.ndarray:
+    """Solve XIRR for many cash-flow rows at once
+
+    amounts and years are (portfolios x flows) arrays, padded with zero amounts.
+    years is the time of each flow in years from the row's first flow. Newton's
+    method runs on every row at once; rows where it fails to converge (or leaves
+    the valid interval) are finished by a vectorized bisection. Rows without
+    both a negative and a positive flow, or without a root, return NaN.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    years = np.asarray(years, dtype=float)
+    n_rows = amounts.shape[0]
+    if n_rows == 0:
+        return np.zeros(0)
+
+    def npv(rate: np.ndarray) -> np.ndarray:
+        return np.sum(amounts * np.power(1.0 + rate[:, None], -years), axis=1)
+
+    def npv_derivative(rate: np.ndarray) -> np.ndarray:
+        return np.sum(-years * amounts * np.power(1.0 + rate[:, None], -years - 1.0), axis=1)
+
+    solvable = (amounts < 0).any(axis=1) & (amounts > 0).any(axis=1)
+    rate = np.full(n_rows, 0.1)
+    converged = ~solvable
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_newton):
+            active = ~converged
+            if not active.any():
+                break
+            value = npv(rate)
+            slope = npv_derivative(rate)
+            step = np.where(active & (slope != 0), value / slope, 0.0)
+            new_rate = rate - step
+
+            bad = active & (~np.isfinite(new_rate) | (new_rate <= XIRR_LOWER) | (new_rate > XIRR_UPPER) | (slope == 0))
+            rate = np.where(active & ~bad, new_rate, rate)
+            converged |= active & ~bad & (np.abs(step) < tolerance)
+            # Rows that left the interval go straight to bisection
+            converged |= bad
+            rate[bad] = np.nan
+
+        # Bisection for rows Newton could not settle
+        scale = np.maximum(np.sum(np.abs(amounts), axis=1), 1.0)
+        residual = np.abs(npv(np.nan_to_num(rate))) / scale
+        pending = solvable & (~np.isfinite(rate) | (residual > 1e-8))
+        if pending.any():
+            low = np.full(n_rows, XIRR_LOWER)
+            high = np.full(n_rows, XIRR_UPPER)
+            f_low = npv(low)
+            f_high = npv(high)
+            bracketed = pending & (np.sign(f_low) != np.sign(f_high))
+
+            for _ in range(max_bisection):
+                mid = (low + high) / 2
+                f_mid = npv(mid)
+                left = np.sign(f_mid) == np.sign(f_low)
+                low = np.where(left, mid, low)
+                f_low = np.where(left, f_mid, f_low)
+                high = np.where(left, high, mid)
+                if np.all((high - low)[bracketed] < tolerance):
+                    break
+
+            rate = np.where(pending, np.where(bracketed, (low + high) / 2, np.nan), rate)
+
+    rate[~solvable] = np.nan
+    return rate
+
+
+def time_weighted_return(returns: pd.Series) -> Optional[Dict]:
+    """Chain-linked return of a daily return series, total and annualized"""
+    if len(returns) < 2:
+        return None
+
+    total = float(np.expm1(np.sum(np.log1p(returns.to_numpy(dtype=float)))))
+    days = (returns.index[-1] - returns.index[0]).days
+    annualized = (1 + total) ** (365 / days) - 1 if days >= 365 else None
+
+    return {'total': total, 'annualized': annualized}
+
+
+class ReturnEngine:
+    """Time-weighted and money-weighted returns for many portfolios at once
+
+    Returns are measured on the invested positions, like performance.daily_returns:
+    buys are money put in, sales and dividends money taken out, and the current
+    market value is the final flow of the XIRR.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.snapshots = SnapshotService(db)
+
+    def calculate(self, portfolio_ids: List[int], as_of: Optional[date] = None,
+                  series: Optional[Dict[int, pd.DataFrame]] = None) -> Dict[int, Dict]:
+        """{portfolio_id: {time_weighted_return, time_weighted_return_annualized, money_weighted_return}} in %
+
+        series may carry the full snapshot history already loaded by the caller.
+        """
+        as_of = as_of or date.today()
+        empty = {
+            'time_weighted_return': None,
+            'time_weighted_return_annualized': None,
+            'money_weighted_return': None
+        }
+        if not portfolio_ids:
+            return {}
+
+        try:
+            if series is None:
+                series = self.snapshots.get_series_many(portfolio_ids, end_date=as_of)
+
+            flows = self.db.query(
+                models.Transaction.portfolio_id,
+                models.Transaction.date,
+                models.Transaction.transaction_type,
+                models.Transaction.total_amount
+            ).filter(
+                models.Transaction.portfolio_id.in_(portfolio_ids),
+                models.Transaction.date <= as_of,
+                models.Transaction.transaction_type.in_([
+                    models.TransactionType.BUY,
+                    models.TransactionType.SELL,
+                    models.TransactionType.DIVIDEND
+                ])
+            ).all()
+
+            frame = pd.DataFrame(flows, columns=['portfolio_id', 'date', 'type', 'amount'])
+            frame['amount'] = frame['amount'].fillna(0.0).astype(float)
+            frame['amount'] = np.where(
+                frame['type'] == models.TransactionType.BUY, -frame['amount'], frame['amount']
+            )
+
+            # Terminal flow: market value of the positions on as_of
+            terminal = []
+            for portfolio_id in portfolio_ids:
+                values = series[portfolio_id]
+                if not values.empty and values['market_value'].iloc[-1] > 0:
+                    terminal.append((portfolio_id, as_of, None, float(values['market_value'].iloc[-1])))
+            frame = pd.concat([frame, pd.DataFrame(terminal, columns=frame.columns)], ignore_index=True)
+
+            results = {portfolio_id: dict(empty) for portfolio_id in portfolio_ids}
+
+            if not frame.empty:
+                frame['date'] = pd.to_datetime(frame['date'])
+                frame = frame.sort_values(['portfolio_id', 'date'], kind='stable')
+                first = frame.groupby('portfolio_id')['date'].transform('min')
+                frame['years'] = (frame['date'] - first).dt.days / 365.0
+                frame['slot'] = frame.groupby('portfolio_id').cumcount()
+
+                # Pad into (portfolios x flows) matrices and solve all rows together
+                row_ids = sorted(frame['portfolio_id'].unique())
+                row = {portfolio_id: i for i, portfolio_id in enumerate(row_ids)}
+                rows = frame['portfolio_id'].map(row).to_numpy()
+                amounts = np.zeros((len(row_ids), int(frame['slot'].max()) + 1))
+                years = np.zeros_like(amounts)
+                amounts[rows, frame['slot'].to_numpy()] = frame['amount'].to_numpy()
+                years[rows, frame['slot'].to_numpy()] = frame['years'].to_numpy()
+
+                rates = xirr_batch(amounts, years)
+                for portfolio_id, rate in zip(row_ids, rates):
+                    if np.isfinite(rate):
+                        results[portfolio_id]['money_weighted_return'] = float(rate) * 100
+
+            for portfolio_id in portfolio_ids:
+                twr = time_weighted_return(daily_returns(series[portfolio_id]))
+                if twr:
+                    results[portfolio_id]['time_weighted_return'] = twr['total'] * 100
+                    if twr['annualized'] is not None:
+                        results[portfolio_id]['time_weighted_return_annualized'] = twr['annualized'] * 100
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Error calculating returns for portfolios {portfolio_ids}: {str(e)}")
+            return {portfolio_id: dict(empty) for portfolio_id in portfolio_ids}
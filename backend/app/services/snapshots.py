@@ -0,0 +1,194 @@
+import pandas as pd
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from .. import models
+from ..database import upsert
+from .valuation import ValuationEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLUMNS = ['market_value', 'invested', 'cash', 'net_flow']
+
+
+class SnapshotService:
+    """Maintains the portfolio_daily_values table.
+
+    Writers only truncate the snapshot from the first affected date
+    (invalidate / invalidate_asset) and the background refresher extends it
+    again (materialize). Readers never write: days after the last stored
+    snapshot are computed on the fly with the vectorized ValuationEngine.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.valuation = ValuationEngine(db)
+
+    def get_series(self, portfolio_id: int, start_date: date, end_date: Optional[date] = None) -> pd.DataFrame:
+        """Daily values for [start_date, end_date]: stored snapshots plus the live tail"""
+        return self.get_series_many([portfolio_id], start_date, end_date)[portfolio_id]
+
+    def get_series_many(self, portfolio_ids: List[int], start_date: Optional[date] = None,
+                        end_date: Optional[date] = None) -> Dict[int, pd.DataFrame]:
+        """Like get_series for several portfolios
+
+        One freshness query, one read of the stored days and one batched
+        valuation of the missing tails, whatever the number of portfolios.
+        """
+        end_date = end_date or date.today()
+        if not portfolio_ids:
+            return {}
+
+        last_dates = self._last_dates(portfolio_ids)
+
+        query = self.db.query(
+            models.PortfolioDailyValue.portfolio_id,
+            models.PortfolioDailyValue.date,
+            models.PortfolioDailyValue.market_value,
+            models.PortfolioDailyValue.invested,
+            models.PortfolioDailyValue.cash,
+            models.PortfolioDailyValue.net_flow
+        ).filter(
+            models.PortfolioDailyValue.portfolio_id.in_(portfolio_ids),
+            models.PortfolioDailyValue.date <= end_date
+        )
+        if start_date is not None:
+            query = query.filter(models.PortfolioDailyValue.date >= start_date)
+
+        rows = pd.DataFrame(
+            query.order_by(models.PortfolioDailyValue.portfolio_id, models.PortfolioDailyValue.date).all(),
+            columns=['portfolio_id', 'date', 'market_value', 'invested', 'cash', 'net_flow']
+        )
+        rows['date'] = pd.to_datetime(rows['date'])
+        rows['total_value'] = rows['market_value'] + rows['cash']
+
+        series = {
+            int(portfolio_id): group.drop(columns='portfolio_id').set_index('date')
+            for portfolio_id, group in rows.groupby('portfolio_id')
+        }
+        empty = rows.drop(columns='portfolio_id').set_index('date').iloc[0:0]
+
+        # Days not materialized yet are valued live, without storing them, in
+        # one batched valuation for every portfolio that is behind
+        tail_starts = {
+            portfolio_id: max(tail_start, start_date) if start_date is not None else tail_start
+            for portfolio_id, tail_start in self._missing_from(portfolio_ids, last_dates, end_date).items()
+        }
+        tail_starts = {portfolio_id: tail_start for portfolio_id, tail_start in tail_starts.items() if tail_start <= end_date}
+        for portfolio_id, tail in self.valuation.build_daily_values_many(tail_starts, end_date).items():
+            tail = tail[empty.columns]
+            stored = series.get(portfolio_id)
+            series[portfolio_id] = tail if stored is None or stored.empty else pd.concat([stored, tail])
+
+        return {portfolio_id: series.get(portfolio_id, empty) for portfolio_id in portfolio_ids}
+
+    def _last_dates(self, portfolio_ids: Optional[List[int]] = None) -> Dict[int, date]:
+        query = self.db.query(
+            models.PortfolioDailyValue.portfolio_id,
+            func.max(models.PortfolioDailyValue.date)
+        )
+        if portfolio_ids is not None:
+            query = query.filter(models.PortfolioDailyValue.portfolio_id.in_(portfolio_ids))
+        return dict(query.group_by(models.PortfolioDailyValue.portfolio_id).all())
+
+    def _missing_from(self, portfolio_ids: List[int], last_dates: Dict[int, date], end_date: date) -> Dict[int, date]:
+        """First day without a snapshot of every portfolio that is behind end_date"""
+        missing = {
+            portfolio_id: last_dates[portfolio_id] + timedelta(days=1)
+            for portfolio_id in portfolio_ids
+            if portfolio_id in last_dates and last_dates[portfolio_id] < end_date
+        }
+
+        # Portfolios without snapshots start at their first transaction
+        unbuilt = [portfolio_id for portfolio_id in portfolio_ids if portfolio_id not in last_dates]
+        if unbuilt:
+            missing.update(self.db.query(
+                models.Transaction.portfolio_id,
+                func.min(models.Transaction.date)
+            ).filter(
+                models.Transaction.portfolio_id.in_(unbuilt)
+            ).group_by(models.Transaction.portfolio_id).all())
+
+        return missing
+
+    def materialize(self, portfolio_ids: Optional[List[int]] = None, end_date: Optional[date] = None) -> int:
+        """Store the missing days of every portfolio (or of portfolio_ids) up to end_date
+
+        Run by the background refresher so reads stay side-effect free.
+        Returns the number of portfolios extended.
+        """
+        end_date = end_date or date.today()
+        if portfolio_ids is None:
+            portfolio_ids = [row[0] for row in self.db.query(models.Transaction.portfolio_id).distinct().all()]
+        if not portfolio_ids:
+            return 0
+
+        missing = self._missing_from(portfolio_ids, self._last_dates(portfolio_ids), end_date)
+        for portfolio_id, from_date in missing.items():
+            self.rebuild_from(portfolio_id, from_date, end_date)
+        return len(missing)
+
+    def rebuild_from(self, portfolio_id: int, from_date: date, end_date: Optional[date] = None):
+        """Recompute and store snapshots from from_date up to end_date"""
+        end_date = end_date or date.today()
+        try:
+            # Upsert inside a savepoint: another process may be extending the same portfolio
+            with self.db.begin_nested():
+                self.db.query(models.PortfolioDailyValue).filter(
+                    models.PortfolioDailyValue.portfolio_id == portfolio_id,
+                    models.PortfolioDailyValue.date >= from_date
+                ).delete(synchronize_session=False)
+
+                if from_date <= end_date:
+                    series = self.valuation.build_daily_values(portfolio_id, from_date, end_date)
+                    upsert(self.db, models.PortfolioDailyValue, [
+                        {
+                            'portfolio_id': portfolio_id,
+                            'date': day.date(),
+                            'market_value': float(row.market_value),
+                            'invested': float(row.invested),
+                            'cash': float(row.cash),
+                            'net_flow': float(row.net_flow)
+                        }
+                        for day, row in series.iterrows()
+                    ], ['portfolio_id', 'date'], SNAPSHOT_COLUMNS)
+
+            self.db.commit()
+
+        except Exception as e:
+            logger.error(f"Error rebuilding snapshots for portfolio {portfolio_id}: {str(e)}")
+            self.db.rollback()
+
+    def invalidate(self, portfolio_id: int, from_date: date, commit: bool = True):
+        """Drop snapshots from from_date on; they are rebuilt on the next read"""
+        self.db.query(models.PortfolioDailyValue).filter(
+            models.PortfolioDailyValue.portfolio_id == portfolio_id,
+            models.PortfolioDailyValue.date >= from_date
+        ).delete(synchronize_session=False)
+        if commit:
+            self.db.commit()
+
+    def invalidate_asset(self, asset_id: int, from_date: date, commit: bool = True):
+        """Drop snapshots of every portfolio holding asset_id from from_date on"""
+        self.invalidate_assets([asset_id], from_date, commit)
+
+    def invalidate_assets(self, asset_ids: List[int], from_date: date, commit: bool = True):
+        """Drop snapshots of every portfolio holding any of asset_ids from from_date on"""
+        portfolio_ids = self._portfolios_holding(asset_ids)
+        if not portfolio_ids:
+            return
+
+        self.db.query(models.PortfolioDailyValue).filter(
+            models.PortfolioDailyValue.portfolio_id.in_(portfolio_ids),
+            models.PortfolioDailyValue.date >= from_date
+        ).delete(synchronize_session=False)
+        if commit:
+            self.db.commit()
+
+    def _portfolios_holding(self, asset_ids: List[int]) -> List[int]:
+        rows = self.db.query(models.Position.portfolio_id).filter(
+            models.Position.asset_id.in_(asset_ids)
+        ).distinct().all()
+        return [row[0] for row in rows]
@@ -0,0 +1,219 @@
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from sqlalchemy.orm import Session
+from .. import models
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns of a listing file (CSV, one row per ticker); only symbol and name are required
+LISTING_COLUMNS = ['symbol', 'name', 'exchange', 'asset_type', 'currency', 'sector', 'industry']
+
+# Minimum share of the query's name trigrams an entry must contain to match
+NAME_MATCH_THRESHOLD = 0.6
+
+# Per-process catalog, rebuilt from the assets table once the TTL expires so assets
+# created through other workers show up; the listing file is parsed only once
+_CATALOG_TTL_SECONDS = 10 * 60
+_catalog: Optional["SymbolCatalog"] = None
+_catalog_loaded_at = 0.0
+_catalog_lock = threading.Lock()
+_listing: Optional[List[Dict]] = None
+
+
+def asset_entry(asset) -> Dict:
+    """Catalog entry of a stored asset (a models.Asset or a row with the same columns)"""
+    return {
+        'id': asset.id,
+        'symbol': asset.symbol,
+        'name': asset.name,
+        'exchange': asset.exchange,
+        'asset_type': asset.asset_type.value if asset.asset_type else None,
+        'currency': asset.currency.value if asset.currency else None,
+        'sector': asset.sector,
+        'industry': asset.industry
+    }
+
+
+def symbol_key(symbol: str) -> str:
+    """Trie key of a ticker: upper case, without the Yahoo .SA suffix (PETR4 and PETR4.SA collide)"""
+    symbol = symbol.strip().upper()
+    return symbol[:-3] if symbol.endswith('.SA') else symbol
+
+
+def _normalize_name(name: str) -> str:
+    # "Petróleo Brasileiro S.A." -> "petroleo brasileiro s a"
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+
+def _trigrams(text: str) -> set:
+    # Words are padded on the left only, so a prefix of a word shares all its trigrams
+    padded = f" {text}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ids: List[int] = []
+
+
+class SymbolCatalog:
+    """In-memory index of known tickers for asset search.
+
+    Symbols live in a prefix trie whose nodes hold the ids of every entry below
+    them, so a symbol prefix is one walk of len(query) nodes. Names are indexed
+    by trigram: a query matches the entries containing most of its trigrams,
+    which tolerates accents, punctuation and small typos.
+    """
+
+    def __init__(self):
+        self._entries: List[Dict] = []
+        self._by_key: Dict[str, int] = {}
+        self._root = _TrieNode()
+        self._names: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry: Dict) -> bool:
+        """Index an entry (symbol, name and optional listing columns); False if its symbol is known"""
+        symbol = (entry.get('symbol') or '').strip()
+        name = (entry.get('name') or '').strip()
+        if not symbol or not name:
+            return False
+        key = symbol_key(symbol)
+        if key in self._by_key:
+            return False
+
+        entry_id = len(self._entries)
+        # Only static columns are kept; prices in network results would go stale here
+        self._entries.append({
+            **{column: entry.get(column) for column in ['id'] + LISTING_COLUMNS},
+            'symbol': symbol,
+            'name': name
+        })
+        self._by_key[key] = entry_id
+
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.ids.append(entry_id)
+
+        for gram in _trigrams(_normalize_name(name)):
+            self._names.setdefault(gram, []).append(entry_id)
+        return True
+
+    def _prefixed(self, key: str) -> List[int]:
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ids
+
+    def _name_matches(self, query: str) -> Dict[int, float]:
+        grams = _trigrams(_normalize_name(query))
+        if not grams:
+            return {}
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._names.get(gram, ()))
+        needed = math.ceil(NAME_MATCH_THRESHOLD * len(grams))
+        return {entry_id: hits / len(grams) for entry_id, hits in counts.items() if hits >= needed}
+
+    def search(self, query: str, limit: int = 15) -> List[Dict]:
+        """Entries matching query, best first: exact symbol, symbol prefix, then name similarity"""
+        key = symbol_key(query)
+        if not key:
+            return []
+
+        scores: Dict[int, float] = {}
+        for entry_id in self._prefixed(key):
+            scores[entry_id] = 100 if symbol_key(self._entries[entry_id]['symbol']) == key else 80
+        if len(key) >= 3:
+            for entry_id, overlap in self._name_matches(query).items():
+                scores.setdefault(entry_id, 40 + 20 * overlap)
+
+        # Assets already in the database before listing-only tickers, then shorter symbols
+        best = heapq.nsmallest(limit, scores, key=lambda entry_id: (
+            -scores[entry_id],
+            self._entries[entry_id].get('id') is None,
+            len(self._entries[entry_id]['symbol']),
+            self._entries[entry_id]['symbol']
+        ))
+        return [dict(self._entries[entry_id]) for entry_id in best]
+
+
+def load_listing(path: str) -> List[Dict]:
+    """Rows of a B3/NYSE/NASDAQ listing CSV with LISTING_COLUMNS (extra columns are ignored)"""
+    frame = pd.read_csv(path, dtype=str).fillna('')
+    missing = {'symbol', 'name'} - set(frame.columns)
+    if missing:
+        raise ValueError(f"Listing file {path} has no {', '.join(sorted(missing))} column")
+    frame = frame[[column for column in LISTING_COLUMNS if column in frame.columns]]
+    return [{column: value or None for column, value in row.items()} for row in frame.to_dict('records')]
+
+
+def _listing_entries() -> List[Dict]:
+    global _listing
+    if _listing is None:
+        _listing = []
+        if settings.SYMBOL_LISTING_PATH:
+            try:
+                _listing = load_listing(settings.SYMBOL_LISTING_PATH)
+            except Exception as e:
+                logger.error(f"Error loading symbol listing {settings.SYMBOL_LISTING_PATH}: {str(e)}")
+    return _listing
+
+
+def build_catalog(db: Session, listing: Iterable[Dict] = ()) -> SymbolCatalog:
+    """Catalog of every stored asset plus the listing rows whose symbol is not stored"""
+    catalog = SymbolCatalog()
+    rows = db.query(
+        models.Asset.id, models.Asset.symbol, models.Asset.name, models.Asset.exchange,
+        models.Asset.asset_type, models.Asset.currency, models.Asset.sector, models.Asset.industry
+    ).all()
+    for row in rows:
+        catalog.add(asset_entry(row))
+    for entry in listing:
+        catalog.add(entry)
+    return catalog
+
+
+def get_catalog(db: Session) -> SymbolCatalog:
+    """This process's catalog, (re)built from the assets table and SYMBOL_LISTING_PATH when expired"""
+    global _catalog, _catalog_loaded_at
+    with _catalog_lock:
+        if _catalog is None or time.monotonic() - _catalog_loaded_at > _CATALOG_TTL_SECONDS:
+            _catalog = build_catalog(db, _listing_entries())
+            _catalog_loaded_at = time.monotonic()
+            logger.info(f"Symbol catalog loaded with {len(_catalog)} symbols")
+        return _catalog
+
+
+def invalidate_catalog():
+    """Rebuild the catalog on the next search (e.g. after importing a new listing)"""
+    global _catalog, _listing
+    with _catalog_lock:
+        _catalog = None
+        _listing = None
+
+
+def add_to_catalog(entries: Iterable[Dict]):
+    """Index symbols found after the catalog was built (network search results, new assets)"""
+    with _catalog_lock:
+        if _catalog is not None:
+            for entry in entries:
+                _catalog.add(entry)
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from .. import models
+from .position_ledger import fold_trades_frame
+import logging
+
+logger = logging.getLogger(__name__)
+
+SERIES_COLUMNS = ['market_value', 'cash', 'total_value', 'invested', 'net_flow']
+
+
+class ValuationEngine:
+    """Builds a portfolio's daily value series from the ledger in a single pass.
+
+    Transactions and prices are loaded once; holdings (days x assets) come from a
+    cumulative sum of trade deltas and are multiplied by a forward-filled price
+    matrix, so the cost no longer grows with the number of days requested.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def build_daily_values(self, portfolio_id: int, start_date: date, end_date: date) -> pd.DataFrame:
+        """Return a DataFrame indexed by calendar day with the columns in SERIES_COLUMNS
+
+        - market_value: sum of holdings x last known close
+        - cash: deposits - withdrawals - buys + sells + dividends (cumulative)
+        - total_value: market_value + cash
+        - invested: cost basis of the open positions, as Position.total_invested
+        - net_flow: deposits - withdrawals booked on that day
+        """
+        return self.build_daily_values_many({portfolio_id: start_date}, end_date)[portfolio_id]
+
+    def build_daily_values_many(self, start_dates: Dict[int, date], end_date: date) -> Dict[int, pd.DataFrame]:
+        """build_daily_values of several portfolios, each from its own start date
+
+        Transactions of every portfolio are read in one query and prices in one
+        matrix over the union of their assets, so the number of queries does
+        not grow with the number of portfolios.
+        """
+        results = {
+            portfolio_id: pd.DataFrame(columns=SERIES_COLUMNS)
+            for portfolio_id, start_date in start_dates.items() if start_date > end_date
+        }
+        live = {portfolio_id: start_date for portfolio_id, start_date in start_dates.items() if start_date <= end_date}
+        if not live:
+            return results
+
+        transactions = self.db.query(
+            models.Transaction.portfolio_id,
+            models.Transaction.id,
+            models.Transaction.date,
+            models.Transaction.transaction_type,
+            models.Transaction.asset_id,
+            models.Transaction.quantity,
+            models.Transaction.total_amount
+        ).filter(
+            models.Transaction.portfolio_id.in_(list(live)),
+            models.Transaction.date <= end_date
+        ).all()
+
+        tx = pd.DataFrame(transactions, columns=['portfolio_id', 'id', 'date', 'type', 'asset_id', 'quantity', 'amount'])
+        tx['type'] = tx['type'].map(lambda t: t.value if isinstance(t, models.TransactionType) else str(t))
+        tx['quantity'] = tx['quantity'].fillna(0.0).astype(float)
+        tx['amount'] = tx['amount'].fillna(0.0).astype(float)
+        by_portfolio = {int(portfolio_id): group for portfolio_id, group in tx.groupby('portfolio_id')}
+
+        # One price matrix from the earliest start; each portfolio reads its own rows
+        traded = tx[tx['type'].isin(['BUY', 'SELL']) & tx['asset_id'].notna()]
+        asset_ids = sorted(int(a) for a in traded['asset_id'].unique())
+        prices = None
+        if asset_ids:
+            days = pd.date_range(min(live.values()), end_date, freq='D')
+            prices = pd.DataFrame(self.load_price_matrix(asset_ids, days), index=days, columns=asset_ids)
+
+        for portfolio_id, start_date in live.items():
+            days = pd.date_range(start_date, end_date, freq='D')
+            portfolio_tx = by_portfolio.get(portfolio_id)
+            if portfolio_tx is None:
+                results[portfolio_id] = pd.DataFrame(0.0, index=days, columns=SERIES_COLUMNS)
+            else:
+                results[portfolio_id] = self._value_days(portfolio_tx, days, prices)
+
+        return results
+
+    def _value_days(self, tx: pd.DataFrame, days: pd.DatetimeIndex, prices: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """Daily values of one portfolio's transactions over days"""
+        n_days = len(days)
+
+        # Transactions before the window collapse into the opening row
+        day_idx = (pd.to_datetime(tx['date']) - days[0]).dt.days.to_numpy()
+        tx = tx.assign(day=np.clip(day_idx, 0, n_days - 1))
+
+        # Cash and flow vectors
+        cash_sign = tx['type'].map({
+            'DEPOSIT': 1.0, 'WITHDRAW': -1.0, 'BUY': -1.0, 'SELL': 1.0, 'DIVIDEND': 1.0
+        }).fillna(0.0).to_numpy()
+        cash_delta = np.zeros(n_days)
+        np.add.at(cash_delta, tx['day'].to_numpy(), cash_sign * tx['amount'].to_numpy())
+
+        flow_sign = tx['type'].map({'DEPOSIT': 1.0, 'WITHDRAW': -1.0}).fillna(0.0).to_numpy()
+        net_flow = np.zeros(n_days)
+        in_window = day_idx >= 0
+        np.add.at(net_flow, tx['day'].to_numpy()[in_window], (flow_sign * tx['amount'].to_numpy())[in_window])
+
+        # Holdings matrix (days x assets)
+        trades = tx[tx['type'].isin(['BUY', 'SELL']) & tx['asset_id'].notna()]
+        market_value = np.zeros(n_days)
+        invested_delta = np.zeros(n_days)
+
+        if not trades.empty:
+            # Cost basis replayed in ledger order, so a partial sale removes its average cost
+            trades = trades.sort_values(['asset_id', 'date', 'id'], kind='stable').reset_index(drop=True)
+            cost = fold_trades_frame(trades)['total_invested']
+            cost_delta = (cost - cost.groupby(trades['asset_id']).shift(1).fillna(0.0)).to_numpy()
+            np.add.at(invested_delta, trades['day'].to_numpy(), cost_delta)
+
+            asset_ids = sorted(int(a) for a in trades['asset_id'].unique())
+            col = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+
+            qty_sign = np.where(trades['type'].to_numpy() == 'BUY', 1.0, -1.0)
+            holdings = np.zeros((n_days, len(asset_ids)))
+            np.add.at(
+                holdings,
+                (trades['day'].to_numpy(), trades['asset_id'].map(lambda a: col[int(a)]).to_numpy()),
+                qty_sign * trades['quantity'].to_numpy()
+            )
+            holdings = np.cumsum(holdings, axis=0)
+
+            held = np.where(holdings > 0, holdings, 0.0)
+            market_value = np.nansum(held * prices.reindex(index=days, columns=asset_ids).to_numpy(dtype=float), axis=1)
+
+        cash = np.cumsum(cash_delta)
+        return pd.DataFrame({
+            'market_value': market_value,
+            'cash': cash,
+            'total_value': market_value + cash,
+            'invested': np.cumsum(invested_delta),
+            'net_flow': net_flow
+        }, index=days)
+
+    def load_price_matrix(self, asset_ids: List[int], days: pd.DatetimeIndex) -> np.ndarray:
+        """Forward-filled close matrix (days x assets), NaN before an asset's first price"""
+        start_date = days[0].date()
+        end_date = days[-1].date()
+
+        # Last close before the window so the first rows can be forward-filled
+        last_before = self.db.query(
+            models.Price.asset_id,
+            func.max(models.Price.date).label('date')
+        ).filter(
+            models.Price.asset_id.in_(asset_ids),
+            models.Price.date < start_date
+        ).group_by(models.Price.asset_id).subquery()
+
+        opening = self.db.query(
+            models.Price.asset_id, models.Price.date, models.Price.close
+        ).join(
+            last_before,
+            (models.Price.asset_id == last_before.c.asset_id) & (models.Price.date == last_before.c.date)
+        ).all()
+
+        window = self.db.query(
+            models.Price.asset_id, models.Price.date, models.Price.close
+        ).filter(
+            models.Price.asset_id.in_(asset_ids),
+            models.Price.date >= start_date,
+            models.Price.date <= end_date
+        ).all()
+
+        matrix = pd.DataFrame(np.nan, index=days, columns=asset_ids)
+        rows = list(opening) + list(window)
+        if not rows:
+            return matrix.to_numpy()
+
+        prices = pd.DataFrame(rows, columns=['asset_id', 'date', 'close'])
+        prices['date'] = pd.to_datetime(prices['date']).clip(lower=days[0])
+        prices = prices.sort_values('date', kind='stable').pivot_table(
+            index='date', columns='asset_id', values='close', aggfunc='last'
+        )
+        matrix = prices.reindex(index=days, columns=asset_ids).ffill()
+        return matrix.to_numpy(dtype=float)
+
+    def value_at_date(self, portfolio_id: int, target_date: date) -> float:
+        """Total portfolio value (holdings + cash) at a single date"""
+        series = self.build_daily_values(portfolio_id, target_date, target_date)
+        if series.empty:
+            return 0.0
+        return float(series['total_value'].iloc[-1])
+
+
+def compute_series_metrics(values: np.ndarray, risk_free_rate: float = 0.1165) -> Dict:
+    """Return, volatility, Sharpe and drawdown figures for a value series"""
+    if len(values) < 2:
+        return {}
+
+    returns = np.diff(values) / values[:-1]
+
+    daily_return = returns[-1] if len(returns) > 0 else 0
+    total_return = (values[-1] - values[0]) / values[0]
+
+    # Annualized metrics
+    trading_days = len(returns)
+    yearly_return = (1 + total_return) ** (252 / trading_days) - 1 if trading_days > 0 else 0
+
+    # Volatility (annualized standard deviation)
+    volatility = np.std(returns) * np.sqrt(252) if len(returns) > 1 else 0
+
+    excess_return = yearly_return - risk_free_rate
+    sharpe_ratio = excess_return / volatility if volatility > 0 else 0
+
+    # Max Drawdown
+    cumulative_returns = (1 + returns).cumprod()
+    running_max = np.maximum.accumulate(cumulative_returns)
+    drawdown = (cumulative_returns - running_max) / running_max
+    max_drawdown = np.min(drawdown) if len(drawdown) > 0 else 0
+
+    # Monthly return (last 30 days)
+    monthly_start = max(0, len(values) - 30)
+    monthly_return = (values[-1] - values[monthly_start]) / values[monthly_start]
+
+    return {
+        'daily_return': float(daily_return) * 100,
+        'monthly_return': float(monthly_return) * 100,
+        'yearly_return': float(yearly_return) * 100,
+        'volatility': float(volatility) * 100,
+        'sharpe_ratio': float(sharpe_ratio),
+        'max_drawdown': float(max_drawdown) * 100
+    }
@@ -0,0 +1,49 @@
+"""
+Celery worker for PRICE_SCHEDULER_BACKEND=celery
+
+Runs the stale price refresh, the benchmark sync and the full position refresh (snapshots,
+dividend summaries) outside the API processes, with Redis as broker:
+    celery -A app.worker worker --beat --loglevel=info
+"""
+
+import asyncio
+from typing import List, Optional
+from celery import Celery
+from .config import settings
+from .services.price_scheduler import refresh_stale_prices, sync_benchmarks
+from .services.position_refresher import run_full_refresh
+
+celery_app = Celery("portfolio", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+celery_app.conf.beat_schedule = {
+    "refresh-stale-prices": {
+        "task": "app.worker.refresh_stale_prices",
+        "schedule": float(max(1, settings.PRICE_SCHEDULER_INTERVAL_SECONDS)),
+        # A pass that could not start within one interval is superseded by the next
+        "options": {"expires": float(max(1, settings.PRICE_SCHEDULER_INTERVAL_SECONDS))},
+    },
+    "sync-benchmarks": {
+        "task": "app.worker.sync_benchmarks",
+        "schedule": float(max(1, settings.BENCHMARK_SYNC_SECONDS)),
+        "options": {"expires": float(max(1, settings.BENCHMARK_SYNC_SECONDS))},
+    },
+    "refresh-positions": {
+        "task": "app.worker.refresh_positions",
+        "schedule": float(max(1, settings.POSITION_REFRESH_INTERVAL_SECONDS)),
+        "options": {"expires": float(max(1, settings.POSITION_REFRESH_INTERVAL_SECONDS))},
+    }
+}
+
+
+@celery_app.task(name="app.worker.refresh_stale_prices")
+def refresh_stale_prices_task(asset_ids: Optional[List[int]] = None):
+    return asyncio.run(refresh_stale_prices(asset_ids or []))
+
+
+@celery_app.task(name="app.worker.sync_benchmarks")
+def sync_benchmarks_task():
+    return sync_benchmarks()
+
+
+@celery_app.task(name="app.worker.refresh_positions")
+def refresh_positions_task():
+    return run_full_refresh()
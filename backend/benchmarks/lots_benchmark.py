@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Benchmark for the lot engine and the bulk position rebuild on large ledgers
+
+Usage (from backend/):
+    python benchmarks/lots_benchmark.py --transactions 100000 --assets 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.services.lots import LotBook, LotEngine, FIFO, AVERAGE
+from app.services.position_ledger import PositionLedger
+
+
+def build_ledger(db, n_transactions: int, n_assets: int, seed: int = 42) -> int:
+    """Insert a synthetic portfolio with n_transactions BUY/SELL rows"""
+    random.seed(seed)
+
+    user = models.User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.flush()
+    portfolio = models.Portfolio(name="Benchmark", owner_id=user.id)
+    db.add(portfolio)
+    db.flush()
+
+    asset_ids = []
+    for i in range(n_assets):
+        asset = models.Asset(symbol=f"BENCH{i}", name=f"Bench {i}", asset_type=models.AssetType.STOCK)
+        db.add(asset)
+        db.flush()
+        asset_ids.append(asset.id)
+
+    holdings = {asset_id: 0.0 for asset_id in asset_ids}
+    start = date.today() - timedelta(days=10 * 365)
+    rows = []
+    for i in range(n_transactions):
+        asset_id = random.choice(asset_ids)
+        price = random.uniform(5, 100)
+        if holdings[asset_id] > 0 and random.random() < 0.45:
+            transaction_type = models.TransactionType.SELL
+            quantity = round(random.uniform(0, holdings[asset_id]), 4)
+            holdings[asset_id] -= quantity
+        else:
+            transaction_type = models.TransactionType.BUY
+            quantity = random.randint(1, 200)
+            holdings[asset_id] += quantity
+
+        rows.append({
+            'portfolio_id': portfolio.id,
+            'asset_id': asset_id,
+            'transaction_type': transaction_type,
+            'date': start + timedelta(days=i * 3650 // n_transactions),
+            'quantity': quantity,
+            'price': price,
+            'total_amount': quantity * price
+        })
+
+    db.bulk_insert_mappings(models.Transaction, rows)
+    db.commit()
+    return portfolio.id
+
+
+def timed(label: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--assets", type=int, default=50)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    portfolio_id = timed(f"insert {args.transactions} transactions",
+                         lambda: build_ledger(db, args.transactions, args.assets))
+
+    # In-memory LotBook only, without the query
+    book = LotBook(FIFO)
+    on = date.today()
+    timed("LotBook FIFO, 100k alternating ops", lambda: [
+        book.buy(10, 100.0, on, i) if i % 3 else book.sell(5, 60.0, on, i) for i in range(100_000)
+    ])
+
+    engine_ = LotEngine(db)
+    fifo = timed("LotEngine.build FIFO", lambda: engine_.build(portfolio_id, FIFO))
+    timed("LotEngine.build AVERAGE", lambda: engine_.build(portfolio_id, AVERAGE))
+    timed("PositionLedger.bulk_rebuild", lambda: PositionLedger(db).bulk_rebuild(portfolio_id))
+
+    open_lots = sum(len(b) for b in fifo.values())
+    realized = sum(len(b.realized) for b in fifo.values())
+    print(f"open lots: {open_lots}  realized lot slices: {realized}")
+
+
+if __name__ == "__main__":
+    main()
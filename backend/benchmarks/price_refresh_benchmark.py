@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark for the bulk price refresh and the history backfill against the
+offline fixture provider
+
+Usage (from backend/):
+    python benchmarks/price_refresh_benchmark.py --assets 80
+    python benchmarks/price_refresh_benchmark.py --assets 500 --history-years 10
+    python benchmarks/price_refresh_benchmark.py --fixture prices.csv
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.services.market_data import MarketDataService
+from app.services.providers import FixturePriceProvider, PRICE_COLUMNS
+from app.services.ingestion import ingest_prices
+
+
+def synthetic_prices(tickers, days: int = 5, seed: int = 42) -> pd.DataFrame:
+    """Random-walk business-day bars for tickers over the last days"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=date.today() - timedelta(days=1), periods=days).date
+    steps = 1 + rng.normal(0, 0.02, (len(tickers), len(dates)))
+    closes = rng.uniform(5, 100, (len(tickers), 1)) * np.cumprod(steps, axis=1)
+    return pd.DataFrame({
+        'ticker': np.repeat(tickers, len(dates)),
+        'date': np.tile(dates, len(tickers)),
+        'open': closes.ravel(),
+        'high': closes.ravel() * 1.01,
+        'low': closes.ravel() * 0.99,
+        'close': closes.ravel(),
+        'volume': 1000.0
+    })[PRICE_COLUMNS]
+
+
+def timed(label: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=80)
+    parser.add_argument("--fixture", help="CSV/Parquet with ticker,date,open,high,low,close,volume")
+    parser.add_argument("--history-years", type=int, default=0, help="also backfill this many years of daily bars")
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    service = MarketDataService(db)
+    if args.fixture:
+        provider = FixturePriceProvider(args.fixture)
+        symbols = sorted(provider.prices['ticker'].unique())
+    else:
+        symbols = [f"BENCH{i}" for i in range(args.assets)]
+        provider = FixturePriceProvider(synthetic_prices(symbols))
+
+    assets = [models.Asset(symbol=symbol, name=symbol, asset_type=models.AssetType.STOCK) for symbol in symbols]
+    db.add_all(assets)
+    db.commit()
+
+    first = timed(f"bulk refresh {len(assets)} assets", lambda: service.bulk_update_prices(assets, provider))
+    second = timed("bulk refresh again (replaces last bar)", lambda: service.bulk_update_prices(assets, provider))
+    # Quotes are stored under their bar date, not today
+    last_bar = db.query(func.max(models.Price.date)).scalar()
+    stored = db.query(models.Price).filter(models.Price.date == last_bar).count()
+    print(f"first: {first}  second: {second}  rows for {last_bar}: {stored}")
+
+    if args.history_years:
+        history = synthetic_prices(symbols, days=args.history_years * 252)
+        asset_ids = {asset.symbol: asset.id for asset in assets}
+        written = timed(f"backfill {len(history)} bars", lambda: ingest_prices(db, history, asset_ids))
+        timed("backfill again (all conflicts)", lambda: ingest_prices(db, history, asset_ids))
+        print(f"bars written: {written}  rows stored: {db.query(models.Price).count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Ingestion throughput through the PriceProvider interface: quotes, bulk refresh,
+history, FX and benchmark sync, in rows per second
+
+Runs against the offline fixture provider by default (synthetic bars, or a
+recorded CSV/Parquet file), so numbers are comparable between runs; --provider
+points the same run at yahoo or alphavantage.
+
+Usage (from backend/):
+    python benchmarks/provider_throughput_benchmark.py --assets 200 --history-years 5
+    python benchmarks/provider_throughput_benchmark.py --fixture prices.parquet
+    python benchmarks/provider_throughput_benchmark.py --provider yahoo --assets 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.services.benchmark_ingestion import BENCHMARK_TICKERS, BenchmarkIngestion
+from app.services.ingestion import ingest_exchange_rates, ingest_prices
+from app.services.market_data import MarketDataService
+from app.services.providers import FixturePriceProvider, create_price_provider, fx_ticker
+from price_refresh_benchmark import synthetic_prices
+
+FX_PAIRS = [("USD", "BRL"), ("EUR", "BRL")]
+
+
+def throughput(label: str, fn):
+    """Run fn, which returns (rows, result), and print rows per second"""
+    started = time.perf_counter()
+    rows, result = fn()
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    print(f"{label:<36} {rows:>9} rows {elapsed:8.3f}s {rate:>12,.0f} rows/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--history-years", type=int, default=2)
+    parser.add_argument("--provider", default="fixture", help="fixture, yahoo or alphavantage")
+    parser.add_argument("--fixture", help="CSV/Parquet with ticker,date,open,high,low,close,volume")
+    parser.add_argument("--period", default="1y", help="history period asked from the provider")
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    fx_tickers = [fx_ticker(*pair) for pair in FX_PAIRS]
+    if args.provider != "fixture":
+        provider = create_price_provider(args.provider)
+        symbols = [f"BENCH{i}" for i in range(args.assets)]
+    elif args.fixture:
+        provider = FixturePriceProvider(args.fixture)
+        symbols = sorted(set(provider.prices['ticker']) - set(fx_tickers) - set(BENCHMARK_TICKERS.values()))
+    else:
+        symbols = [f"BENCH{i}" for i in range(args.assets)]
+        days = max(args.history_years * 252, 5)
+        provider = FixturePriceProvider(pd.concat([
+            synthetic_prices(symbols, days=days),
+            synthetic_prices(fx_tickers, days=days, seed=7),
+            synthetic_prices(list(BENCHMARK_TICKERS.values()), days=days, seed=11)
+        ]))
+    print(f"provider: {provider.name}  assets: {len(symbols)}")
+
+    assets = [models.Asset(symbol=symbol, name=symbol, asset_type=models.AssetType.STOCK) for symbol in symbols]
+    db.add_all(assets)
+    db.commit()
+    asset_ids = {asset.symbol: asset.id for asset in assets}
+    service = MarketDataService(db, provider=provider)
+
+    def quotes():
+        frame = provider.latest_quotes(symbols)
+        return len(frame), frame
+
+    def bulk_refresh():
+        result = service.bulk_update_prices(assets, provider)
+        return result["updated"], result
+
+    def history():
+        bars = provider.history(symbols, period=args.period)
+        return ingest_prices(db, bars, asset_ids), bars
+
+    def fx():
+        end = date.today()
+        start = end - timedelta(days=args.history_years * 366)
+        written = sum(
+            ingest_exchange_rates(db, base, quote, provider.fx_rates(base, quote, start, end))
+            for base, quote in FX_PAIRS
+        )
+        return written, written
+
+    def benchmarks():
+        written = BenchmarkIngestion(db).sync(provider=provider)
+        return sum(written.values()), written
+
+    throughput("latest quotes", quotes)
+    throughput("bulk refresh", bulk_refresh)
+    throughput(f"history ingest ({args.period})", history)
+    throughput("history ingest again (conflicts)", history)
+    throughput(f"fx ingest ({len(FX_PAIRS)} pairs)", fx)
+    throughput("benchmark sync (first)", benchmarks)
+    throughput("benchmark sync (tail only)", benchmarks)
+
+
+if __name__ == "__main__":
+    main()
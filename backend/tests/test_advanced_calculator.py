@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import models
+from app.services.advanced_calculator import AdvancedCalculator
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def portfolio(db):
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    petr = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    hglg = models.Asset(symbol='HGLG11', name='CSHG Logística', asset_type=models.AssetType.REAL_ESTATE)
+    db.add_all([portfolio, petr, hglg])
+    db.commit()
+
+    positions = {
+        'PETR4': models.Position(portfolio_id=portfolio.id, asset_id=petr.id, quantity=100, average_price=30.0,
+                                 total_invested=3000.0, current_price=36.0, current_value=3600.0),
+        'HGLG11': models.Position(portfolio_id=portfolio.id, asset_id=hglg.id, quantity=10, average_price=160.0,
+                                  total_invested=1600.0, current_price=150.0, current_value=1500.0),
+    }
+    db.add_all(positions.values())
+    db.add_all([
+        models.Transaction(portfolio_id=portfolio.id, asset_id=petr.id, transaction_type=models.TransactionType.BUY,
+                           date=TODAY - timedelta(days=730), quantity=100, total_amount=3000.0),
+        models.Transaction(portfolio_id=portfolio.id, asset_id=hglg.id, transaction_type=models.TransactionType.BUY,
+                           date=TODAY - timedelta(days=90), quantity=10, total_amount=1600.0),
+    ])
+    db.commit()
+
+    def dividend(position, days_ago, amount, net=None, recurring=False, frequency=models.PaymentFrequency.EVENTUAL):
+        return models.Dividend(
+            position_id=position.id, asset_id=position.asset_id, portfolio_id=portfolio.id,
+            dividend_type=models.DividendType.DIVIDEND, amount_per_share=amount / position.quantity,
+            total_amount=amount, shares_quantity=position.quantity, payment_date=TODAY - timedelta(days=days_ago),
+            net_amount=net, is_recurring=recurring, frequency=frequency
+        )
+
+    db.add_all([
+        # Older than a year: counts in the total, not in the yield
+        dividend(positions['PETR4'], 400, 200.0),
+        dividend(positions['PETR4'], 100, 150.0, net=127.5),
+        dividend(positions['HGLG11'], 60, 11.0, recurring=True, frequency=models.PaymentFrequency.MONTHLY),
+        dividend(positions['HGLG11'], 30, 11.0, recurring=True, frequency=models.PaymentFrequency.MONTHLY),
+    ])
+    db.commit()
+    return portfolio, positions
+
+
+def test_position_metrics(db, portfolio):
+    _, positions = portfolio
+    calculator = AdvancedCalculator(db)
+
+    petr = positions['PETR4']
+    yields = calculator.calculate_yield_metrics(petr.id)
+    # Net amount wins over the total when informed
+    assert yields.total_dividends_received == pytest.approx(327.5)
+    assert yields.yield_on_cost == pytest.approx(127.5 / 3000.0 * 100)
+    assert yields.current_yield == pytest.approx(127.5 / 3600.0 * 100)
+    assert yields.annual_dividend_income == 0.0
+
+    hglg = positions['HGLG11']
+    assert calculator.calculate_yield_metrics(hglg.id).annual_dividend_income == pytest.approx(2 * 11.0 * 12)
+
+    gains = calculator.calculate_capital_gain_metrics(petr.id)
+    assert (gains.capital_gain, gains.capital_gain_percentage) == (600.0, 20.0)
+
+    returns = calculator.calculate_total_return_metrics(petr.id)
+    assert returns.total_return == pytest.approx(927.5)
+    # Two years held
+    assert returns.annualized_return == pytest.approx(((1 + 927.5 / 3000.0) ** (365.25 / 730) - 1) * 100)
+
+
+def test_portfolio_metrics_match_the_single_position_path(db, portfolio):
+    portfolio, positions = portfolio
+    calculator = AdvancedCalculator(db)
+
+    metrics = calculator.calculate_portfolio_advanced_metrics(portfolio.id)
+
+    for symbol, position in positions.items():
+        assert metrics.asset_metrics[symbol]['yield_metrics'] == calculator.calculate_yield_metrics(position.id).model_dump()
+        assert metrics.asset_metrics[symbol]['total_return_metrics'] == \
+            calculator.calculate_total_return_metrics(position.id).model_dump()
+
+    assert metrics.capital_gain_metrics.capital_gain == pytest.approx(500.0)
+    assert metrics.yield_metrics.total_dividends_received == pytest.approx(349.5)
+    assert metrics.yield_metrics.annual_dividend_income == pytest.approx(264.0)
+    assert metrics.total_return_metrics.total_return == pytest.approx(849.5)
+
+
+def test_empty_portfolio_and_missing_position(db, portfolio):
+    portfolio, _ = portfolio
+    empty = models.Portfolio(name='Empty', owner_id=portfolio.owner_id)
+    db.add(empty)
+    db.commit()
+    calculator = AdvancedCalculator(db)
+
+    assert calculator.calculate_portfolio_advanced_metrics(empty.id).yield_metrics.annual_dividend_income == 0.0
+    with pytest.raises(ValueError):
+        calculator.calculate_yield_metrics(9999)
@@ -0,0 +1,98 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import models
+from app.services.benchmark_analytics import BenchmarkAnalytics, invalidate_benchmark_cache, relative_metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    invalidate_benchmark_cache()
+    yield
+    invalidate_benchmark_cache()
+
+
+def benchmark_series(days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(rng.normal(0.0004, 0.01, days), index=pd.bdate_range('2026-01-01', periods=days))
+
+
+def test_leveraged_portfolio_has_beta_two():
+    benchmark = benchmark_series()
+    portfolio = 2 * benchmark
+
+    metrics = relative_metrics(portfolio, benchmark, risk_free_rate=0.0)
+
+    assert metrics['beta'] == pytest.approx(2.0)
+    assert metrics['alpha'] == pytest.approx(0.0, abs=1e-9)
+    assert metrics['correlation'] == pytest.approx(1.0)
+    assert metrics['up_capture'] == pytest.approx(200.0)
+    assert metrics['down_capture'] == pytest.approx(200.0)
+    assert metrics['tracking_error'] == pytest.approx(benchmark.std(ddof=1) * np.sqrt(252) * 100)
+    assert metrics['observations'] == len(benchmark)
+
+
+def test_tracking_the_benchmark_exactly():
+    benchmark = benchmark_series()
+
+    metrics = relative_metrics(benchmark.copy(), benchmark, risk_free_rate=0.0)
+
+    assert metrics['beta'] == pytest.approx(1.0)
+    assert metrics['tracking_error'] == 0.0
+    assert metrics['information_ratio'] is None
+
+
+def test_only_common_days_are_compared():
+    benchmark = benchmark_series()
+    portfolio = benchmark.iloc[10:50] + 0.001
+
+    metrics = relative_metrics(portfolio, benchmark, risk_free_rate=0.0)
+
+    assert metrics['observations'] == 40
+    assert metrics['active_return'] == pytest.approx(0.001 * 252 * 100)
+    assert relative_metrics(portfolio.iloc[:1], benchmark) == {}
+
+
+def test_benchmark_returns_forward_fill_from_before_the_window(db):
+    db.add_all([
+        models.Benchmark(symbol='IBOV', name='Ibovespa', date=day, value=value)
+        for day, value in [(date(2026, 10, 1), 100.0), (date(2026, 10, 6), 110.0), (date(2026, 10, 8), 99.0)]
+    ])
+    db.commit()
+    analytics = BenchmarkAnalytics(db)
+
+    returns = analytics.benchmark_returns('IBOV', date(2026, 10, 5), date(2026, 10, 9))
+
+    assert list(returns.index.date) == [date(2026, 10, day) for day in range(5, 10)]
+    # 10/05 is measured from the 10/01 close; 10/07 and 10/09 carry the last level
+    assert returns.tolist() == pytest.approx([0.0, 0.1, 0.0, -0.1, 0.0])
+
+
+def test_rate_benchmarks_use_the_cumulative_index(db):
+    db.add_all([
+        models.Benchmark(symbol='CDI', name='CDI', date=date(2026, 10, day), value=0.04, cumulative_index=factor)
+        for day, factor in [(5, 1.0), (6, 1.0004), (7, 1.0008)]
+    ])
+    db.commit()
+
+    returns = BenchmarkAnalytics(db).benchmark_returns('CDI', date(2026, 10, 5), date(2026, 10, 7))
+
+    assert returns.iloc[1:].tolist() == pytest.approx([0.0004, 1.0008 / 1.0004 - 1])
+
+
+def test_new_data_is_visible_after_invalidation(db):
+    analytics = BenchmarkAnalytics(db)
+    assert analytics.benchmark_returns('IBOV', date(2026, 10, 5), date(2026, 10, 6)).empty
+
+    db.add_all([
+        models.Benchmark(symbol='IBOV', name='Ibovespa', date=date(2026, 10, 5), value=100.0),
+        models.Benchmark(symbol='IBOV', name='Ibovespa', date=date(2026, 10, 6), value=105.0),
+    ])
+    db.commit()
+    assert analytics.benchmark_returns('IBOV', date(2026, 10, 5), date(2026, 10, 6)).empty
+
+    invalidate_benchmark_cache('IBOV')
+    assert analytics.benchmark_returns('IBOV', date(2026, 10, 5), date(2026, 10, 6)).iloc[-1] == pytest.approx(0.05)
@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from app import models
+from app.services.benchmark_ingestion import BenchmarkIngestion, benchmark_coverage, missing_ranges
+from app.services.providers import FixturePriceProvider
+
+
+class RecordingProvider(FixturePriceProvider):
+    def __init__(self, source):
+        super().__init__(source)
+        self.calls = []
+
+    def history_range(self, tickers, start, end):
+        self.calls.append((sorted(tickers), start, end))
+        return super().history_range(tickers, start, end)
+
+
+def index_bars(ticker, start, end, level=100.0):
+    days = pd.bdate_range(start, end).date
+    return pd.DataFrame({'ticker': ticker, 'date': days, 'close': [level + i for i in range(len(days))]})
+
+
+END = date(2026, 10, 16)  # a Friday
+
+BARS = pd.concat([
+    index_bars('^BVSP', date(2026, 9, 1), END, 130000.0),
+    index_bars('^GSPC', date(2026, 9, 1), END, 6000.0),
+])
+
+
+def test_missing_ranges():
+    start = date(2026, 10, 1)
+
+    assert missing_ranges(None, start, END) == [(start, END)]
+    # Tail from the last stored day (its value may predate the close)
+    assert missing_ranges((date(2026, 10, 5), date(2026, 10, 14)), start, END) == [(date(2026, 10, 14), END)]
+    # Days before the first stored one only with backfill
+    assert missing_ranges((date(2026, 10, 5), END), start, END, backfill=True) == [
+        (start, date(2026, 10, 4)), (END, END)
+    ]
+    # A weekend-only gap is not fetched
+    assert missing_ranges((start, date(2026, 10, 16)), start, date(2026, 10, 18)) == [
+        (date(2026, 10, 16), date(2026, 10, 18))
+    ]
+    assert missing_ranges((start, date(2026, 10, 17)), start, date(2026, 10, 18)) == []
+
+
+def test_first_sync_downloads_the_window_in_one_call(db, monkeypatch):
+    monkeypatch.setattr('app.services.benchmark_ingestion.settings.BENCHMARK_HISTORY_DAYS', 30)
+    provider = RecordingProvider(BARS)
+
+    written = BenchmarkIngestion(db).sync(['IBOV', 'SP500'], end=END, provider=provider)
+
+    assert provider.calls == [(['^BVSP', '^GSPC'], END - timedelta(days=30), END)]
+    assert written['IBOV'] == written['SP500'] > 0
+    assert benchmark_coverage(db)['IBOV'] == (date(2026, 9, 16), END)
+
+
+def test_next_sync_only_fetches_the_tail(db, monkeypatch):
+    monkeypatch.setattr('app.services.benchmark_ingestion.settings.BENCHMARK_HISTORY_DAYS', 30)
+    BenchmarkIngestion(db).sync(['IBOV'], end=date(2026, 10, 9), provider=RecordingProvider(BARS))
+    provider = RecordingProvider(BARS)
+
+    BenchmarkIngestion(db).sync(['IBOV'], end=END, provider=provider)
+
+    assert provider.calls == [(['^BVSP'], date(2026, 10, 9), END)]
+    stored = db.query(models.Benchmark.date).filter(models.Benchmark.symbol == 'IBOV').count()
+    assert stored == len(pd.bdate_range(date(2026, 9, 9), END))
+
+
+def test_backfill_with_explicit_start(db, monkeypatch):
+    monkeypatch.setattr('app.services.benchmark_ingestion.settings.BENCHMARK_HISTORY_DAYS', 10)
+    BenchmarkIngestion(db).sync(['IBOV'], end=END, provider=RecordingProvider(BARS))
+    provider = RecordingProvider(BARS)
+
+    BenchmarkIngestion(db).sync(['IBOV'], start=date(2026, 9, 1), end=END, provider=provider)
+
+    assert provider.calls[0] == (['^BVSP'], date(2026, 9, 1), date(2026, 10, 5))
+    assert benchmark_coverage(db)['IBOV'][0] == date(2026, 9, 1)
+
+
+def test_rate_benchmarks_are_not_synced(db):
+    provider = RecordingProvider(BARS)
+
+    assert BenchmarkIngestion(db).sync(['CDI'], end=END, provider=provider) == {}
+    assert provider.calls == []
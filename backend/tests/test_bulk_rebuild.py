@@ -0,0 +1,112 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import models
+from app.services import position_ledger
+from app.services.position_ledger import (
+    POSITION_FIELDS, PositionLedger, affine_scan, apply_trade, empty_state, fold_trades_frame
+)
+
+
+def random_trades(rng, assets=4, events=60, oversell=False):
+    rows = []
+    for asset_id in range(1, assets + 1):
+        held = 0.0
+        for i in range(events):
+            if held > 0 and rng.random() < 0.4:
+                # Partial sells, full closes and (optionally) sells past the holding
+                quantity = held if rng.random() < 0.2 else round(held * rng.uniform(0.1, 0.9), 4)
+                if oversell and rng.random() < 0.1:
+                    quantity = held + 5
+                kind = 'SELL'
+                held -= quantity
+            else:
+                quantity = float(rng.integers(1, 100))
+                kind = 'BUY'
+                held += quantity
+            rows.append({
+                'asset_id': asset_id, 'date': date(2026, 1, 1) + timedelta(days=i), 'id': asset_id * 1000 + i,
+                'type': kind, 'quantity': quantity, 'amount': round(quantity * rng.uniform(10, 50), 2)
+            })
+    return pd.DataFrame(rows)
+
+
+def folded_one_by_one(trades):
+    states = []
+    for _, group in trades.groupby('asset_id', sort=False):
+        state = empty_state()
+        for event in group.itertuples(index=False):
+            kind = models.TransactionType.BUY if event.type == 'BUY' else models.TransactionType.SELL
+            states.append(dict(apply_trade(state, kind, event.quantity, event.amount)))
+    return pd.DataFrame(states, columns=POSITION_FIELDS)
+
+
+def test_affine_scan_matches_the_recurrence():
+    rng = np.random.default_rng(1)
+    alpha = rng.uniform(0, 1, 37)
+    beta = rng.uniform(-5, 5, 37)
+
+    expected = []
+    x = 0.0
+    for a, b in zip(alpha, beta):
+        x = a * x + b
+        expected.append(x)
+
+    assert affine_scan(alpha, beta) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_fold_trades_frame_matches_apply_trade(seed):
+    trades = random_trades(np.random.default_rng(seed))
+
+    folded = fold_trades_frame(trades)
+
+    assert np.allclose(folded[POSITION_FIELDS].to_numpy(dtype=float),
+                       folded_one_by_one(trades).to_numpy(dtype=float), atol=1e-6)
+
+
+def test_oversold_assets_fall_back_to_apply_trade():
+    trades = random_trades(np.random.default_rng(7), oversell=True)
+
+    folded = fold_trades_frame(trades)
+
+    assert (folded['quantity'] < 0).any()
+    assert np.allclose(folded[POSITION_FIELDS].to_numpy(dtype=float),
+                       folded_one_by_one(trades).to_numpy(dtype=float), atol=1e-6)
+
+
+def test_bulk_rebuild_matches_per_asset_replay(db, monkeypatch):
+    monkeypatch.setattr(position_ledger, 'CHECKPOINT_INTERVAL', 10)
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    assets = [models.Asset(symbol=f'ASSET{i}', name=f'Asset {i}', asset_type=models.AssetType.STOCK) for i in range(3)]
+    db.add_all([portfolio] + assets)
+    db.commit()
+
+    trades = random_trades(np.random.default_rng(3), assets=3, events=25)
+    db.add_all([
+        models.Transaction(portfolio_id=portfolio.id, asset_id=assets[row.asset_id - 1].id,
+                           transaction_type=models.TransactionType(row.type), date=row.date,
+                           quantity=row.quantity, total_amount=row.amount)
+        for row in trades.itertuples(index=False)
+    ])
+    db.commit()
+
+    ledger = PositionLedger(db)
+    assert ledger.bulk_rebuild(portfolio.id) == 3
+    bulk = {
+        position.asset_id: [getattr(position, field) for field in POSITION_FIELDS]
+        for position in db.query(models.Position).all()
+    }
+    bulk_checkpoints = db.query(models.PositionCheckpoint).count()
+
+    for asset in assets:
+        replayed = ledger.rebuild_position(portfolio.id, asset.id)
+        assert bulk[asset.id] == pytest.approx([getattr(replayed, field) for field in POSITION_FIELDS], abs=1e-6)
+    # 25 events per asset: checkpoints at 10 and 20
+    assert bulk_checkpoints == 6
@@ -0,0 +1,89 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app import models
+from app.services import cashflow
+from app.services.cashflow import CashflowProjector, expand_schedules, invalidate_cashflow_cache
+
+
+def expand(first_dates, steps, start, end):
+    schedule, dates = expand_schedules(np.array(first_dates, dtype='datetime64[D]'), np.array(steps), start, end)
+    return list(zip(schedule.tolist(), dates.astype(object).tolist()))
+
+
+def test_month_end_payments_are_clipped_to_the_month_length():
+    payments = expand([date(2026, 1, 31)], [1], date(2026, 1, 1), date(2026, 5, 31))
+
+    assert [day for _, day in payments] == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30), date(2026, 5, 31)
+    ]
+
+
+def test_schedules_are_expanded_inside_the_window():
+    payments = expand(
+        [date(2025, 2, 15), date(2026, 3, 10), date(2026, 12, 1), date(2024, 8, 20)],
+        [3, 0, 1, 6],
+        date(2026, 3, 1), date(2026, 9, 30)
+    )
+
+    assert sorted(payments) == [
+        (0, date(2026, 5, 15)), (0, date(2026, 8, 15)),
+        # A single payment (step 0) inside the window
+        (1, date(2026, 3, 10)),
+        # Every six months from 2024-08-20
+        (3, date(2026, 8, 20)),
+    ]
+    assert expand([], [], date(2026, 1, 1), date(2026, 12, 31)) == []
+
+
+@pytest.fixture
+def portfolio(db):
+    invalidate_cashflow_cache()
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    asset = models.Asset(symbol='HGLG11', name='CSHG Logística', asset_type=models.AssetType.REAL_ESTATE)
+    db.add_all([portfolio, asset])
+    db.commit()
+    position = models.Position(portfolio_id=portfolio.id, asset_id=asset.id, quantity=10, average_price=160.0)
+    db.add(position)
+    db.commit()
+    dividends = [
+        models.Dividend(position_id=position.id, asset_id=asset.id, portfolio_id=portfolio.id,
+                        dividend_type=models.DividendType.DIVIDEND, amount_per_share=1.1, total_amount=11.0,
+                        shares_quantity=10, payment_date=date(2026, 9, day), is_recurring=True,
+                        frequency=models.PaymentFrequency.MONTHLY)
+        for day in (10, 20)
+    ]
+    db.add_all(dividends)
+    db.commit()
+    yield portfolio, dividends
+    invalidate_cashflow_cache()
+
+
+def test_projection_is_cached_until_a_dividend_changes(db, portfolio, monkeypatch):
+    portfolio, dividends = portfolio
+    calls = []
+    original = cashflow.expand_schedules
+    monkeypatch.setattr(cashflow, 'expand_schedules', lambda *args: calls.append(args) or original(*args))
+    projector = CashflowProjector(db)
+
+    first = projector.project(portfolio.id, months_ahead=2, as_of=date(2026, 10, 1))
+    assert [(p.date, p.amount) for p in first] == [
+        ('2026-10-10', 11.0), ('2026-10-20', 11.0), ('2026-11-10', 11.0), ('2026-11-20', 11.0)
+    ]
+    assert projector.project(portfolio.id, months_ahead=2, as_of=date(2026, 10, 1)) == first
+    assert len(calls) == 1
+
+    # Two quick edits of the older row leave count, max(id) and (to the second)
+    # max(updated_at) unchanged; the projection must still follow them
+    dividends[0].net_amount = 9.0
+    db.commit()
+    assert projector.project(portfolio.id, months_ahead=2, as_of=date(2026, 10, 1))[0].amount == 9.0
+    dividends[0].net_amount = 8.0
+    db.commit()
+    assert projector.project(portfolio.id, months_ahead=2, as_of=date(2026, 10, 1))[0].amount == 8.0
+    assert len(calls) == 3
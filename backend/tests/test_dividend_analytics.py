@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from app import models
+from app.routers.dividends import _dividends_changed
+from app.services.dividend_analytics import DividendAnalytics, yearly_growth
+
+TODAY = date.today()
+YEAR = TODAY.year
+
+
+def test_yearly_growth_uses_complete_years_only():
+    yearly = pd.DataFrame(
+        {YEAR - 3: [1.0, 0.0, 2.0], YEAR - 2: [1.2, 0.0, 0.0], YEAR - 1: [1.44, 3.0, 0.0], YEAR: [9.0, 9.0, 9.0]},
+        index=['steady', 'new', 'stopped']
+    )
+
+    growth = yearly_growth(yearly, YEAR)
+
+    assert growth.loc['steady', 'yoy_growth'] == pytest.approx(20.0)
+    assert growth.loc['steady', 'cagr'] == pytest.approx(20.0)
+    assert growth.loc['steady', 'cagr_years'] == 2
+    # One paying year: no growth figures
+    assert growth.loc['new', 'last_full_year'] == YEAR - 1
+    assert growth.loc['new', 'yoy_growth'] is None and growth.loc['new', 'cagr'] is None
+    # Last paying year had nothing the year before
+    assert growth.loc['stopped', 'last_full_year'] == YEAR - 3
+    assert growth.loc['stopped', 'yoy_growth'] is None
+
+
+@pytest.fixture
+def holdings(db):
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolios = [models.Portfolio(name=name, owner_id=user.id) for name in ('Main', 'Kids')]
+    petr = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    vale = models.Asset(symbol='VALE3', name='Vale', asset_type=models.AssetType.STOCK)
+    db.add_all(portfolios + [petr, vale])
+    db.commit()
+    positions = [
+        models.Position(portfolio_id=portfolio.id, asset_id=petr.id, quantity=100, average_price=30.0)
+        for portfolio in portfolios
+    ]
+    db.add_all(positions)
+    db.add(models.Price(asset_id=petr.id, date=TODAY - timedelta(days=1), close=40.0))
+    db.commit()
+
+    # The same payments recorded once per portfolio holding the asset
+    db.add_all([
+        models.Dividend(position_id=position.id, asset_id=petr.id, portfolio_id=position.portfolio_id,
+                        dividend_type=models.DividendType.DIVIDEND, amount_per_share=per_share,
+                        total_amount=per_share * 100, shares_quantity=100, payment_date=payment_date)
+        for position in positions
+        for payment_date, per_share in [(date(YEAR - 2, 6, 1), 1.0), (date(YEAR - 1, 6, 1), 1.5),
+                                        (TODAY - timedelta(days=10), 2.0)]
+    ])
+    db.commit()
+    return petr, vale
+
+
+def test_summaries_deduplicate_payments_across_portfolios(db, holdings):
+    petr, _ = holdings
+    analytics = DividendAnalytics(db)
+
+    assert analytics.refresh() == 1
+    summary = analytics.summaries([petr.id])[petr.id]
+
+    assert summary.payments_count == 3
+    assert summary.yoy_growth == pytest.approx(50.0)
+    last_june_in_ttm = date(YEAR - 1, 6, 1) >= TODAY - timedelta(days=365)
+    assert summary.ttm_per_share == pytest.approx(2.0 + (1.5 if last_june_in_ttm else 0.0))
+    assert summary.ttm_yield == pytest.approx(summary.ttm_per_share / 40.0 * 100)
+
+
+def test_ttm_yield_follows_the_latest_price(db, holdings):
+    petr, _ = holdings
+    analytics = DividendAnalytics(db)
+    analytics.refresh()
+
+    db.add(models.Price(asset_id=petr.id, date=TODAY, close=50.0))
+    db.commit()
+    summary = analytics.summaries([petr.id])[petr.id]
+
+    assert summary.ttm_yield == pytest.approx(summary.ttm_per_share / 50.0 * 100)
+    # Reads do not write the recomputed value back
+    assert not db.dirty
+
+
+def test_moving_dividends_refreshes_both_assets(db, holdings):
+    petr, vale = holdings
+    DividendAnalytics(db).refresh()
+
+    for dividend in db.query(models.Dividend).all():
+        dividend.asset_id = vale.id
+    db.commit()
+    _dividends_changed(db, dividend.portfolio_id, petr.id, vale.id)
+
+    stored = {summary.asset_id for summary in db.query(models.DividendSummary).all()}
+    assert stored == {vale.id}
@@ -0,0 +1,75 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app import models
+from app.services import fx
+from app.services.fx import FXCube, FXService, invalidate_fx_cube
+
+RATES = [
+    ('USD', 'BRL', date(2026, 10, 1), 5.0),
+    ('USD', 'BRL', date(2026, 10, 5), 5.5),
+    ('EUR', 'USD', date(2026, 10, 3), 1.1),
+    ('GBP', 'BRL', date(2026, 10, 1), 7.0),
+]
+
+
+@pytest.fixture
+def cube():
+    return FXCube(RATES)
+
+
+def test_as_of_lookup_forward_fills(cube):
+    assert cube.rate('USD', 'BRL', date(2026, 10, 4)) == 5.0
+    assert cube.rate('USD', 'BRL', date(2026, 10, 5)) == 5.5
+    assert cube.rate('USD', 'BRL', date(2026, 12, 1)) == 5.5
+    # Before the first stored rate of the pair
+    assert cube.rate('EUR', 'USD', date(2026, 10, 1)) == 1.1
+
+
+def test_inverse_lookup(cube):
+    assert cube.rate('BRL', 'USD', date(2026, 10, 5)) == pytest.approx(1 / 5.5)
+    assert cube.rate(models.Currency.BRL, models.Currency.GBP, date(2026, 10, 5)) == pytest.approx(1 / 7.0)
+
+
+def test_cross_through_a_pivot_currency(cube):
+    # EUR -> BRL has no stored pair: EUR -> USD (direct) then USD -> BRL
+    assert cube.rate('EUR', 'BRL', date(2026, 10, 5)) == pytest.approx(1.1 * 5.5)
+    # GBP -> USD: GBP -> BRL then BRL -> USD (inverted)
+    assert cube.rate('GBP', 'USD', date(2026, 10, 5)) == pytest.approx(7.0 / 5.5)
+    assert cube.has_pair('GBP', 'USD')
+    # One pivot only: EUR -> GBP would need EUR -> USD -> BRL -> GBP
+    assert not cube.has_pair('EUR', 'GBP')
+    assert not cube.has_pair('JPY', 'BRL')
+    assert cube.convert(10.0, 'JPY', 'BRL') is None
+
+
+def test_convert_series_uses_each_days_rate(cube):
+    index = pd.date_range('2026-10-04', periods=3)
+    values = pd.DataFrame({'total_value': [100.0, 100.0, 200.0]}, index=index)
+
+    converted = cube.convert_series(values, 'USD', 'BRL')
+
+    assert converted['total_value'].tolist() == pytest.approx([500.0, 550.0, 1100.0])
+    assert cube.convert_series(values, 'BRL', 'BRL') is values
+    assert cube.convert_series(values, 'JPY', 'BRL') is None
+
+
+def test_service_caches_the_cube_until_invalidated(db, monkeypatch):
+    invalidate_fx_cube()
+    db.add(models.ExchangeRate(from_currency=models.Currency.USD, to_currency=models.Currency.BRL,
+                               date=date(2026, 10, 1), rate=5.0))
+    db.commit()
+    service = FXService(db)
+    assert service.cube().rate('USD', 'BRL') == 5.0
+
+    db.add(models.ExchangeRate(from_currency=models.Currency.USD, to_currency=models.Currency.BRL,
+                               date=date(2026, 10, 2), rate=5.2))
+    db.commit()
+    assert service.cube().rate('USD', 'BRL') == 5.0
+
+    # Other processes pick the new rate up once the TTL expires
+    monkeypatch.setattr(fx, '_CUBE_TTL_SECONDS', 0)
+    assert service.cube().rate('USD', 'BRL') == 5.2
+    invalidate_fx_cube()
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.http_clients import HttpClientRegistry
+
+
+class Upstream(BaseHTTPRequestHandler):
+    """Replies with the next scripted status; 200 bodies echo the path"""
+
+    protocol_version = "HTTP/1.1"
+    statuses = []
+    connections = set()
+
+    def do_GET(self):
+        Upstream.connections.add(self.client_address)
+        status = Upstream.statuses.pop(0) if Upstream.statuses else 200
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    Upstream.statuses = []
+    Upstream.connections = set()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def registry(base_url, max_retries=2):
+    return HttpClientRegistry(
+        upstreams={"test": {"base_url": base_url, "limit_per_host": 2}},
+        max_retries=max_retries, backoff_seconds=0.01
+    )
+
+
+def test_sync_retries_transient_errors(upstream):
+    clients = registry(upstream)
+    Upstream.statuses = [503, 429]
+
+    assert clients.get_json_sync("test", "/quote", params={"symbol": "PETR4"}) == {"path": "/quote?symbol=PETR4"}
+    stats = clients.stats()["test"]
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (1, 2, 0)
+
+
+def test_sync_client_errors_are_not_retried(upstream):
+    clients = registry(upstream)
+    Upstream.statuses = [404]
+
+    assert clients.get_json_sync("test", "/quote/XPTO9") is None
+    stats = clients.stats()["test"]
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (1, 0, 1)
+
+
+def test_sync_gives_up_after_max_retries(upstream):
+    clients = registry(upstream, max_retries=1)
+    Upstream.statuses = [500, 500, 500]
+
+    assert clients.get_json_sync("test", "/quote") is None
+    assert clients.stats()["test"]["retries"] == 1
+    assert Upstream.statuses == [500]
+
+
+def test_async_session_is_reused(upstream):
+    clients = registry(upstream)
+
+    async def main():
+        await clients.start()
+        session = clients.session("test")
+        results = [await clients.get_json("test", f"/quote/{i}") for i in range(5)]
+        same = clients.session("test") is session
+        await clients.close()
+        return results, same, session.closed
+
+    results, same, closed = asyncio.run(main())
+
+    assert results == [{"path": f"/quote/{i}"} for i in range(5)]
+    assert same and closed
+    # Keep-alive: sequential calls share one connection
+    assert len(Upstream.connections) == 1
+    assert clients.stats()["test"]["requests"] == 5
+
+
+def test_async_retries_and_counts_errors(upstream):
+    clients = registry(upstream, max_retries=1)
+    Upstream.statuses = [502, 200, 400]
+
+    async def main():
+        first = await clients.get_json("test", "/a")
+        second = await clients.get_json("test", "/b")
+        await clients.close()
+        return first, second
+
+    assert asyncio.run(main()) == ({"path": "/a"}, None)
+    stats = clients.stats()["test"]
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (2, 1, 1)
+
+
+def test_sessions_follow_the_running_loop(upstream):
+    # Celery tasks run each call in a new loop with asyncio.run
+    clients = registry(upstream)
+
+    assert asyncio.run(clients.get_json("test", "/a")) == {"path": "/a"}
+    assert asyncio.run(clients.get_json("test", "/b")) == {"path": "/b"}
+
+
+def test_unknown_upstream():
+    with pytest.raises(ValueError):
+        registry("http://127.0.0.1:1").get_json_sync("other", "/")
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pandas as pd
+
+from app import models
+from app.services.ingestion import ingest_prices
+
+
+def add_asset(db):
+    asset = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK, exchange='B3')
+    db.add(asset)
+    db.commit()
+    return asset
+
+
+def stored(db):
+    return db.query(models.Price.date, models.Price.close, models.Price.adjusted_close).order_by(models.Price.date).all()
+
+
+def test_new_rows_without_adjusted_close_take_the_close(db):
+    asset = add_asset(db)
+
+    ingest_prices(db, pd.DataFrame({'ticker': ['PETR4.SA'], 'date': [date(2026, 10, 15)], 'close': [38.2]}),
+                  {'PETR4.SA': asset.id})
+
+    assert stored(db) == [(date(2026, 10, 15), 38.2, 38.2)]
+
+
+def test_raw_close_does_not_overwrite_stored_adjusted_close(db):
+    asset = add_asset(db)
+    ingest_prices(db, pd.DataFrame({
+        'ticker': ['PETR4.SA'], 'date': [date(2026, 10, 15)], 'close': [38.2], 'adjusted_close': [35.9]
+    }), {'PETR4.SA': asset.id})
+
+    ingest_prices(db, pd.DataFrame({'ticker': ['PETR4.SA'], 'date': [date(2026, 10, 15)], 'close': [38.4]}),
+                  {'PETR4.SA': asset.id})
+
+    assert stored(db) == [(date(2026, 10, 15), 38.4, 35.9)]
+
+
+def test_provided_adjusted_close_replaces_the_stored_one(db):
+    asset = add_asset(db)
+    frame = pd.DataFrame({'ticker': ['PETR4.SA'], 'date': [date(2026, 10, 15)], 'close': [38.2], 'adjusted_close': [35.9]})
+    ingest_prices(db, frame, {'PETR4.SA': asset.id})
+
+    ingest_prices(db, frame.assign(adjusted_close=34.1), {'PETR4.SA': asset.id})
+
+    assert stored(db) == [(date(2026, 10, 15), 38.2, 34.1)]
+
+
+def test_unknown_tickers_and_missing_closes_are_skipped(db):
+    asset = add_asset(db)
+
+    written = ingest_prices(db, pd.DataFrame({
+        'ticker': ['PETR4.SA', 'PETR4.SA', 'OTHER'],
+        'date': [date(2026, 10, 14), date(2026, 10, 15), date(2026, 10, 15)],
+        'close': [None, 38.2, 10.0]
+    }), {'PETR4.SA': asset.id})
+
+    assert written == 1
+    assert stored(db) == [(date(2026, 10, 15), 38.2, 38.2)]
@@ -0,0 +1,102 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app import models
+from app.services.lots import AVERAGE, FIFO, LotBook, LotEngine
+from app.services.position_ledger import apply_trade, empty_state
+
+BUY = models.TransactionType.BUY
+SELL = models.TransactionType.SELL
+
+
+def test_fifo_consumes_the_oldest_lots_first():
+    book = LotBook(FIFO)
+    book.buy(10, 100.0, date(2026, 1, 2), transaction_id=1)
+    book.buy(10, 300.0, date(2026, 2, 2), transaction_id=2)
+
+    pnl = book.sell(15, 450.0, date(2026, 3, 2), transaction_id=3)
+
+    # 10 @ 10 + 5 @ 30 against proceeds of 30 each
+    assert pnl == pytest.approx(450.0 - 100.0 - 150.0)
+    assert [(lot['transaction_id'], lot['quantity'], lot['unit_cost']) for lot in book.open_lots()] == [(2, 5.0, 30.0)]
+    assert [(lot['transaction_id'], lot['quantity'], lot['holding_days']) for lot in book.realized] == [
+        (1, 10.0, 59), (2, 5.0, 28)
+    ]
+    assert book.realized_pnl == pytest.approx(pnl)
+
+
+def test_average_cost_matches_the_position_ledger():
+    trades = [(BUY, 10, 100.0), (BUY, 10, 300.0), (SELL, 5, 150.0), (BUY, 5, 100.0), (SELL, 12, 300.0)]
+    book = LotBook(AVERAGE)
+    state = empty_state()
+    for i, (kind, quantity, amount) in enumerate(trades):
+        on = date(2026, 1, 1 + i)
+        if kind == BUY:
+            book.buy(quantity, amount, on)
+        else:
+            book.sell(quantity, amount, on)
+        apply_trade(state, kind, quantity, amount)
+
+    assert book.realized_pnl == pytest.approx(state['realized_pnl'])
+    assert book.average_cost == pytest.approx(state['average_price'])
+    assert sum(lot['cost_basis'] for lot in book.open_lots()) == pytest.approx(state['total_invested'])
+
+
+def test_overselling_is_realized_with_no_cost_basis():
+    book = LotBook(FIFO)
+    book.buy(10, 100.0, date(2026, 1, 2), transaction_id=1)
+
+    pnl = book.sell(15, 300.0, date(2026, 1, 5), transaction_id=2)
+
+    # The 5 uncovered units bring 100 of proceeds and no cost
+    assert pnl == pytest.approx((200.0 - 100.0) + 100.0)
+    assert book.realized_pnl == pytest.approx(pnl)
+    uncovered = book.realized[-1]
+    assert (uncovered['transaction_id'], uncovered['quantity'], uncovered['cost_basis']) == (0, 5.0, 0.0)
+    assert len(book) == 0 and book.open_quantity == 0.0
+
+
+def test_book_grows_and_compacts():
+    book = LotBook(FIFO, capacity=2)
+    for i in range(50):
+        book.buy(1, 10.0 + i, date(2026, 1, 1), transaction_id=i + 1)
+        if i % 2:
+            book.sell(1, 100.0, date(2026, 1, 2))
+
+    assert len(book) == 25
+    # Sold lots are the 25 oldest
+    assert [lot['transaction_id'] for lot in book.open_lots()] == list(range(26, 51))
+    assert book.open_quantity == pytest.approx(25.0)
+    assert book.open_cost == pytest.approx(np.sum(10.0 + np.arange(25, 50)))
+
+
+def test_engine_replays_trades_per_asset(db):
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    petr = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    vale = models.Asset(symbol='VALE3', name='Vale', asset_type=models.AssetType.STOCK)
+    db.add_all([portfolio, petr, vale])
+    db.commit()
+    db.add_all([
+        models.Transaction(portfolio_id=portfolio.id, asset_id=petr.id, transaction_type=BUY,
+                           date=date(2026, 1, 2), quantity=10, total_amount=100.0),
+        models.Transaction(portfolio_id=portfolio.id, asset_id=vale.id, transaction_type=BUY,
+                           date=date(2026, 1, 3), quantity=4, total_amount=240.0),
+        models.Transaction(portfolio_id=portfolio.id, asset_id=petr.id, transaction_type=SELL,
+                           date=date(2026, 1, 4), quantity=4, total_amount=60.0),
+        models.Transaction(portfolio_id=portfolio.id, transaction_type=models.TransactionType.DEPOSIT,
+                           date=date(2026, 1, 1), total_amount=1000.0),
+    ])
+    db.commit()
+
+    books = LotEngine(db).build(portfolio.id)
+
+    assert set(books) == {petr.id, vale.id}
+    assert books[petr.id].open_quantity == pytest.approx(6.0)
+    assert books[petr.id].realized_pnl == pytest.approx(20.0)
+    assert books[vale.id].realized == []
+    assert set(LotEngine(db).build(portfolio.id, asset_ids=[vale.id])) == {vale.id}
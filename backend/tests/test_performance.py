@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.performance import TRADING_DAYS, compute_horizon_metrics, daily_returns, rolling_metrics
+
+
+def returns_series(days=600, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2024-01-01', periods=days)
+    values = rng.normal(0.0005, 0.01, days)
+    values[0] = 0.0
+    return pd.Series(values, index=index)
+
+
+def direct_metrics(window, risk_free_rate):
+    n = len(window)
+    mean = window.mean()
+    volatility = window.std(ddof=1) * np.sqrt(TRADING_DAYS)
+    return {
+        'return': (np.prod(1 + window) - 1) * 100,
+        'volatility': volatility * 100,
+        'sharpe_ratio': (mean * TRADING_DAYS - risk_free_rate) / volatility,
+        'years': n / TRADING_DAYS
+    }
+
+
+def test_daily_returns_treat_trades_as_flows():
+    index = pd.date_range('2026-10-05', periods=4)
+    series = pd.DataFrame({
+        # Buy 1000 on day 2, market moves +10%, sell 550 on day 4
+        'market_value': [0.0, 1000.0, 1100.0, 605.0],
+        'invested': [0.0, 1000.0, 1000.0, 500.0],
+        'cash': [1000.0, 0.0, 0.0, 550.0],
+        'net_flow': [1000.0, 0.0, 0.0, 0.0],
+        'total_value': [1000.0, 1000.0, 1100.0, 1155.0],
+    }, index=index)
+
+    returns = daily_returns(series)
+
+    assert returns.tolist() == pytest.approx([0.0, 0.0, 0.1, 0.05])
+
+
+def test_daily_returns_skip_weekends():
+    index = pd.date_range('2026-10-09', periods=4)  # Fri..Mon
+    series = pd.DataFrame({
+        'market_value': [100.0, 100.0, 100.0, 110.0],
+        'invested': [100.0] * 4,
+        'cash': [0.0] * 4,
+        'net_flow': [0.0] * 4,
+        'total_value': [100.0, 100.0, 100.0, 110.0],
+    }, index=index)
+
+    returns = daily_returns(series)
+
+    assert list(returns.index) == [index[0], index[3]]
+    assert returns.tolist() == pytest.approx([0.0, 0.1])
+
+
+def test_horizon_metrics_match_a_direct_computation():
+    returns = returns_series()
+
+    metrics = compute_horizon_metrics(returns, ['1m', '1y', 'inception'], risk_free_rate=0.1)
+
+    for horizon, offset in [('1m', pd.DateOffset(months=1)), ('1y', pd.DateOffset(years=1))]:
+        window = returns[returns.index > returns.index[-1] - offset]
+        expected = direct_metrics(window.to_numpy(), 0.1)
+        result = metrics[horizon]
+        assert result['return'] == pytest.approx(expected['return'])
+        assert result['volatility'] == pytest.approx(expected['volatility'])
+        assert result['sharpe_ratio'] == pytest.approx(expected['sharpe_ratio'])
+
+    inception = direct_metrics(returns.to_numpy()[1:], 0.1)
+    assert metrics['inception']['start_date'] == returns.index[0].date()
+    assert metrics['inception']['return'] == pytest.approx(inception['return'])
+    assert metrics['inception']['annualized_return'] == pytest.approx(
+        ((1 + inception['return'] / 100) ** (1 / inception['years']) - 1) * 100
+    )
+    # Under a year there is no annualized return
+    assert metrics['1m']['annualized_return'] is None
+
+
+def test_horizons_longer_than_the_series_are_empty():
+    metrics = compute_horizon_metrics(returns_series(days=100), ['3y', 'ytd'])
+
+    assert metrics['3y'] is None
+    assert metrics['ytd'] is not None
+    assert compute_horizon_metrics(returns_series(days=1), ['1m']) == {'1m': None}
+
+
+def test_rolling_metrics_match_pandas_rolling():
+    returns = returns_series(days=200)
+
+    points = rolling_metrics(returns, window=21, risk_free_rate=0.0, max_points=1000)
+
+    values = returns.iloc[1:]
+    expected = (values.rolling(21).std() * np.sqrt(TRADING_DAYS) * 100).dropna()
+    assert [point['date'] for point in points] == [day.date().isoformat() for day in expected.index]
+    assert [point['volatility'] for point in points] == pytest.approx(expected.round(4).tolist(), abs=1e-4)
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import models
+from app.services import position_ledger
+from app.services.position_ledger import PositionLedger, apply_trade, earliest_dates, empty_state
+
+BUY = models.TransactionType.BUY
+SELL = models.TransactionType.SELL
+
+
+@pytest.fixture
+def holding(db, monkeypatch):
+    monkeypatch.setattr(position_ledger, 'CHECKPOINT_INTERVAL', 3)
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    asset = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    db.add_all([portfolio, asset])
+    db.commit()
+    return portfolio.id, asset.id
+
+
+def add_trades(db, portfolio_id, asset_id, trades, start=date(2026, 10, 1)):
+    rows = [
+        models.Transaction(portfolio_id=portfolio_id, asset_id=asset_id, transaction_type=kind,
+                           date=start + timedelta(days=i), quantity=quantity, total_amount=amount)
+        for i, (kind, quantity, amount) in enumerate(trades)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def replay(trades):
+    state = empty_state()
+    for kind, quantity, amount in trades:
+        apply_trade(state, kind, quantity, amount)
+    return state
+
+
+def position_state(position):
+    return {field: getattr(position, field) for field in position_ledger.POSITION_FIELDS}
+
+
+TRADES = [(BUY, 10, 100.0), (BUY, 10, 300.0), (SELL, 5, 150.0), (BUY, 5, 100.0), (SELL, 10, 250.0), (BUY, 2, 50.0)]
+
+
+def test_apply_trade_moving_average():
+    state = replay(TRADES[:3])
+
+    assert state == {'quantity': 15, 'average_price': 20.0, 'total_invested': 300.0, 'realized_pnl': 50.0}
+
+
+def test_rebuild_stores_checkpoints_every_interval(db, holding):
+    portfolio_id, asset_id = holding
+    add_trades(db, portfolio_id, asset_id, TRADES)
+
+    position = PositionLedger(db).rebuild_position(portfolio_id, asset_id)
+
+    assert position_state(position) == pytest.approx(replay(TRADES))
+    checkpoints = db.query(models.PositionCheckpoint).order_by(models.PositionCheckpoint.event_count).all()
+    assert [checkpoint.event_count for checkpoint in checkpoints] == [3, 6]
+    assert checkpoints[0].quantity == 15
+
+
+def test_back_dated_edit_replays_from_the_previous_checkpoint(db, holding):
+    portfolio_id, asset_id = holding
+    rows = add_trades(db, portfolio_id, asset_id, TRADES)
+    ledger = PositionLedger(db)
+    ledger.rebuild_position(portfolio_id, asset_id)
+
+    # Edit the 5th trade: the checkpoint at event 6 is dropped, the one at 3 is kept
+    rows[4].total_amount = 400.0
+    db.commit()
+    position = ledger.rebuild_position(portfolio_id, asset_id, from_date=rows[4].date)
+
+    edited = TRADES[:4] + [(SELL, 10, 400.0)] + TRADES[5:]
+    assert position_state(position) == pytest.approx(replay(edited))
+    checkpoints = db.query(models.PositionCheckpoint).order_by(models.PositionCheckpoint.event_count).all()
+    assert [checkpoint.event_count for checkpoint in checkpoints] == [3, 6]
+    assert checkpoints[1].realized_pnl == pytest.approx(replay(edited)['realized_pnl'])
+
+
+def test_resuming_from_a_checkpoint_matches_a_full_replay(db, holding):
+    portfolio_id, asset_id = holding
+    add_trades(db, portfolio_id, asset_id, TRADES)
+    ledger = PositionLedger(db)
+    ledger.rebuild_position(portfolio_id, asset_id)
+
+    resumed = position_state(ledger.rebuild_position(portfolio_id, asset_id, from_date=date(2026, 10, 6)))
+    full = position_state(ledger.rebuild_position(portfolio_id, asset_id))
+
+    assert resumed == pytest.approx(full)
+
+
+def test_earliest_dates():
+    events = [(1, date(2026, 10, 5)), (2, date(2026, 10, 3)), (1, date(2026, 10, 2)), (None, date(2026, 1, 1))]
+
+    assert earliest_dates(events) == {1: date(2026, 10, 2), 2: date(2026, 10, 3)}
@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import position_refresher
+
+
+@pytest.mark.parametrize('backend, full', [('off', False), ('celery', False), ('asyncio', True)])
+def test_full_pass_runs_in_process_only_with_the_asyncio_backend(monkeypatch, backend, full):
+    monkeypatch.setattr(settings, 'PRICE_SCHEDULER_BACKEND', backend)
+    calls = []
+    monkeypatch.setattr(position_refresher, '_flush', lambda full_pass: calls.append(full_pass) or 0)
+
+    async def first_tick():
+        task = asyncio.ensure_future(position_refresher.run_refresh_loop())
+        while not calls:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(first_tick(), timeout=5))
+
+    assert calls == [full]
@@ -0,0 +1,109 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app import models
+from app.config import settings
+from app.services.market_data import MarketDataService
+from app.services.providers import FixturePriceProvider, YahooPriceProvider, get_price_provider
+
+FIXTURE = pd.DataFrame([
+    {'ticker': 'PETR4.SA', 'date': '2026-10-14', 'open': 37.0, 'high': 38.0, 'low': 36.5, 'close': 37.5, 'volume': 1000},
+    {'ticker': 'PETR4.SA', 'date': '2026-10-15', 'open': 37.5, 'high': 38.5, 'low': 37.0, 'close': 38.2, 'volume': 1200},
+    {'ticker': 'VALE3.SA', 'date': '2026-10-15', 'open': 60.0, 'high': 61.0, 'low': 59.0, 'close': 60.4, 'volume': 800},
+    {'ticker': 'AAPL', 'date': '2026-10-15', 'open': 230.0, 'high': 232.0, 'low': 229.0, 'close': 231.0, 'volume': 500},
+])
+
+
+@pytest.fixture
+def assets(db):
+    assets = [
+        models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK, exchange='B3'),
+        models.Asset(symbol='VALE3', name='Vale', asset_type=models.AssetType.STOCK, exchange='B3'),
+        models.Asset(symbol='AAPL', name='Apple', asset_type=models.AssetType.STOCK, exchange='NASDAQ',
+                     currency=models.Currency.USD),
+        # Not in the fixture: the provider returns no quote for it
+        models.Asset(symbol='NOQT3', name='No quote', asset_type=models.AssetType.STOCK, exchange='B3'),
+    ]
+    db.add_all(assets)
+    db.commit()
+    return {asset.symbol: asset for asset in assets}
+
+
+def stored_closes(db):
+    rows = db.query(models.Asset.symbol, models.Price.close).join(models.Price).all()
+    return dict(rows)
+
+
+def test_bulk_update_prices_from_fixture(db, assets):
+    result = MarketDataService(db).bulk_update_prices(list(assets.values()), FixturePriceProvider(FIXTURE))
+
+    assert result == {"updated": 3, "failed": 1}
+    assert stored_closes(db) == {'PETR4': 38.2, 'VALE3': 60.4, 'AAPL': 231.0}
+
+
+def test_ticker_without_quote_is_not_marked_fetched(db, assets):
+    MarketDataService(db).bulk_update_prices(list(assets.values()), FixturePriceProvider(FIXTURE))
+    db.expire_all()
+
+    assert assets['PETR4'].last_fetched_at is not None
+    assert assets['NOQT3'].last_fetched_at is None
+    assert db.query(models.Price).filter(models.Price.asset_id == assets['NOQT3'].id).count() == 0
+
+
+def test_bulk_update_prices_is_idempotent(db, assets):
+    service = MarketDataService(db)
+    provider = FixturePriceProvider(FIXTURE)
+
+    service.bulk_update_prices(list(assets.values()), provider)
+    again = service.bulk_update_prices(list(assets.values()), provider)
+
+    assert again == {"updated": 3, "failed": 1}
+    assert db.query(models.Price).count() == 3
+
+
+def test_bulk_update_prices_without_assets(db):
+    assert MarketDataService(db).bulk_update_prices([], FixturePriceProvider(FIXTURE)) == {"updated": 0, "failed": 0}
+
+
+def test_fixture_periods_count_back_from_last_date():
+    provider = FixturePriceProvider(FIXTURE)
+
+    history = provider.history(['PETR4.SA'], period='1d')
+
+    assert history['date'].tolist() == [date(2026, 10, 15)]
+
+
+def test_provider_selected_from_settings(db, assets, tmp_path, monkeypatch):
+    path = tmp_path / 'prices.csv'
+    FIXTURE.to_csv(path, index=False)
+    monkeypatch.setattr(settings, 'PRICE_PROVIDER', 'fixture')
+    monkeypatch.setattr(settings, 'PRICE_FIXTURE_PATH', str(path))
+
+    assert isinstance(get_price_provider(), FixturePriceProvider)
+    result = MarketDataService(db).bulk_update_prices(list(assets.values()))
+    assert result == {"updated": 3, "failed": 1}
+
+
+def test_default_provider_is_yahoo(monkeypatch):
+    monkeypatch.setattr(settings, 'PRICE_PROVIDER', 'yahoo')
+
+    assert isinstance(get_price_provider(), YahooPriceProvider)
+
+
+def test_fixture_provider_requires_a_path(monkeypatch):
+    monkeypatch.setattr(settings, 'PRICE_PROVIDER', 'fixture')
+    monkeypatch.setattr(settings, 'PRICE_FIXTURE_PATH', None)
+
+    with pytest.raises(ValueError):
+        get_price_provider()
+
+
+def test_quotes_are_stored_under_their_bar_date(db, assets):
+    MarketDataService(db).bulk_update_prices(list(assets.values()), FixturePriceProvider(FIXTURE))
+
+    dates = {row.date for row in db.query(models.Price.date).all()}
+
+    # The fixture's last session, not the day the refresh ran
+    assert dates == {date(2026, 10, 15)}
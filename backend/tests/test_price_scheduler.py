@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from app import models
+from app.services import price_scheduler
+from app.services.market_data import MarketDataService
+from app.services.price_scheduler import stale_assets, stale_before
+from app.services.providers import FixturePriceProvider
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("now, expected", [
+    # Friday 2026-10-16, B3 session 13:00-20:30 UTC: intraday quotes expire after PRICE_STALE_SECONDS
+    (utc(2026, 10, 16, 15), utc(2026, 10, 16, 14, 45)),
+    # After the close (plus the quote delay) only the closing quote is needed
+    (utc(2026, 10, 16, 21), utc(2026, 10, 16, 20, 50)),
+    # Weekend and Monday before the open still point at Friday's close
+    (utc(2026, 10, 18, 12), utc(2026, 10, 16, 20, 50)),
+    (utc(2026, 10, 19, 12), utc(2026, 10, 16, 20, 50)),
+])
+def test_stale_before_follows_b3_hours(now, expected):
+    assert stale_before('B3', now) == expected
+
+
+def test_crypto_is_always_open():
+    now = utc(2026, 10, 18, 12)
+    assert stale_before('24x7', now) == now - timedelta(minutes=15)
+
+
+@pytest.fixture
+def held(db):
+    user = models.User(email='a@b.c', username='a', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='p', owner_id=user.id)
+    assets = [
+        models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK, exchange='B3'),
+        models.Asset(symbol='NOQT3', name='No quote', asset_type=models.AssetType.STOCK, exchange='B3'),
+        models.Asset(symbol='TD2035', name='Tesouro', asset_type=models.AssetType.BOND),
+    ]
+    db.add_all([portfolio] + assets)
+    db.commit()
+    db.add_all([
+        models.Position(portfolio_id=portfolio.id, asset_id=asset.id, quantity=10, average_price=1, total_invested=10)
+        for asset in assets
+    ])
+    db.commit()
+    return {asset.symbol: asset for asset in assets}
+
+
+def test_only_held_quotable_assets_are_stale(db, held):
+    assert stale_assets(db) == sorted([held['PETR4'].id, held['NOQT3'].id])
+
+
+def test_ticker_without_quote_backs_off(db, held):
+    provider = FixturePriceProvider(pd.DataFrame([{'ticker': 'PETR4.SA', 'date': '2026-10-15', 'close': 38.2}]))
+    MarketDataService(db).bulk_update_prices([held['PETR4'], held['NOQT3']], provider)
+    db.expire_all()
+    attempted = held['NOQT3'].last_attempted_at.replace(tzinfo=timezone.utc)
+
+    # Retried neither on the next tick nor before PRICE_RETRY_SECONDS
+    assert held['NOQT3'].id not in stale_assets(db, now=attempted + timedelta(minutes=1))
+    assert held['NOQT3'].id in stale_assets(db, now=attempted + timedelta(hours=2))
+
+
+def test_one_off_benchmark_sync_never_raises(monkeypatch):
+    calls = []
+
+    def failing_sync():
+        calls.append(1)
+        raise ConnectionError('upstream down')
+
+    monkeypatch.setattr(price_scheduler, 'sync_benchmarks', failing_sync)
+
+    asyncio.run(price_scheduler.sync_benchmarks_once())
+
+    assert calls == [1]
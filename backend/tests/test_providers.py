@@ -0,0 +1,131 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app import models
+from app.config import settings
+from app.services.market_data import MarketDataService
+from app.services.providers import (
+    AlphaVantagePriceProvider, FixturePriceProvider, YahooPriceProvider, create_price_provider, get_price_provider
+)
+from app.services.quote_cache import quote_cache
+
+FIXTURE = pd.DataFrame([
+    {'ticker': 'PETR4.SA', 'name': 'Petrobras PN', 'date': '2026-10-15', 'close': 38.2},
+    {'ticker': 'PETR3.SA', 'name': 'Petrobras ON', 'date': '2026-10-15', 'close': 41.0},
+    {'ticker': 'USDBRL=X', 'date': '2026-10-14', 'close': 5.41},
+    {'ticker': 'USDBRL=X', 'date': '2026-10-15', 'close': 5.44},
+])
+
+
+class FakeClient:
+    """Answers Alpha Vantage requests by function, recording their params"""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    def get_json_sync(self, upstream, path, params=None, timeout=None):
+        self.calls.append(params)
+        return self.payloads.get(params['function'], {})
+
+
+DAILY = {
+    'Time Series (Daily)': {
+        '2026-10-15': {'1. open': '37.5', '2. high': '38.5', '3. low': '37.0', '4. close': '38.2', '5. volume': '1200'},
+        '2026-10-14': {'1. open': '37.0', '2. high': '38.0', '3. low': '36.5', '4. close': '37.5', '5. volume': '1000'},
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_quote_cache():
+    quote_cache.invalidate()
+    yield
+    quote_cache.invalidate()
+
+
+def test_alpha_vantage_daily_bars():
+    client = FakeClient({'TIME_SERIES_DAILY': DAILY})
+    provider = AlphaVantagePriceProvider(api_key='KEY', client=client)
+
+    bars = provider.history_range(['PETR4.SA'], date(2026, 10, 15), date(2026, 10, 16))
+
+    assert bars[['ticker', 'date', 'close']].values.tolist() == [['PETR4.SA', date(2026, 10, 15), 38.2]]
+    assert client.calls[0]['symbol'] == 'PETR4.SAO'
+    assert client.calls[0]['apikey'] == 'KEY'
+
+
+def test_alpha_vantage_throttle_message_is_no_data():
+    client = FakeClient({'GLOBAL_QUOTE': {'Note': 'Thank you for using Alpha Vantage! Our standard API rate limit is...'}})
+
+    assert AlphaVantagePriceProvider(client=client).latest_quotes(['AAPL']).empty
+
+
+def test_alpha_vantage_quote_fx_and_search():
+    client = FakeClient({
+        'GLOBAL_QUOTE': {'Global Quote': {'05. price': '231.00', '07. latest trading day': '2026-10-15'}},
+        'CURRENCY_EXCHANGE_RATE': {'Realtime Currency Exchange Rate': {
+            '5. Exchange Rate': '5.4400', '6. Last Refreshed': '2026-10-15 21:00:00'
+        }},
+        'SYMBOL_SEARCH': {'bestMatches': [
+            {'1. symbol': 'PETR4.SAO', '2. name': 'Petrobras PN', '3. type': 'Equity', '8. currency': 'BRL'}
+        ]},
+    })
+    provider = AlphaVantagePriceProvider(client=client)
+
+    quotes = provider.latest_quotes(['AAPL'])
+    assert quotes[['ticker', 'date', 'close']].values.tolist() == [['AAPL', date(2026, 10, 15), 231.0]]
+    assert provider.latest_fx_rate('USD', 'BRL') == (date(2026, 10, 15), 5.44)
+    assert provider.search('petr') == [{
+        'symbol': 'PETR4.SA', 'name': 'Petrobras PN', 'exchange': 'B3', 'sector': None,
+        'asset_type': 'STOCK', 'currency': 'BRL', 'industry': None
+    }]
+
+
+def test_fixture_fx_and_search():
+    provider = FixturePriceProvider(FIXTURE)
+
+    rates = provider.fx_rates('USD', 'BRL', date(2026, 10, 1), date(2026, 10, 16))
+    assert rates.to_dict() == {date(2026, 10, 14): 5.41, date(2026, 10, 15): 5.44}
+    assert provider.latest_fx_rate('USD', 'BRL') == (date(2026, 10, 15), 5.44)
+    assert provider.latest_fx_rate('EUR', 'BRL') is None
+    assert [result['symbol'] for result in provider.search('petr')] == ['PETR3.SA', 'PETR4.SA']
+    assert provider.search('usd') == []
+
+
+def test_create_price_provider():
+    assert isinstance(create_price_provider('yahoo'), YahooPriceProvider)
+    assert isinstance(create_price_provider('AlphaVantage'), AlphaVantagePriceProvider)
+    with pytest.raises(ValueError):
+        create_price_provider('fixture')
+    with pytest.raises(ValueError):
+        create_price_provider('bloomberg')
+
+
+def test_price_provider_from_settings(monkeypatch, tmp_path):
+    path = tmp_path / 'prices.csv'
+    FIXTURE.to_csv(path, index=False)
+    monkeypatch.setattr(settings, 'PRICE_FIXTURE_PATH', str(path))
+
+    monkeypatch.setattr(settings, 'PRICE_PROVIDER', 'fixture')
+    assert isinstance(get_price_provider(), FixturePriceProvider)
+    monkeypatch.setattr(settings, 'PRICE_PROVIDER', 'alphavantage')
+    assert isinstance(get_price_provider(), AlphaVantagePriceProvider)
+    monkeypatch.setattr(settings, 'PRICE_PROVIDER', 'unknown')
+    assert isinstance(get_price_provider(), YahooPriceProvider)
+
+
+def test_market_data_service_uses_the_provider(db):
+    asset = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK, exchange='B3')
+    db.add(asset)
+    db.commit()
+    service = MarketDataService(db, provider=FixturePriceProvider(FIXTURE))
+
+    assert service.update_asset_price(asset) == 38.2
+    assert service.get_exchange_rate('USD', 'BRL') == 5.44
+
+    price = db.query(models.Price).filter(models.Price.asset_id == asset.id).one()
+    rate = db.query(models.ExchangeRate).one()
+    assert (price.date, rate.date) == (date(2026, 10, 15), date(2026, 10, 15))
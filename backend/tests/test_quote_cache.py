@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.quote_cache import QuoteCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """In-memory stand-in for the two redis-py calls the cache makes"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = QuoteCache(ttl_seconds=60, clock=clock)
+    cache.put('PETR4', 38.2)
+
+    clock.now = 59
+    assert cache.get('PETR4') == 38.2
+    clock.now = 60
+    assert cache.get('PETR4') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QuoteCache(max_entries=2)
+    cache.put('PETR4', 1)
+    cache.put('VALE3', 2)
+    cache.get('PETR4')
+    cache.put('ITUB4', 3)
+
+    assert cache.get('VALE3') is None
+    assert cache.get('PETR4') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_concurrent_threads_share_one_load():
+    cache = QuoteCache()
+    calls = []
+    started = threading.Event()
+
+    def load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return 38.2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_load('PETR4', load)))
+    leader.start()
+    started.wait()
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_load('PETR4', load))) for _ in range(9)]
+    for thread in waiters:
+        thread.start()
+    for thread in [leader] + waiters:
+        thread.join()
+
+    assert results == [38.2] * 10
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['loads'] == 1
+    assert stats['misses'] == stats['loads'] + stats['coalesced']
+
+
+def test_concurrent_tasks_share_one_load():
+    cache = QuoteCache()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'price': 38.2}
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_load_async('PETR4', load) for _ in range(20)])
+
+    results = asyncio.run(main())
+
+    assert results == [{'price': 38.2}] * 20
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 19
+    assert cache.get('PETR4') == {'price': 38.2}
+
+
+def test_failed_loads_are_not_cached():
+    cache = QuoteCache()
+
+    def fail():
+        raise ConnectionError('upstream down')
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_load('PETR4', fail)
+    assert cache.get_or_load('PETR4', lambda: None) is None
+    assert cache.get_or_load('PETR4', lambda: 38.2) == 38.2
+    assert cache.stats()['errors'] == 1
+
+
+def test_redis_shares_entries_between_processes():
+    redis = FakeRedis()
+    first = QuoteCache(redis_client=redis)
+    second = QuoteCache(redis_client=redis)
+
+    first.get_or_load('PETR4', lambda: 38.2)
+
+    assert second.get_or_load('PETR4', lambda: pytest.fail('loaded twice')) == 38.2
+    assert second.stats()['redis_hits'] == 1
+    assert second.stats()['backend'] == 'redis'
+
+
+def test_redis_errors_fall_back_to_local_cache():
+    class DownRedis:
+        def get(self, key):
+            raise ConnectionError('refused')
+
+        def setex(self, key, ttl, value):
+            raise ConnectionError('refused')
+
+    cache = QuoteCache(redis_client=DownRedis())
+
+    assert cache.get_or_load('PETR4', lambda: 38.2) == 38.2
+    assert cache.get('PETR4') == 38.2
+    assert cache.stats()['redis_errors'] == 1
+
+
+def test_cancelled_first_caller_does_not_cancel_the_shared_load():
+    cache = QuoteCache()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'price': 38.2}
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_load_async('PETR4', load))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(cache.get_or_load_async('PETR4', load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == {'price': 38.2}
+    assert len(calls) == 1
+    assert cache.get('PETR4') == {'price': 38.2}
+
+
+def test_async_path_keeps_redis_off_the_event_loop():
+    class ThreadRecordingRedis(FakeRedis):
+        def __init__(self):
+            super().__init__()
+            self.threads = set()
+
+        def get(self, key):
+            self.threads.add(threading.get_ident())
+            return super().get(key)
+
+        def setex(self, key, ttl, value):
+            self.threads.add(threading.get_ident())
+            super().setex(key, ttl, value)
+
+    redis = ThreadRecordingRedis()
+    cache = QuoteCache(redis_client=redis)
+
+    async def load():
+        return 38.2
+
+    async def main():
+        loop_thread = threading.get_ident()
+        value = await cache.get_or_load_async('PETR4', load)
+        return loop_thread, value
+
+    loop_thread, value = asyncio.run(main())
+
+    assert value == 38.2
+    assert redis.data
+    assert redis.threads and loop_thread not in redis.threads
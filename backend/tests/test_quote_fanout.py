@@ -0,0 +1,159 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+
+from app import models
+from app.services import market_data_real
+from app.services.http_clients import HttpClientRegistry, TokenBucket
+from app.services.market_data_real import RealMarketDataService
+from app.services.quote_cache import quote_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAlphaVantage:
+    """GLOBAL_QUOTE answers after latency seconds (per symbol in latencies; hang: never within a test),
+    under a token bucket"""
+
+    def __init__(self, latency=0.05, hang=(), per_second=1000.0, latencies=None):
+        self.latency = latency
+        self.hang = set(hang)
+        self.latencies = dict(latencies or {})
+        self.bucket = TokenBucket(per_second, per_second)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_json(self, upstream, path, params=None, timeout=None):
+        await self.bucket.acquire()
+        symbol = params['symbol']
+        self.calls.append(symbol)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(60 if symbol in self.hang else self.latencies.get(symbol, self.latency))
+        finally:
+            self.in_flight -= 1
+        return {'Global Quote': {'05. price': '10.0', '07. latest trading day': '2026-10-16'}}
+
+
+@pytest.fixture
+def alpha(monkeypatch):
+    quote_cache.invalidate()
+    fake = FakeAlphaVantage()
+    monkeypatch.setattr(market_data_real, 'http_clients', fake)
+    yield fake
+    quote_cache.invalidate()
+
+
+def test_token_bucket_bursts_then_spaces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=3, clock=clock)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0, 0.0, 0.0, 0.5, 1.0]
+    clock.now = 1.0
+    # Two tokens refilled, both already promised to the queued callers
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_token_bucket_refund_on_cancel():
+    bucket = TokenBucket(rate=1.0, capacity=1)
+    bucket.reserve()
+
+    async def main():
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_limiter_is_sized_to_the_quota():
+    clients = HttpClientRegistry(upstreams={
+        "limited": {"base_url": "http://127.0.0.1", "limit_per_host": 1, "requests_per_minute": 30},
+        "free": {"base_url": "http://127.0.0.1", "limit_per_host": 1, "requests_per_minute": None},
+    })
+
+    limiter = clients.limiter("limited")
+    assert (limiter.rate, limiter.capacity) == (0.5, 30)
+    assert clients.limiter("limited") is limiter
+    assert clients.limiter("free") is None
+
+
+def test_quotes_for_every_symbol_run_concurrently(db, alpha):
+    symbols = [f"SYM{i}" for i in range(100)]
+
+    started = time.perf_counter()
+    quotes = asyncio.run(RealMarketDataService(db).get_real_time_quotes(symbols))
+
+    assert list(quotes) == symbols
+    assert all(quote['stale'] is False and quote['price'] == 10.0 for quote in quotes.values())
+    assert alpha.max_in_flight > 1
+    # Serial calls would take 100 * 50ms
+    assert time.perf_counter() - started < 2.5
+
+
+def test_fresh_quotes_come_from_the_cache(db, alpha):
+    service = RealMarketDataService(db)
+    asyncio.run(service.get_real_time_quotes(['PETR4', 'VALE3']))
+
+    quotes = asyncio.run(service.get_real_time_quotes(['PETR4', 'VALE3', 'PETR4']))
+
+    assert list(quotes) == ['PETR4', 'VALE3']
+    assert sorted(alpha.calls) == ['PETR4.SA', 'VALE3.SA']
+
+
+def test_deadline_returns_partial_results_marked_stale(db, alpha):
+    alpha.hang = {'VALE3.SA', 'ITUB4.SA', 'WEGE3.SA'}
+    quote_cache.put('alpha:quote:last:VALE3', {'symbol': 'VALE3', 'price': 61.0, 'latest_trading_day': '2026-10-15'})
+    asset = models.Asset(symbol='ITUB4.SA', name='Itaú', asset_type=models.AssetType.STOCK, exchange='B3')
+    db.add(asset)
+    db.commit()
+    db.add_all([
+        models.Price(asset_id=asset.id, date=date(2026, 10, 14), close=35.0),
+        models.Price(asset_id=asset.id, date=date(2026, 10, 15), close=36.0),
+    ])
+    db.commit()
+
+    started = time.perf_counter()
+    quotes = asyncio.run(RealMarketDataService(db).get_real_time_quotes(
+        ['PETR4', 'VALE3', 'ITUB4', 'WEGE3'], deadline=0.3
+    ))
+
+    assert time.perf_counter() - started < 2
+    assert quotes['PETR4']['stale'] is False
+    assert (quotes['VALE3']['price'], quotes['VALE3']['stale']) == (61.0, True)
+    assert quotes['ITUB4'] == {'symbol': 'ITUB4', 'price': 36.0, 'latest_trading_day': '2026-10-15', 'stale': True}
+    # Never quoted and nothing stored
+    assert 'WEGE3' not in quotes
+
+
+def test_deadline_of_one_fanout_does_not_cancel_a_shared_load(db, alpha):
+    alpha.latencies = {'SLOW.SA': 0.5}
+    service = RealMarketDataService(db)
+
+    async def main():
+        return await asyncio.gather(
+            service.get_real_time_quotes(['SLOW'], deadline=0.1),
+            service.get_real_time_quotes(['SLOW', 'FAST'], deadline=2),
+        )
+
+    short, long = asyncio.run(main())
+
+    # Nothing stored for SLOW when the short deadline fires
+    assert short == {}
+    assert list(long) == ['SLOW', 'FAST']
+    assert all(quote['stale'] is False for quote in long.values())
+    # Both fan-outs shared a single upstream call
+    assert alpha.calls.count('SLOW.SA') == 1
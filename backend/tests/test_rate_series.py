@@ -0,0 +1,105 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import models
+from app.services.benchmark_analytics import BenchmarkAnalytics, invalidate_benchmark_cache
+from app.services.rate_series import RateSeriesService, daily_factors, read_bcb_csv
+
+DAYS = pd.bdate_range('2026-09-01', '2026-10-16').date
+
+
+def cdi(days=DAYS, rate=10.65):
+    return pd.Series(rate, index=list(days))
+
+
+def stored_cumulative(db, symbol='CDI'):
+    rows = db.query(models.Benchmark.date, models.Benchmark.cumulative_index).filter(
+        models.Benchmark.symbol == symbol
+    ).order_by(models.Benchmark.date).all()
+    return pd.Series([row[1] for row in rows], index=[row[0] for row in rows])
+
+
+def test_read_bcb_csv(tmp_path):
+    path = tmp_path / 'CDI.csv'
+    path.write_text('"data";"valor"\n"02/10/2026";"10,65"\n"01/10/2026";"10,40"\n', encoding='utf-8')
+
+    series = read_bcb_csv(str(path))
+
+    assert series.index.tolist() == [date(2026, 10, 1), date(2026, 10, 2)]
+    assert series.tolist() == [10.40, 10.65]
+
+
+def test_annual_rate_compounds_over_252_business_days():
+    factors = daily_factors(pd.Series(10.0, index=range(252)), 'annual')
+
+    assert factors.prod() == pytest.approx(1.10)
+
+
+def test_monthly_change_is_spread_over_the_month():
+    factors = daily_factors(pd.Series([0.5, 0.3], index=[date(2026, 8, 1), date(2026, 9, 1)]), 'monthly')
+    months = pd.PeriodIndex(pd.to_datetime(factors.index), freq='M')
+
+    assert factors.groupby(months).prod().tolist() == pytest.approx([1.005, 1.003])
+    assert len(factors) == len(pd.bdate_range('2026-08-01', '2026-09-30'))
+
+
+def test_factor_between_two_dates(db):
+    service = RateSeriesService(db)
+    service.ingest('CDI', cdi())
+
+    daily = (1 + 0.1065) ** (1 / 252)
+    # Close of 2026-09-30 to close of 2026-10-16: 12 business days accrue
+    assert service.factor_between('CDI', date(2026, 9, 30), date(2026, 10, 16)) == pytest.approx(daily ** 12)
+    # Weekends resolve to the previous business day
+    assert service.factor_between('CDI', date(2026, 10, 3), date(2026, 10, 4)) == pytest.approx(1.0)
+    assert service.factor_between('CDI', date(2026, 8, 1), date(2026, 10, 16)) is None
+
+
+def test_incremental_ingest_matches_a_full_load(db):
+    service = RateSeriesService(db)
+    service.ingest('CDI', cdi(DAYS[:10]))
+    service.ingest('CDI', cdi(DAYS[10:]))
+    incremental = stored_cumulative(db)
+
+    service.ingest('CDI', cdi())
+
+    assert np.allclose(incremental.to_numpy(), stored_cumulative(db).to_numpy())
+
+
+def test_revised_rate_rebuilds_later_cumulative_index(db):
+    service = RateSeriesService(db)
+    service.ingest('CDI', cdi())
+    before = stored_cumulative(db)
+
+    service.ingest('CDI', pd.Series([20.0], index=[DAYS[5]]))
+    after = stored_cumulative(db)
+
+    change = (1.20 / 1.1065) ** (1 / 252)
+    assert np.allclose(after.iloc[:5], before.iloc[:5])
+    assert np.allclose(after.iloc[5:] / before.iloc[5:], change)
+
+
+def test_benchmark_returns_use_the_cumulative_index(db):
+    invalidate_benchmark_cache()
+    RateSeriesService(db).ingest('CDI', cdi())
+
+    returns = BenchmarkAnalytics(db).benchmark_returns('CDI', date(2026, 10, 1), date(2026, 10, 16))
+
+    assert returns.iloc[1:].to_numpy() == pytest.approx((1 + 0.1065) ** (1 / 252) - 1)
+    invalidate_benchmark_cache()
+
+
+def test_sync_from_files_reads_only_new_rows(db, tmp_path):
+    lines = ['"data";"valor"'] + [f'"{day:%d/%m/%Y}";"10,65"' for day in DAYS]
+    (tmp_path / 'CDI.csv').write_text('\n'.join(lines[:11]), encoding='utf-8')
+    service = RateSeriesService(db)
+    assert service.sync_from_files(str(tmp_path)) == {'CDI': 10}
+
+    (tmp_path / 'CDI.csv').write_text('\n'.join(lines), encoding='utf-8')
+
+    # The last stored day is read again
+    assert service.sync_from_files(str(tmp_path)) == {'CDI': len(DAYS) - 9}
+    assert stored_cumulative(db).iloc[-1] == pytest.approx((1 + 0.1065) ** (len(DAYS) / 252))
@@ -0,0 +1,80 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import models
+from app.services.returns import ReturnEngine, time_weighted_return, xirr_batch
+
+
+def npv(rate, amounts, years):
+    return sum(amount * (1 + rate) ** -year for amount, year in zip(amounts, years))
+
+
+def test_xirr_batch_solves_known_cashflows():
+    amounts = np.array([
+        [-1000.0, 1100.0, 0.0],
+        [-1000.0, 500.0, 600.0],
+        [-1.0, 50.0, 0.0],
+        [-1000.0, 900.0, 0.0],
+    ])
+    years = np.array([
+        [0.0, 1.0, 0.0],
+        [0.0, 0.5, 1.0],
+        [0.0, 1.0, 0.0],
+        [0.0, 2.0, 0.0],
+    ])
+
+    rates = xirr_batch(amounts, years)
+
+    assert rates[0] == pytest.approx(0.10)
+    assert npv(rates[1], amounts[1], years[1]) == pytest.approx(0.0, abs=1e-6)
+    assert rates[2] == pytest.approx(49.0)
+    assert rates[3] == pytest.approx(0.9 ** 0.5 - 1)
+
+
+def test_xirr_batch_without_a_sign_change_is_nan():
+    rates = xirr_batch(np.array([[-100.0, -50.0], [100.0, 0.0]]), np.array([[0.0, 1.0], [0.0, 0.0]]))
+
+    assert np.isnan(rates).all()
+    assert xirr_batch(np.zeros((0, 2)), np.zeros((0, 2))).shape == (0,)
+
+
+def test_time_weighted_return_chains_daily_returns():
+    index = pd.date_range('2025-01-01', periods=3)
+    returns = pd.Series([0.0, 0.1, -0.05], index=index)
+
+    assert time_weighted_return(returns) == {'total': pytest.approx(1.1 * 0.95 - 1), 'annualized': None}
+    assert time_weighted_return(returns.iloc[:1]) is None
+
+    yearly = pd.Series([0.0, 0.21], index=pd.to_datetime(['2024-01-01', '2025-12-31']))
+    assert time_weighted_return(yearly)['annualized'] == pytest.approx(1.21 ** (365 / 730) - 1)
+
+
+def test_engine_values_every_portfolio_together(db):
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    growth = models.Portfolio(name='Growth', owner_id=user.id)
+    idle = models.Portfolio(name='Idle', owner_id=user.id)
+    asset = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    db.add_all([growth, idle, asset])
+    db.commit()
+    db.add_all([
+        models.Transaction(portfolio_id=growth.id, asset_id=asset.id, transaction_type=models.TransactionType.BUY,
+                           date=date(2025, 10, 9), quantity=10, total_amount=1000.0),
+        models.Price(asset_id=asset.id, date=date(2025, 10, 9), close=100.0),
+        models.Price(asset_id=asset.id, date=date(2026, 10, 9), close=110.0),
+    ])
+    db.commit()
+
+    results = ReturnEngine(db).calculate([growth.id, idle.id], as_of=date(2026, 10, 9))
+
+    assert results[growth.id]['time_weighted_return'] == pytest.approx(10.0)
+    assert results[growth.id]['time_weighted_return_annualized'] == pytest.approx(10.0)
+    # -1000 on 2025-10-09, +1100 a year later
+    assert results[growth.id]['money_weighted_return'] == pytest.approx(10.0)
+    assert results[idle.id] == {
+        'time_weighted_return': None, 'time_weighted_return_annualized': None, 'money_weighted_return': None
+    }
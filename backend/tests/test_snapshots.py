@@ -0,0 +1,164 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app import models
+from app.services.dashboard_service import DashboardService
+from app.services.fx import invalidate_fx_cube
+from app.services.snapshots import SnapshotService
+from app.services.valuation import ValuationEngine
+
+BUY = models.TransactionType.BUY
+DEPOSIT = models.TransactionType.DEPOSIT
+
+START = date(2026, 10, 1)
+END = date(2026, 10, 8)
+
+
+@pytest.fixture
+def portfolio(db):
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    asset = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    db.add_all([portfolio, asset])
+    db.commit()
+    db.add_all([
+        models.Transaction(portfolio_id=portfolio.id, transaction_type=DEPOSIT, date=START, total_amount=1000.0),
+        models.Transaction(portfolio_id=portfolio.id, asset_id=asset.id, transaction_type=BUY,
+                           date=date(2026, 10, 2), quantity=10, total_amount=300.0),
+        models.Position(portfolio_id=portfolio.id, asset_id=asset.id, quantity=10, average_price=30.0,
+                        total_invested=300.0),
+    ])
+    db.add_all([
+        models.Price(asset_id=asset.id, date=date(2026, 10, day), close=30.0 + day) for day in range(2, 9)
+    ])
+    db.commit()
+    return portfolio, asset
+
+
+def stored_days(db, portfolio_id):
+    rows = db.query(models.PortfolioDailyValue.date).filter(
+        models.PortfolioDailyValue.portfolio_id == portfolio_id
+    ).order_by(models.PortfolioDailyValue.date).all()
+    return [row[0] for row in rows]
+
+
+def test_reads_value_the_missing_tail_without_writing(db, portfolio):
+    portfolio, _ = portfolio
+    service = SnapshotService(db)
+
+    series = service.get_series(portfolio.id, START, END)
+
+    expected = ValuationEngine(db).build_daily_values(portfolio.id, START, END)
+    assert series['total_value'].tolist() == expected['total_value'].tolist()
+    assert stored_days(db, portfolio.id) == []
+
+
+def test_materialize_then_read_matches_live_valuation(db, portfolio):
+    portfolio, _ = portfolio
+    service = SnapshotService(db)
+
+    assert service.materialize(end_date=date(2026, 10, 5)) == 1
+    assert stored_days(db, portfolio.id)[0] == START
+    assert stored_days(db, portfolio.id)[-1] == date(2026, 10, 5)
+
+    # Stored days plus the live tail from 10/06
+    series = service.get_series(portfolio.id, START, END)
+    expected = ValuationEngine(db).build_daily_values(portfolio.id, START, END)
+    assert series.index.tolist() == expected.index.tolist()
+    assert series['total_value'].tolist() == pytest.approx(expected['total_value'].tolist())
+
+
+def test_invalidate_drops_from_the_date_and_materialize_extends_again(db, portfolio):
+    portfolio, _ = portfolio
+    service = SnapshotService(db)
+    service.materialize(end_date=END)
+
+    service.invalidate(portfolio.id, date(2026, 10, 4))
+    assert stored_days(db, portfolio.id)[-1] == date(2026, 10, 3)
+
+    service.materialize(end_date=END)
+    assert stored_days(db, portfolio.id)[-1] == END
+
+
+def test_price_change_invalidates_portfolios_holding_the_asset(db, portfolio):
+    portfolio, asset = portfolio
+    service = SnapshotService(db)
+    service.materialize(end_date=END)
+
+    service.invalidate_asset(asset.id, date(2026, 10, 6))
+
+    assert stored_days(db, portfolio.id)[-1] == date(2026, 10, 5)
+
+
+class QueryCounter:
+    def __init__(self, db):
+        self.engine = db.get_bind()
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self)
+
+
+def add_portfolios(db, owner_id, asset_id, count):
+    portfolios = [models.Portfolio(name=f'P{i}', owner_id=owner_id) for i in range(count)]
+    db.add_all(portfolios)
+    db.commit()
+    db.add_all([
+        models.Transaction(portfolio_id=portfolio.id, asset_id=asset_id, transaction_type=BUY,
+                           date=date(2026, 10, 2 + i % 4), quantity=1 + i, total_amount=30.0 * (1 + i))
+        for i, portfolio in enumerate(portfolios)
+    ])
+    db.commit()
+    return [portfolio.id for portfolio in portfolios]
+
+
+def test_tails_of_many_portfolios_are_valued_together(db, portfolio):
+    portfolio, asset = portfolio
+    service = SnapshotService(db)
+    service.materialize([portfolio.id], end_date=date(2026, 10, 4))
+    others = add_portfolios(db, portfolio.owner_id, asset.id, 5)
+    portfolio_ids = [portfolio.id] + others
+
+    with QueryCounter(db) as one:
+        service.get_series_many(portfolio_ids[:1], START, END)
+    with QueryCounter(db) as six:
+        series = service.get_series_many(portfolio_ids, START, END)
+
+    # Only the lookup of first transactions for portfolios without snapshots is added
+    assert six.count <= one.count + 1
+    engine = ValuationEngine(db)
+    for portfolio_id in portfolio_ids:
+        # Portfolios without snapshots start at their first transaction
+        expected = engine.build_daily_values(portfolio_id, series[portfolio_id].index[0].date(), END)
+        assert series[portfolio_id].index.tolist() == expected.index.tolist()
+        assert series[portfolio_id]['total_value'].tolist() == pytest.approx(expected['total_value'].tolist())
+
+
+def test_dashboard_queries_do_not_grow_with_stale_portfolios(db, portfolio):
+    portfolio, asset = portfolio
+
+    def dashboard_queries(user_id):
+        invalidate_fx_cube()
+        with QueryCounter(db) as counter:
+            DashboardService(db).build(user_id)
+        return counter.count
+
+    single = models.User(email='bia@example.com', username='bia', hashed_password='x')
+    many = models.User(email='caio@example.com', username='caio', hashed_password='x')
+    db.add_all([single, many])
+    db.commit()
+    add_portfolios(db, single.id, asset.id, 1)
+    add_portfolios(db, many.id, asset.id, 6)
+
+    assert dashboard_queries(many.id) == dashboard_queries(single.id)
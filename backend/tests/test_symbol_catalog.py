@@ -0,0 +1,151 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app import models
+from app.config import settings
+from app.routers.assets import search_assets
+from app.services import symbol_catalog
+from app.services.market_data import MarketDataService
+from app.services.providers import FixturePriceProvider
+from app.services.quote_cache import quote_cache
+from app.services.symbol_catalog import SymbolCatalog, build_catalog, load_listing
+
+
+class SearchProvider(FixturePriceProvider):
+    def __init__(self, search):
+        super().__init__(pd.DataFrame(columns=["ticker", "date", "close"]))
+        self.search = search
+
+
+LISTING = """symbol,name,exchange,asset_type,currency,sector
+PETR3,Petróleo Brasileiro S.A. - Petrobras,B3,STOCK,BRL,Energy
+PETR4,Petróleo Brasileiro S.A. - Petrobras,B3,STOCK,BRL,Energy
+VALE3,Vale S.A.,B3,STOCK,BRL,Materials
+ITUB4,Itaú Unibanco Holding S.A.,B3,STOCK,BRL,Financials
+AAPL,Apple Inc.,NASDAQ,STOCK,USD,Technology
+"""
+
+
+@pytest.fixture
+def listing(tmp_path):
+    path = tmp_path / 'listing.csv'
+    path.write_text(LISTING, encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def catalog(listing):
+    catalog = SymbolCatalog()
+    for entry in load_listing(listing):
+        catalog.add(entry)
+    return catalog
+
+
+@pytest.fixture
+def fresh_catalog(listing, monkeypatch):
+    monkeypatch.setattr(settings, 'SYMBOL_LISTING_PATH', listing)
+    symbol_catalog.invalidate_catalog()
+    quote_cache.invalidate()
+    yield
+    symbol_catalog.invalidate_catalog()
+    quote_cache.invalidate()
+
+
+def symbols(results):
+    return [result['symbol'] for result in results]
+
+
+def test_symbol_prefix(catalog):
+    assert symbols(catalog.search('petr')) == ['PETR3', 'PETR4']
+    assert symbols(catalog.search('PETR4.SA')) == ['PETR4']
+
+
+def test_exact_symbol_comes_first(catalog):
+    catalog.add({'symbol': 'VALE', 'name': 'Vale Holding'})
+
+    assert symbols(catalog.search('VALE'))[:2] == ['VALE', 'VALE3']
+
+
+def test_name_trigrams_ignore_accents_and_case(catalog):
+    assert symbols(catalog.search('petroleo')) == ['PETR3', 'PETR4']
+    assert symbols(catalog.search('itau unibanco')) == ['ITUB4']
+    assert symbols(catalog.search('unibnco')) == ['ITUB4']
+
+
+def test_unknown_query(catalog):
+    assert catalog.search('ZZZZ') == []
+
+
+def test_stored_assets_win_over_listing(db, listing):
+    db.add(models.Asset(symbol='PETR4.SA', name='Petrobras PN', asset_type=models.AssetType.STOCK, exchange='B3'))
+    db.commit()
+
+    catalog = build_catalog(db, load_listing(listing))
+    results = catalog.search('PETR')
+
+    assert symbols(results) == ['PETR4.SA', 'PETR3']
+    assert results[0]['id'] is not None and results[1]['id'] is None
+
+
+def test_listing_requires_symbol_and_name(tmp_path):
+    path = tmp_path / 'bad.csv'
+    path.write_text('ticker,name\nPETR4,Petrobras\n')
+
+    with pytest.raises(ValueError):
+        load_listing(str(path))
+
+
+def test_search_uses_network_only_on_misses(db, fresh_catalog):
+    calls = []
+
+    def yahoo(query):
+        calls.append(query)
+        return [{'symbol': 'WEGE3.SA', 'name': 'WEG S.A.', 'exchange': 'B3', 'current_price': 40.0}] if query == 'WEGE3' else []
+
+    service = MarketDataService(db, provider=SearchProvider(yahoo))
+
+    assert symbols(service.search_asset('PETR4'))[0] == 'PETR4'
+    assert calls == []
+
+    assert symbols(service.search_asset('WEGE3')) == ['WEGE3.SA']
+    # Found once, then answered by the catalog
+    assert symbols(service.search_asset('WEGE')) == ['WEGE3.SA']
+    assert service.search_asset('WEGE')[0].get('current_price') is None
+    assert calls == ['WEGE3']
+
+
+def test_missing_tickers_are_negatively_cached(db, fresh_catalog):
+    calls = []
+    service = MarketDataService(db, provider=SearchProvider(lambda query: calls.append(query) or []))
+
+    assert service.search_asset('XPTO9') == []
+    assert service.search_asset('xpto9') == []
+    assert calls == ['XPTO9']
+
+
+def test_search_endpoint_fills_defaults_and_stored_prices(db, tmp_path, monkeypatch):
+    path = tmp_path / 'listing.csv'
+    path.write_text('symbol,name,exchange,asset_type,currency\nBOVA11,iShares Ibovespa,B3,,\n', encoding='utf-8')
+    monkeypatch.setattr(settings, 'SYMBOL_LISTING_PATH', str(path))
+    symbol_catalog.invalidate_catalog()
+    asset = models.Asset(symbol='IVVB11.SA', name='iShares S&P 500', asset_type=models.AssetType.ETF)
+    db.add(asset)
+    db.commit()
+    db.add_all([
+        models.Price(asset_id=asset.id, date=date(2026, 10, 15), close=330.0),
+        models.Price(asset_id=asset.id, date=date(2026, 10, 16), close=331.5),
+    ])
+    db.commit()
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+
+    try:
+        listed = search_assets(q='BOVA', current_user=user, db=db)[0]
+        stored = search_assets(q='IVVB', current_user=user, db=db)[0]
+    finally:
+        symbol_catalog.invalidate_catalog()
+
+    # Empty listing columns get the defaults instead of None
+    assert (listed['asset_type'], listed['currency'], listed['current_price']) == ('STOCK', 'BRL', None)
+    assert (stored['asset_type'], stored['current_price']) == ('ETF', 331.5)
@@ -0,0 +1,95 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app import models
+from app.services.valuation import ValuationEngine, compute_series_metrics
+
+BUY = models.TransactionType.BUY
+SELL = models.TransactionType.SELL
+DEPOSIT = models.TransactionType.DEPOSIT
+
+
+@pytest.fixture
+def portfolio(db):
+    user = models.User(email='ana@example.com', username='ana', hashed_password='x')
+    db.add(user)
+    db.commit()
+    portfolio = models.Portfolio(name='Main', owner_id=user.id)
+    asset = models.Asset(symbol='PETR4', name='Petrobras', asset_type=models.AssetType.STOCK)
+    db.add_all([portfolio, asset])
+    db.commit()
+    return portfolio, asset
+
+
+def add_transactions(db, portfolio_id, asset_id, rows):
+    db.add_all([
+        models.Transaction(portfolio_id=portfolio_id, asset_id=asset_id if kind != DEPOSIT else None,
+                           transaction_type=kind, date=day, quantity=quantity, total_amount=amount)
+        for kind, day, quantity, amount in rows
+    ])
+    db.commit()
+
+
+def add_prices(db, asset_id, closes):
+    db.add_all([models.Price(asset_id=asset_id, date=day, close=close) for day, close in closes.items()])
+    db.commit()
+
+
+def test_daily_values_follow_holdings_and_prices(db, portfolio):
+    portfolio, asset = portfolio
+    add_transactions(db, portfolio.id, asset.id, [
+        (DEPOSIT, date(2026, 10, 1), None, 1000.0),
+        (BUY, date(2026, 10, 2), 10, 300.0),
+        (BUY, date(2026, 10, 4), 10, 500.0),
+        (SELL, date(2026, 10, 5), 5, 200.0),
+    ])
+    # Price before the window is forward-filled into it; 10/04 has no price
+    add_prices(db, asset.id, {date(2026, 9, 30): 29.0, date(2026, 10, 3): 31.0, date(2026, 10, 5): 40.0})
+
+    series = ValuationEngine(db).build_daily_values(portfolio.id, date(2026, 10, 1), date(2026, 10, 5))
+
+    assert series['market_value'].tolist() == [0.0, 290.0, 310.0, 620.0, 600.0]
+    assert series['cash'].tolist() == [1000.0, 700.0, 700.0, 200.0, 400.0]
+    assert series['total_value'].tolist() == [1000.0, 990.0, 1010.0, 820.0, 1000.0]
+    # Average cost 40: selling 5 removes 200 of the 800 invested
+    assert series['invested'].tolist() == [0.0, 300.0, 300.0, 800.0, 600.0]
+    assert series['net_flow'].tolist() == [1000.0, 0.0, 0.0, 0.0, 0.0]
+
+
+def test_transactions_before_the_window_open_the_series(db, portfolio):
+    portfolio, asset = portfolio
+    add_transactions(db, portfolio.id, asset.id, [
+        (DEPOSIT, date(2026, 9, 1), None, 500.0),
+        (BUY, date(2026, 9, 2), 10, 300.0),
+    ])
+    add_prices(db, asset.id, {date(2026, 9, 2): 30.0, date(2026, 10, 2): 35.0})
+
+    engine = ValuationEngine(db)
+    series = engine.build_daily_values(portfolio.id, date(2026, 10, 1), date(2026, 10, 2))
+
+    assert series['total_value'].tolist() == [500.0, 550.0]
+    # Flows before the window are not flows of the window
+    assert series['net_flow'].tolist() == [0.0, 0.0]
+    assert engine.value_at_date(portfolio.id, date(2026, 10, 2)) == 550.0
+
+
+def test_empty_portfolio(db, portfolio):
+    portfolio, _ = portfolio
+
+    series = ValuationEngine(db).build_daily_values(portfolio.id, date(2026, 10, 1), date(2026, 10, 3))
+
+    assert len(series) == 3
+    assert not series.to_numpy().any()
+
+
+def test_series_metrics():
+    values = np.array([100.0, 110.0, 99.0, 108.9])
+
+    metrics = compute_series_metrics(values, risk_free_rate=0.0)
+
+    assert metrics['daily_return'] == pytest.approx(10.0)
+    assert metrics['max_drawdown'] == pytest.approx(-10.0)
+    assert metrics['monthly_return'] == pytest.approx(8.9)
+    assert compute_series_metrics(np.array([100.0])) == {}